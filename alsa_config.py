@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Generate an ALSA configuration that shares the WM8960 between programs
+
+The card is referenced by its id, not its index, so the configuration
+keeps working when the index moves. Playback goes through ``dmix`` and
+capture through ``dsnoop``, joined by ``asym`` into the default device,
+so a call, diagnostics and earcons can use the codec at the same time
+without PulseAudio in the path. The shared rate is the assistant's own
+(16 kHz) and periods are a whole fraction of its chunk, so a call's
+streams pass through without resampling or partial periods.
+
+    python3 alsa_config.py                 # print the configuration
+    python3 alsa_config.py --write --check # install it and measure it
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+
+from audio_devices import find_alsa_card_info
+from audio_constants import CHUNK_SIZE, SAMPLE_RATE
+
+ASOUNDRC_PATH = "~/.asoundrc"
+
+# The WM8960 is an I2S stereo codec; mono streams are upmixed by plug
+CODEC_CHANNELS = 2
+# Periods per assistant chunk, and periods in the hardware buffer
+PERIODS_PER_CHUNK = 2
+BUFFER_PERIODS = 4
+# dmix and dsnoop rendezvous through System V IPC under these keys
+IPC_KEY = 8960
+
+CHECK_SECONDS = 2
+
+# Why the shared rate is what it is, for the generated file's header
+ASSISTANT_RATE_NOTE = """\
+# The WM8960 runs natively at 48 kHz, but dmix and dsnoop fix one rate for
+# every client. Calls are 16 kHz mono end to end (Daily's virtual devices
+# and the Vapi bot), so sharing at 16 kHz lets them open the codec with no
+# resampling anywhere; only other programs at 44.1/48 kHz are converted,
+# by plug."""
+NATIVE_RATE_NOTE = """\
+# Shared at {rate} Hz instead of the assistant's 16 kHz: calls resample in
+# DailyCall (device_rate={rate}), other programs at {rate} Hz do not."""
+
+TEMPLATE = """\
+# Generated by alsa_config.py for {description}
+# {rate} Hz, {channels} channels, period {period} frames, buffer {buffer} frames
+#
+{rate_note}
+
+pcm.wm8960_playback {{
+    type dmix
+    ipc_key {playback_key}
+    ipc_perm 0666
+    slave {{
+        pcm "hw:CARD={card_id},DEV=0"
+        format S16_LE
+        rate {rate}
+        channels {channels}
+        period_size {period}
+        buffer_size {buffer}
+    }}
+    hint {{
+        show on
+        description "WM8960 shared playback"
+    }}
+}}
+
+pcm.wm8960_capture {{
+    type dsnoop
+    ipc_key {capture_key}
+    ipc_perm 0666
+    slave {{
+        pcm "hw:CARD={card_id},DEV=0"
+        format S16_LE
+        rate {rate}
+        channels {channels}
+        period_size {period}
+        buffer_size {buffer}
+    }}
+    hint {{
+        show on
+        description "WM8960 shared capture"
+    }}
+}}
+
+pcm.wm8960_shared {{
+    type asym
+    playback.pcm "wm8960_playback"
+    capture.pcm "wm8960_capture"
+    hint {{
+        show on
+        description "WM8960 shared playback and capture"
+    }}
+}}
+
+# plug only converts what differs from the slave; at {rate} Hz and S16_LE
+# it just maps channels
+pcm.!default {{
+    type plug
+    slave.pcm "wm8960_shared"
+}}
+
+ctl.!default {{
+    type hw
+    card {card_id}
+}}
+"""
+
+
+def generate_config(
+    card_id,
+    *,
+    description="WM8960",
+    rate=SAMPLE_RATE,
+    channels=CODEC_CHANNELS,
+    period_frames=None,
+    periods=BUFFER_PERIODS,
+):
+    """
+    :param rate: Rate the codec runs at; programs that open the default
+        device at this rate are not resampled.
+    :param period_frames: Defaults to a ``PERIODS_PER_CHUNK`` fraction of
+        the assistant's chunk at ``rate``.
+    """
+    if period_frames is None:
+        chunk_frames = CHUNK_SIZE * rate // SAMPLE_RATE
+        period_frames = chunk_frames // PERIODS_PER_CHUNK
+    if rate == SAMPLE_RATE:
+        rate_note = ASSISTANT_RATE_NOTE
+    else:
+        rate_note = NATIVE_RATE_NOTE.format(rate=rate)
+    return TEMPLATE.format(
+        description=description,
+        rate_note=rate_note,
+        card_id=card_id,
+        rate=rate,
+        channels=channels,
+        period=period_frames,
+        buffer=period_frames * periods,
+        playback_key=IPC_KEY,
+        capture_key=IPC_KEY + 1,
+    )
+
+
+def write_config(config, path=ASOUNDRC_PATH):
+    """
+    Install ``config``, keeping the previous file as ``<path>.backup``.
+    """
+    path = os.path.expanduser(path)
+    if os.path.exists(path):
+        shutil.copyfile(path, path + ".backup")
+        print(f"📋 Backed up existing {path} to {path}.backup")
+    with open(path, "w") as f:
+        f.write(config)
+    print(f"✅ Wrote {path}")
+
+
+def measure_latency(rate=SAMPLE_RATE, seconds=CHECK_SECONDS):
+    """
+    Run a full-duplex stream on the default device for ``seconds`` the
+    way a call does, one chunk at a time.
+
+    :return: A dict with PortAudio's input and output latency in ms and
+        the number of overflows and underflows seen.
+    """
+    import pyaudio
+
+    chunk_frames = CHUNK_SIZE * rate // SAMPLE_RATE
+    # A fresh instance reads the configuration as it is now
+    audio = pyaudio.PyAudio()
+    try:
+        stream = audio.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=rate,
+            input=True,
+            output=True,
+            frames_per_buffer=chunk_frames,
+        )
+        silence = bytes(chunk_frames * 2)
+        # Start with a chunk queued, as a call does once audio flows
+        stream.write(silence)
+        overflows = 0
+        underflows = 0
+        start = time.monotonic()
+        while time.monotonic() - start < seconds:
+            try:
+                stream.read(chunk_frames, exception_on_overflow=True)
+            except IOError:
+                overflows += 1
+            try:
+                stream.write(silence, exception_on_underflow=True)
+            except IOError:
+                underflows += 1
+        result = {
+            "input_latency_ms": round(stream.get_input_latency() * 1000, 1),
+            "output_latency_ms": round(stream.get_output_latency() * 1000, 1),
+            "overflows": overflows,
+            "underflows": underflows,
+        }
+        stream.stop_stream()
+        stream.close()
+        return result
+    finally:
+        audio.terminate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rate", type=int, default=SAMPLE_RATE)
+    parser.add_argument("--channels", type=int, default=CODEC_CHANNELS)
+    parser.add_argument("--period", type=int, help="period size in frames")
+    parser.add_argument("--periods", type=int, default=BUFFER_PERIODS)
+    parser.add_argument(
+        "--write", action="store_true", help=f"install as {ASOUNDRC_PATH}"
+    )
+    parser.add_argument(
+        "--check", action="store_true", help="measure latency on the default device"
+    )
+    args = parser.parse_args()
+
+    if args.rate * CHUNK_SIZE % SAMPLE_RATE:
+        parser.error(f"{args.rate} Hz does not give a whole number of frames per chunk")
+
+    card = find_alsa_card_info()
+    if card is None:
+        print("❌ WM8960 sound card not found in /proc/asound/cards")
+        sys.exit(1)
+    _, card_id, description = card
+
+    config = generate_config(
+        card_id,
+        description=description,
+        rate=args.rate,
+        channels=args.channels,
+        period_frames=args.period,
+        periods=args.periods,
+    )
+    if args.write:
+        write_config(config)
+    else:
+        print(config)
+
+    if args.check:
+        print(f"⏱️  Measuring for {CHECK_SECONDS} seconds...")
+        try:
+            result = measure_latency(args.rate)
+        except Exception as e:
+            print(f"❌ Could not open the default device: {e}")
+            sys.exit(1)
+        print(
+            f"Input latency {result['input_latency_ms']} ms, "
+            f"output latency {result['output_latency_ms']} ms, "
+            f"{result['overflows']} overflows, {result['underflows']} underflows"
+        )
+        if result["overflows"] or result["underflows"]:
+            print("⚠️  Dropouts at this period size; try a larger --period")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,531 @@
+"""
+Direct ALSA PCM streams through libasound, without PortAudio or PulseAudio
+
+Skipping the sound server saves its buffering, but the periods are still
+moved by a Python thread. Between the GIL's 5 ms switch interval and a
+callback per chunk, periods of a few milliseconds underrun on a Pi, so
+the defaults trade latency for safety rather than go single-digit:
+
+- capture: one 10 ms period
+- duplex (callback) playback: 20 ms primed, at most 30 ms queued
+- blocking playback: the 40 ms chunk being written on top of the 20 ms
+  prime, 60 ms
+
+``AlsaBackend(chunk_periods=..., periods=...)`` goes lower on a quiet
+machine; ``xruns`` counts the underruns that costs.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import threading
+
+from audio_backends import (
+    CALLBACK_CONTINUE,
+    INPUT_OVERFLOW,
+    OUTPUT_UNDERFLOW,
+    SAMPLE_WIDTH,
+)
+from audio_devices import find_alsa_card_info
+
+# Periods per chunk the engine reads or writes: 10 ms at 40 ms chunks
+CHUNK_PERIODS = 4
+# Playback keeps all but one of these periods queued ahead of the codec,
+# enough to ride out a callback and the GIL's 5 ms switch interval. In
+# callback mode this is the whole playback buffer
+BUFFER_PERIODS = 3
+# Capture latency is one period whatever the buffer size, so capture
+# gets a deeper buffer for free
+CAPTURE_BUFFER_MS = 100
+
+SND_PCM_STREAM_PLAYBACK = 0
+SND_PCM_STREAM_CAPTURE = 1
+SND_PCM_ACCESS_MMAP_INTERLEAVED = 0
+SND_PCM_FORMAT_S16_LE = 2
+
+_library = None
+_library_lock = threading.Lock()
+
+
+class AlsaError(OSError):
+    pass
+
+
+def _load_library():
+    global _library
+    with _library_lock:
+        if _library is not None:
+            return _library
+        path = ctypes.util.find_library("asound")
+        if path is None:
+            raise AlsaError("libasound not found")
+        lib = ctypes.CDLL(path)
+
+        pcm = ctypes.c_void_p
+        params = ctypes.c_void_p
+        uframes = ctypes.c_ulong
+        signatures = {
+            "snd_pcm_open": (
+                [ctypes.POINTER(pcm), ctypes.c_char_p] + [ctypes.c_int] * 2,
+            ),
+            "snd_pcm_close": ([pcm],),
+            "snd_pcm_prepare": ([pcm],),
+            "snd_pcm_start": ([pcm],),
+            "snd_pcm_drop": ([pcm],),
+            "snd_pcm_recover": ([pcm, ctypes.c_int, ctypes.c_int],),
+            "snd_pcm_mmap_readi": ([pcm, ctypes.c_void_p, uframes], ctypes.c_long),
+            "snd_pcm_mmap_writei": ([pcm, ctypes.c_void_p, uframes], ctypes.c_long),
+            "snd_pcm_hw_params_malloc": ([ctypes.POINTER(params)],),
+            "snd_pcm_hw_params_free": ([params], None),
+            "snd_pcm_hw_params_any": ([pcm, params],),
+            "snd_pcm_hw_params_set_access": ([pcm, params, ctypes.c_int],),
+            "snd_pcm_hw_params_set_format": ([pcm, params, ctypes.c_int],),
+            "snd_pcm_hw_params_set_channels": ([pcm, params, ctypes.c_uint],),
+            "snd_pcm_hw_params_set_rate": ([pcm, params, ctypes.c_uint, ctypes.c_int],),
+            "snd_pcm_hw_params_set_period_size_near": (
+                [pcm, params, ctypes.POINTER(uframes), ctypes.POINTER(ctypes.c_int)],
+            ),
+            "snd_pcm_hw_params_set_buffer_size_near": (
+                [pcm, params, ctypes.POINTER(uframes)],
+            ),
+            "snd_pcm_hw_params": ([pcm, params],),
+            "snd_pcm_sw_params_malloc": ([ctypes.POINTER(params)],),
+            "snd_pcm_sw_params_free": ([params], None),
+            "snd_pcm_sw_params_current": ([pcm, params],),
+            "snd_pcm_sw_params_set_start_threshold": ([pcm, params, uframes],),
+            "snd_pcm_sw_params_set_avail_min": ([pcm, params, uframes],),
+            "snd_pcm_sw_params": ([pcm, params],),
+            "snd_strerror": ([ctypes.c_int], ctypes.c_char_p),
+        }
+        for name, signature in signatures.items():
+            function = getattr(lib, name)
+            function.argtypes = signature[0]
+            function.restype = signature[1] if len(signature) > 1 else ctypes.c_int
+        _library = lib
+        return lib
+
+
+def default_device():
+    """
+    The ``hw:`` device of the WM8960 by card id, or ALSA's default.
+    """
+    card = find_alsa_card_info()
+    if card is None:
+        return "default"
+    return f"hw:CARD={card[1]},DEV=0"
+
+
+class AlsaPcm:
+    """
+    One direction of an ALSA PCM, opened in mmap interleaved S16_LE mode
+    with the period and buffer sizes asked for.
+
+    Transfers go through ``snd_pcm_mmap_readi``/``snd_pcm_mmap_writei``,
+    which copy straight between our buffer and the device's ring. An
+    overrun or underrun is recovered on the spot and counted in ``xruns``.
+    """
+
+    def __init__(
+        self,
+        device,
+        direction,
+        *,
+        rate,
+        channels,
+        period_frames,
+        buffer_frames,
+        start_frames=1,
+    ):
+        lib = self.__lib = _load_library()
+        self.device = device
+        self.direction = direction
+        self.rate = rate
+        self.channels = channels
+        self.frame_bytes = channels * SAMPLE_WIDTH
+        self.xruns = 0
+
+        handle = ctypes.c_void_p()
+        self.__check(
+            lib.snd_pcm_open(ctypes.byref(handle), device.encode(), direction, 0),
+            f"open {device}",
+        )
+        self.__pcm = handle
+        try:
+            self.__configure(period_frames, buffer_frames, start_frames)
+        except AlsaError:
+            lib.snd_pcm_close(handle)
+            raise
+
+        # Transfers pass a pointer into one of these; views of a buffer
+        # are made once and reused
+        self.__pointers = {}
+
+    def __configure(self, period_frames, buffer_frames, start_frames):
+        lib = self.__lib
+        pcm = self.__pcm
+
+        params = ctypes.c_void_p()
+        self.__check(lib.snd_pcm_hw_params_malloc(ctypes.byref(params)), "hw params")
+        try:
+            self.__check(lib.snd_pcm_hw_params_any(pcm, params), "hw params")
+            self.__check(
+                lib.snd_pcm_hw_params_set_access(
+                    pcm, params, SND_PCM_ACCESS_MMAP_INTERLEAVED
+                ),
+                "mmap access",
+            )
+            self.__check(
+                lib.snd_pcm_hw_params_set_format(pcm, params, SND_PCM_FORMAT_S16_LE),
+                "S16_LE format",
+            )
+            self.__check(
+                lib.snd_pcm_hw_params_set_channels(pcm, params, self.channels),
+                f"{self.channels} channels",
+            )
+            # The exact rate: a near one would mean resampling somewhere
+            self.__check(
+                lib.snd_pcm_hw_params_set_rate(pcm, params, self.rate, 0),
+                f"{self.rate} Hz",
+            )
+            period = ctypes.c_ulong(period_frames)
+            direction = ctypes.c_int(0)
+            self.__check(
+                lib.snd_pcm_hw_params_set_period_size_near(
+                    pcm, params, ctypes.byref(period), ctypes.byref(direction)
+                ),
+                "period size",
+            )
+            size = ctypes.c_ulong(max(buffer_frames, 2 * period.value))
+            self.__check(
+                lib.snd_pcm_hw_params_set_buffer_size_near(
+                    pcm, params, ctypes.byref(size)
+                ),
+                "buffer size",
+            )
+            self.__check(lib.snd_pcm_hw_params(pcm, params), "hw params")
+            self.period_frames = period.value
+            self.buffer_frames = size.value
+        finally:
+            lib.snd_pcm_hw_params_free(params)
+
+        params = ctypes.c_void_p()
+        self.__check(lib.snd_pcm_sw_params_malloc(ctypes.byref(params)), "sw params")
+        try:
+            self.__check(lib.snd_pcm_sw_params_current(pcm, params), "sw params")
+            self.__check(
+                lib.snd_pcm_sw_params_set_start_threshold(
+                    pcm, params, min(start_frames, self.buffer_frames)
+                ),
+                "start threshold",
+            )
+            self.__check(
+                lib.snd_pcm_sw_params_set_avail_min(pcm, params, self.period_frames),
+                "avail min",
+            )
+            self.__check(lib.snd_pcm_sw_params(pcm, params), "sw params")
+        finally:
+            lib.snd_pcm_sw_params_free(params)
+
+        self.__check(lib.snd_pcm_prepare(pcm), "prepare")
+
+    @property
+    def latency(self):
+        """
+        Device latency in seconds: the buffer for playback, a period for
+        capture.
+        """
+        if self.direction == SND_PCM_STREAM_PLAYBACK:
+            return self.buffer_frames / self.rate
+        return self.period_frames / self.rate
+
+    def read_into(self, buffer, frames, offset=0):
+        """
+        Fill ``frames`` frames of the writable ``buffer`` from ``offset``
+        bytes on, blocking until they are captured.
+
+        :return: True if an overrun was recovered from on the way.
+        """
+        return self.__transfer(self.__lib.snd_pcm_mmap_readi, buffer, frames, offset)
+
+    def write(self, buffer, frames, offset=0):
+        """
+        Queue ``frames`` frames of ``buffer`` from ``offset`` bytes on,
+        blocking until the device has room for them. ``buffer`` must be
+        writable (a ``bytearray``); the device only reads it.
+
+        :return: True if an underrun was recovered from on the way.
+        """
+        return self.__transfer(self.__lib.snd_pcm_mmap_writei, buffer, frames, offset)
+
+    def drop(self):
+        """
+        Stop at once, discarding queued frames, and prepare to start again.
+        """
+        self.__lib.snd_pcm_drop(self.__pcm)
+        self.__lib.snd_pcm_prepare(self.__pcm)
+
+    def close(self):
+        if self.__pcm is not None:
+            self.__lib.snd_pcm_drop(self.__pcm)
+            self.__lib.snd_pcm_close(self.__pcm)
+            self.__pcm = None
+
+    def __transfer(self, function, buffer, frames, offset):
+        base = self.__address(buffer)
+        xrun = False
+        while frames > 0:
+            done = function(self.__pcm, base + offset, frames)
+            if done >= 0:
+                frames -= done
+                offset += done * self.frame_bytes
+                continue
+            if done == -errno.EAGAIN:
+                continue
+            # -EPIPE is an xrun, -ESTRPIPE a suspend; recover restarts both
+            if self.__lib.snd_pcm_recover(self.__pcm, done, 1) < 0:
+                self.__check(done, "transfer")
+            self.xruns += 1
+            xrun = True
+        return xrun
+
+    def __address(self, buffer):
+        pointer = self.__pointers.get(id(buffer))
+        if pointer is None or pointer[0] is not buffer:
+            if len(self.__pointers) > 8:
+                self.__pointers.clear()
+            array = (ctypes.c_char * len(buffer)).from_buffer(buffer)
+            pointer = (buffer, ctypes.addressof(array), array)
+            self.__pointers[id(buffer)] = pointer
+        return pointer[1]
+
+    def __check(self, result, action):
+        if result < 0:
+            message = self.__lib.snd_strerror(result).decode()
+            raise AlsaError(-result, f"ALSA {self.device}: {action} failed: {message}")
+        return result
+
+
+class AlsaStream:
+    """
+    An ``audio_backends`` stream on top of one or two ``AlsaPcm``s.
+
+    Periods are a ``chunk_periods``th of ``frames``. Playback is primed
+    with ``periods - 1`` periods of silence and starts once they are
+    queued, so that much audio is always ahead of the codec. With a
+    callback the buffer is ``periods`` periods; without one it holds a
+    whole chunk on top of the prime, so a blocking ``write`` of one chunk
+    keeps the margin too.
+
+    With a callback, a thread moves one period at a time in both
+    directions and calls back once per ``frames`` frames, as PortAudio
+    does.
+    """
+
+    def __init__(
+        self,
+        device,
+        *,
+        rate,
+        channels,
+        frames,
+        input=False,
+        output=False,
+        callback=None,
+        chunk_periods=CHUNK_PERIODS,
+        periods=BUFFER_PERIODS,
+    ):
+        period_frames = max(1, frames // chunk_periods)
+        prime_frames = period_frames * max(1, periods - 1)
+        self.__frames = frames
+        self.__frame_bytes = channels * SAMPLE_WIDTH
+        self.__capture = None
+        self.__playback = None
+        try:
+            if input:
+                self.__capture = AlsaPcm(
+                    device,
+                    SND_PCM_STREAM_CAPTURE,
+                    rate=rate,
+                    channels=channels,
+                    period_frames=period_frames,
+                    buffer_frames=max(rate * CAPTURE_BUFFER_MS // 1000, 2 * frames),
+                )
+            if output:
+                self.__playback = AlsaPcm(
+                    device,
+                    SND_PCM_STREAM_PLAYBACK,
+                    rate=rate,
+                    channels=channels,
+                    period_frames=period_frames,
+                    buffer_frames=(
+                        period_frames + prime_frames
+                        if callback is not None
+                        else frames + prime_frames
+                    ),
+                    start_frames=prime_frames,
+                )
+        except AlsaError:
+            self.close()
+            raise
+
+        chunk_bytes = frames * self.__frame_bytes
+        self.__prime_frames = prime_frames
+        self.__silence = bytearray(prime_frames * self.__frame_bytes)
+        self.__primed = False
+        self.__in = bytearray(chunk_bytes)
+        self.__in_view = memoryview(self.__in).toreadonly()
+        self.__out = bytearray(chunk_bytes)
+        self.__out_view = memoryview(self.__out)
+
+        self.__callback = callback
+        self.__thread = None
+        self.__running = False
+
+    @property
+    def xruns(self):
+        return sum(pcm.xruns for pcm in (self.__capture, self.__playback) if pcm)
+
+    @property
+    def input_latency(self):
+        return self.__capture.latency if self.__capture else 0.0
+
+    @property
+    def output_latency(self):
+        return self.__playback.latency if self.__playback else 0.0
+
+    def start(self):
+        if self.__callback is None or self.__running:
+            return
+        self.__prime()
+        self.__running = True
+        self.__thread = threading.Thread(
+            target=self.__run_callback, name="alsa-stream", daemon=True
+        )
+        self.__thread.start()
+
+    def stop(self):
+        self.__running = False
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        for pcm in (self.__capture, self.__playback):
+            if pcm is not None:
+                pcm.drop()
+        self.__primed = False
+
+    def close(self):
+        self.__running = False
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        for pcm in (self.__capture, self.__playback):
+            if pcm is not None:
+                pcm.close()
+
+    def read_into(self, buffer):
+        self.__capture.read_into(buffer, self.__frames)
+        return self.__frames
+
+    def write(self, buffer):
+        size = len(buffer)
+        # A bytes or read-only source is copied into our buffer first: the
+        # transfer needs a pointer ctypes can only take from writable memory
+        if size > len(self.__out):
+            self.__out = bytearray(size)
+            self.__out_view = memoryview(self.__out)
+        self.__out_view[:size] = buffer
+        self.__prime()
+        self.__playback.write(self.__out, size // self.__frame_bytes)
+
+    def __prime(self):
+        # Queue silence up to the start threshold, which starts playback
+        # with the margin every later write keeps topped up
+        if self.__playback is None or self.__primed:
+            return
+        self.__primed = True
+        self.__playback.write(self.__silence, self.__prime_frames)
+
+    def __run_callback(self):
+        # Capture and playback run off the same codec clock, so moving a
+        # period in each direction per pass keeps playback the primed
+        # periods ahead, and the buffer never has to hold a whole
+        # callback's worth
+        capture = self.__capture
+        playback = self.__playback
+        frame_bytes = self.__frame_bytes
+        period = (capture or playback).period_frames
+        chunk_bytes = self.__frames * frame_bytes
+        status = 0
+        position = 0
+        while self.__running:
+            frames = min(period, (chunk_bytes - position) // frame_bytes)
+            if capture is not None and capture.read_into(self.__in, frames, position):
+                status |= INPUT_OVERFLOW
+            if playback is not None and playback.write(self.__out, frames, position):
+                status |= OUTPUT_UNDERFLOW
+            position += frames * frame_bytes
+            if position < chunk_bytes:
+                continue
+
+            position = 0
+            in_data = self.__in_view if capture is not None else None
+            out_data, flag = self.__callback(in_data, self.__frames, status)
+            status = 0
+            if playback is not None:
+                self.__out_view[:chunk_bytes] = out_data
+            if flag != CALLBACK_CONTINUE:
+                self.__running = False
+
+
+class AlsaBackend:
+    """
+    ALSA straight to the sound card, see ``audio_backends``.
+    """
+
+    name = "alsa"
+
+    def __init__(
+        self, device=None, *, chunk_periods=CHUNK_PERIODS, periods=BUFFER_PERIODS
+    ):
+        """
+        :param device: ALSA PCM name. Defaults to ``$AUDIO_ALSA_DEVICE``,
+            then the WM8960's ``hw:`` device.
+        :param chunk_periods: Periods per chunk, see ``AlsaStream``.
+        :param periods: Playback periods, all but one kept queued.
+        """
+        _load_library()
+        self.device = device or os.getenv("AUDIO_ALSA_DEVICE") or default_device()
+        self.chunk_periods = chunk_periods
+        self.periods = periods
+
+    def open(
+        self,
+        *,
+        rate,
+        channels,
+        frames,
+        input=False,
+        output=False,
+        input_device=None,
+        output_device=None,
+        callback=None,
+    ):
+        """
+        The device arguments are accepted and ignored; streams open
+        ``self.device``.
+        """
+        return AlsaStream(
+            self.device,
+            rate=rate,
+            channels=channels,
+            frames=frames,
+            input=input,
+            output=output,
+            callback=callback,
+            chunk_periods=self.chunk_periods,
+            periods=self.periods,
+        )
+
+    def close(self):
+        pass
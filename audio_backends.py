@@ -0,0 +1,633 @@
+"""
+Audio backends: where DailyCall's audio comes from and goes to
+
+A backend opens streams of 16-bit interleaved frames:
+
+    stream = backend.open(rate=16000, channels=1, frames=640, input=True)
+
+and every stream, whatever the backend, has
+
+- ``read_into(buffer)``: fill a writable buffer of ``frames`` frames,
+  returning the frame count
+- ``write(buffer)``: play bytes or a read-only buffer of whole frames
+- ``start()``, ``stop()`` and ``close()``
+- ``xruns``, and ``input_latency``/``output_latency`` in seconds
+
+Opened with a ``callback``, the stream calls ``callback(in_data, frames,
+status)`` once per ``frames`` from its own thread after ``start()``. It
+returns ``(out_data, flag)``; the stream stops once ``flag`` is
+``CALLBACK_COMPLETE``. ``status`` has ``INPUT_OVERFLOW`` and
+``OUTPUT_UNDERFLOW`` set after an xrun. The values match PyAudio's.
+"""
+
+import importlib
+import os
+import threading
+import time
+import wave
+
+CALLBACK_CONTINUE = 0
+CALLBACK_COMPLETE = 1
+INPUT_OVERFLOW = 0x2
+OUTPUT_UNDERFLOW = 0x4
+SAMPLE_WIDTH = 2
+
+# PyAudio instance shared by every PyAudioBackend in the process
+_pyaudio_lock = threading.Lock()
+_pyaudio = None
+_pyaudio_users = 0
+
+
+class PyAudioBackend:
+    """
+    PortAudio through PyAudio, the default.
+    """
+
+    name = "pyaudio"
+
+    def __init__(self):
+        global _pyaudio, _pyaudio_users
+        import pyaudio
+
+        self.__pyaudio = pyaudio
+        with _pyaudio_lock:
+            if _pyaudio is None:
+                _pyaudio = pyaudio.PyAudio()
+            _pyaudio_users += 1
+            self.__interface = _pyaudio
+        self.__closed = False
+
+    def open(
+        self,
+        *,
+        rate,
+        channels,
+        frames,
+        input=False,
+        output=False,
+        input_device=None,
+        output_device=None,
+        callback=None,
+    ):
+        """
+        :param input_device: PyAudio device index, default if None.
+        :param output_device: PyAudio device index, default if None.
+        """
+        return PyAudioStream(
+            self.__interface,
+            self.__pyaudio.paInt16,
+            rate=rate,
+            channels=channels,
+            frames=frames,
+            input=input,
+            output=output,
+            input_device=input_device,
+            output_device=output_device,
+            callback=callback,
+        )
+
+    def close(self):
+        """
+        Terminate the shared PyAudio instance once its last user is done.
+        """
+        global _pyaudio, _pyaudio_users
+        if self.__closed:
+            return
+        self.__closed = True
+        with _pyaudio_lock:
+            _pyaudio_users -= 1
+            if _pyaudio_users == 0:
+                _pyaudio.terminate()
+                _pyaudio = None
+
+
+class PyAudioStream:
+    def __init__(
+        self,
+        interface,
+        format,
+        *,
+        rate,
+        channels,
+        frames,
+        input,
+        output,
+        input_device,
+        output_device,
+        callback,
+    ):
+        self.__frames = frames
+        self.__frame_bytes = channels * SAMPLE_WIDTH
+        self.__callback = callback
+        self.__stream = interface.open(
+            format=format,
+            channels=channels,
+            rate=rate,
+            input=input,
+            output=output,
+            input_device_index=input_device,
+            output_device_index=output_device,
+            frames_per_buffer=frames,
+            stream_callback=self.__on_audio if callback else None,
+            start=callback is None,
+        )
+        self.xruns = 0
+
+    @property
+    def input_latency(self):
+        return self.__stream.get_input_latency()
+
+    @property
+    def output_latency(self):
+        return self.__stream.get_output_latency()
+
+    def start(self):
+        self.__stream.start_stream()
+
+    def stop(self):
+        self.__stream.stop_stream()
+
+    def close(self):
+        self.__stream.close()
+
+    def read_into(self, buffer):
+        # PyAudio only returns new bytes; this copy is what read_into costs
+        data = self.__stream.read(self.__frames, exception_on_overflow=False)
+        size = len(data)
+        buffer[:size] = data
+        return size // self.__frame_bytes
+
+    def write(self, buffer):
+        self.__stream.write(buffer, len(buffer) // self.__frame_bytes)
+
+    def __on_audio(self, in_data, frame_count, time_info, status):
+        if status:
+            self.xruns += 1
+        return self.__callback(in_data, frame_count, status)
+
+
+class SoundDeviceBackend:
+    """
+    PortAudio through sounddevice. Blocking streams use its raw streams;
+    callback streams get NumPy arrays straight from PortAudio.
+    """
+
+    name = "sounddevice"
+
+    def __init__(self, latency="low"):
+        """
+        :param latency: PortAudio latency, ``"low"``, ``"high"`` or seconds.
+        """
+        import sounddevice
+
+        self.__sounddevice = sounddevice
+        self.latency = latency
+
+    def open(
+        self,
+        *,
+        rate,
+        channels,
+        frames,
+        input=False,
+        output=False,
+        input_device=None,
+        output_device=None,
+        callback=None,
+    ):
+        """
+        :param input_device: sounddevice device index or name, default if None.
+        :param output_device: sounddevice device index or name, default if None.
+        """
+        return SoundDeviceStream(
+            self.__sounddevice,
+            rate=rate,
+            channels=channels,
+            frames=frames,
+            input=input,
+            output=output,
+            input_device=input_device,
+            output_device=output_device,
+            callback=callback,
+            latency=self.latency,
+        )
+
+    def close(self):
+        pass
+
+
+class SoundDeviceStream:
+    def __init__(
+        self,
+        sounddevice,
+        *,
+        rate,
+        channels,
+        frames,
+        input,
+        output,
+        input_device,
+        output_device,
+        callback,
+        latency,
+    ):
+        self.__sounddevice = sounddevice
+        self.__frames = frames
+        self.__frame_bytes = channels * SAMPLE_WIDTH
+        self.__callback = callback
+        self.xruns = 0
+
+        options = {
+            "samplerate": rate,
+            "channels": channels,
+            "dtype": "int16",
+            "blocksize": frames,
+            "latency": latency,
+        }
+        if input and output:
+            options["device"] = (input_device, output_device)
+            kind = "Stream"
+        elif input:
+            options["device"] = input_device
+            kind = "InputStream"
+        else:
+            options["device"] = output_device
+            kind = "OutputStream"
+        if callback is None:
+            self.__stream = getattr(sounddevice, "Raw" + kind)(**options)
+            self.__stream.start()
+        else:
+            wrappers = {
+                "Stream": self.__on_duplex,
+                "InputStream": self.__on_input,
+                "OutputStream": self.__on_output,
+            }
+            self.__stream = getattr(sounddevice, kind)(
+                callback=wrappers[kind], **options
+            )
+
+    @property
+    def input_latency(self):
+        latency = self.__stream.latency
+        return latency[0] if isinstance(latency, tuple) else latency
+
+    @property
+    def output_latency(self):
+        latency = self.__stream.latency
+        return latency[-1] if isinstance(latency, tuple) else latency
+
+    def start(self):
+        self.__stream.start()
+
+    def stop(self):
+        self.__stream.stop()
+
+    def close(self):
+        self.__stream.close()
+
+    def read_into(self, buffer):
+        data, overflowed = self.__stream.read(self.__frames)
+        if overflowed:
+            self.xruns += 1
+        size = len(data)
+        buffer[:size] = data
+        return size // self.__frame_bytes
+
+    def write(self, buffer):
+        if self.__stream.write(buffer):
+            self.xruns += 1
+
+    def __on_duplex(self, indata, outdata, frames, time_info, status):
+        self.__run_callback(indata, outdata, frames, status)
+
+    def __on_input(self, indata, frames, time_info, status):
+        self.__run_callback(indata, None, frames, status)
+
+    def __on_output(self, outdata, frames, time_info, status):
+        self.__run_callback(None, outdata, frames, status)
+
+    def __run_callback(self, indata, outdata, frames, status):
+        flags = 0
+        if status.input_overflow:
+            flags |= INPUT_OVERFLOW
+        if status.output_underflow:
+            flags |= OUTPUT_UNDERFLOW
+        if flags:
+            self.xruns += 1
+        in_data = memoryview(indata).cast("B") if indata is not None else None
+        out_data, flag = self.__callback(in_data, frames, flags)
+        if outdata is not None:
+            memoryview(outdata).cast("B")[:] = out_data
+        if flag != CALLBACK_CONTINUE:
+            raise self.__sounddevice.CallbackStop
+
+
+class NullBackend:
+    """
+    No sound card: capture is silence, playback is discarded, both at the
+    pace a real card would keep. Runs the call engine headless.
+    """
+
+    name = "null"
+
+    def open(
+        self,
+        *,
+        rate,
+        channels,
+        frames,
+        input=False,
+        output=False,
+        input_device=None,
+        output_device=None,
+        callback=None,
+    ):
+        """
+        The device arguments are accepted and ignored.
+        """
+        return ClockedStream(
+            rate=rate,
+            channels=channels,
+            frames=frames,
+            input=input,
+            output=output,
+            callback=callback,
+        )
+
+    def close(self):
+        pass
+
+
+class FileBackend:
+    """
+    Capture replays a WAV file and playback is optionally written to one,
+    in real time, for reproducible runs without a microphone.
+    """
+
+    name = "file"
+
+    def __init__(self, path=None, output_path=None, loop=True):
+        """
+        :param path: WAV file to capture from. Defaults to
+            ``$AUDIO_REPLAY_FILE``; silence if neither is set.
+        :param output_path: WAV file to write playback to, if any.
+        :param loop: Start the file over when it ends, instead of
+            continuing with silence.
+        """
+        self.path = path or os.getenv("AUDIO_REPLAY_FILE")
+        self.output_path = output_path
+        self.loop = loop
+
+    def open(
+        self,
+        *,
+        rate,
+        channels,
+        frames,
+        input=False,
+        output=False,
+        input_device=None,
+        output_device=None,
+        callback=None,
+    ):
+        """
+        The device arguments are accepted and ignored. The WAV file must
+        be 16-bit at ``rate`` with ``channels`` channels.
+        """
+        source = None
+        if input and self.path:
+            source = WavSource(self.path, rate=rate, channels=channels, loop=self.loop)
+        sink = None
+        if output and self.output_path:
+            sink = wave.open(self.output_path, "wb")
+            sink.setnchannels(channels)
+            sink.setsampwidth(SAMPLE_WIDTH)
+            sink.setframerate(rate)
+        return ClockedStream(
+            rate=rate,
+            channels=channels,
+            frames=frames,
+            input=input,
+            output=output,
+            callback=callback,
+            source=source,
+            sink=sink,
+        )
+
+    def close(self):
+        pass
+
+
+class WavSource:
+    """
+    Frames of a WAV file, loaded once, handed out a buffer at a time.
+    """
+
+    def __init__(self, path, *, rate, channels, loop=True):
+        with wave.open(path, "rb") as f:
+            found = (f.getframerate(), f.getnchannels(), f.getsampwidth())
+            if found != (rate, channels, SAMPLE_WIDTH):
+                raise ValueError(
+                    f"{path} is {found[0]} Hz, {found[1]} channels,"
+                    f" {found[2] * 8}-bit; expected {rate} Hz, {channels}"
+                    f" channels, 16-bit"
+                )
+            self.__data = memoryview(f.readframes(f.getnframes()))
+        self.__position = 0
+        self.__loop = loop
+
+    def read_into(self, buffer):
+        size = len(buffer)
+        filled = 0
+        while filled < size:
+            remaining = len(self.__data) - self.__position
+            if remaining == 0:
+                if not self.__loop or not self.__data:
+                    buffer[filled:size] = bytes(size - filled)
+                    return
+                self.__position = 0
+                continue
+            step = min(size - filled, remaining)
+            buffer[filled : filled + step] = self.__data[
+                self.__position : self.__position + step
+            ]
+            filled += step
+            self.__position += step
+
+    def close(self):
+        self.__data.release()
+
+
+class ClockedStream:
+    """
+    A stream that keeps a sound card's time without one: reads and writes
+    block until their period is due, and a callback runs once a period.
+    Falling more than a period behind counts as an xrun.
+    """
+
+    def __init__(
+        self,
+        *,
+        rate,
+        channels,
+        frames,
+        input,
+        output,
+        callback=None,
+        source=None,
+        sink=None,
+    ):
+        """
+        :param source: Has ``read_into(buffer)``; silence if None.
+        :param sink: Has ``writeframes(buffer)``; discarded if None.
+        """
+        self.__frames = frames
+        self.__frame_bytes = channels * SAMPLE_WIDTH
+        self.__period = frames / rate
+        self.__input = input
+        self.__output = output
+        self.__callback = callback
+        self.__source = source
+        self.__sink = sink
+        self.__in = bytearray(frames * self.__frame_bytes)
+        self.__in_view = memoryview(self.__in).toreadonly()
+        self.__silence = bytes(len(self.__in))
+        self.__next_read = None
+        self.__next_write = None
+        self.__thread = None
+        self.__running = False
+        self.xruns = 0
+        self.input_latency = 0.0
+        self.output_latency = 0.0
+
+    def start(self):
+        if self.__callback is None or self.__running:
+            return
+        self.__running = True
+        self.__thread = threading.Thread(
+            target=self.__run_callback, name="clocked-stream", daemon=True
+        )
+        self.__thread.start()
+
+    def stop(self):
+        self.__running = False
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        self.__next_read = None
+        self.__next_write = None
+
+    def close(self):
+        self.stop()
+        if self.__source is not None:
+            self.__source.close()
+            self.__source = None
+        if self.__sink is not None:
+            self.__sink.close()
+            self.__sink = None
+
+    def read_into(self, buffer):
+        self.__next_read = self.__wait(self.__next_read)
+        self.__fill(buffer)
+        return self.__frames
+
+    def write(self, buffer):
+        self.__next_write = self.__wait(self.__next_write)
+        if self.__sink is not None:
+            self.__sink.writeframes(buffer)
+
+    def __fill(self, buffer):
+        if self.__source is not None:
+            self.__source.read_into(buffer)
+        else:
+            buffer[: len(self.__silence)] = self.__silence
+
+    def __wait(self, deadline):
+        now = time.monotonic()
+        if deadline is None or now - deadline > self.__period:
+            if deadline is not None:
+                self.xruns += 1
+            deadline = now
+        elif deadline > now:
+            time.sleep(deadline - now)
+        return deadline + self.__period
+
+    def __run_callback(self):
+        deadline = None
+        while self.__running:
+            xruns = self.xruns
+            deadline = self.__wait(deadline)
+            status = 0
+            if self.xruns != xruns:
+                status = INPUT_OVERFLOW | OUTPUT_UNDERFLOW
+            in_data = None
+            if self.__input:
+                self.__fill(self.__in)
+                in_data = self.__in_view
+            out_data, flag = self.__callback(in_data, self.__frames, status)
+            if self.__output and self.__sink is not None:
+                self.__sink.writeframes(out_data)
+            if flag != CALLBACK_CONTINUE:
+                self.__running = False
+
+
+def _alsa_backend(**options):
+    from alsa_pcm import AlsaBackend
+
+    return AlsaBackend(**options)
+
+
+BACKENDS = {
+    "pyaudio": PyAudioBackend,
+    "sounddevice": SoundDeviceBackend,
+    "alsa": _alsa_backend,
+    "file": FileBackend,
+    "null": NullBackend,
+}
+
+
+# What each backend imports when it is created, for preload()
+BACKEND_MODULES = {
+    "pyaudio": "pyaudio",
+    "sounddevice": "sounddevice",
+    "alsa": "alsa_pcm",
+}
+
+
+def default_backend_name():
+    return os.getenv("AUDIO_BACKEND", "pyaudio")
+
+
+def default_device_format(rate, channels):
+    """
+    ``(rate, channels)`` to open the sound card with when the caller does
+    not say: ``$AUDIO_DEVICE_RATE`` and ``$AUDIO_DEVICE_CHANNELS`` where
+    set, else the ones given. A ``hw:`` device such as the WM8960's only
+    opens in its own format (48000 Hz, 2 channels).
+    """
+    return (
+        int(os.getenv("AUDIO_DEVICE_RATE") or rate),
+        int(os.getenv("AUDIO_DEVICE_CHANNELS") or channels),
+    )
+
+
+def preload(name=None):
+    """
+    Import what the backend needs ahead of time, see ``vapi_python.preload``.
+    """
+    module = BACKEND_MODULES.get(name or default_backend_name())
+    if module is not None:
+        importlib.import_module(module)
+
+
+def open_backend(name=None, **options):
+    """
+    :param name: One of ``BACKENDS``. Defaults to ``$AUDIO_BACKEND``,
+        then ``"pyaudio"``.
+    :param options: Passed to the backend's constructor.
+    """
+    if name is None:
+        name = default_backend_name()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown audio backend: {name}")
+    return BACKENDS[name](**options)
@@ -0,0 +1,12 @@
+"""
+Audio format shared by the call and the sound card setup scripts
+
+Kept free of imports so standalone tools such as ``alsa_config`` can use
+it without pulling in daily-python and the call stack.
+"""
+
+# Daily's virtual devices and the Vapi bot both speak 16 kHz mono
+SAMPLE_RATE = 16000
+NUM_CHANNELS = 1
+CHUNK_SIZE = 640
+CHUNK_BYTES = CHUNK_SIZE * NUM_CHANNELS * 2
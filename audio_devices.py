@@ -0,0 +1,284 @@
+"""
+Audio device lookup by name and role, cached across runs
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+ASOUND_DIR = "/proc/asound"
+# What decides the PortAudio device list besides the cards themselves
+ALSA_CONFIG_FILES = ("/etc/asound.conf", "~/.asoundrc")
+PULSE_SOCKET = "pulse/native"
+
+CACHE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", "~/.cache"), "assistant", "audio-devices.json"
+)
+
+WM8960_NAMES = ("wm8960", "soundcard")
+
+ROLE_INPUT = "input"
+ROLE_OUTPUT = "output"
+
+ROLES = (ROLE_INPUT, ROLE_OUTPUT)
+
+# How often the hotplug watcher checks the cards when pyudev is missing
+POLL_INTERVAL = 2
+
+# " 2 [wm8960soundcard]: simple-card - wm8960-soundcard"
+CARD_LINE = re.compile(r"^\s*(\d+)\s+\[(\S+)\s*\]:\s*(.*)$")
+
+_cache_lock = threading.Lock()
+_cached = None
+_listeners = []
+_watcher = None
+
+
+def audio_state_key():
+    """
+    Fingerprint of everything the PortAudio device list depends on: the
+    ALSA cards and PCMs, the ALSA configuration and whether PulseAudio is
+    running. Device indices are stable while it is unchanged.
+    """
+    digest = hashlib.sha1()
+    paths = [os.path.join(ASOUND_DIR, "cards"), os.path.join(ASOUND_DIR, "pcm")]
+    paths += [os.path.expanduser(path) for path in ALSA_CONFIG_FILES]
+    for path in paths:
+        digest.update(path.encode())
+        try:
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(b"-")
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR", f"/run/user/{os.getuid()}")
+    pulse = os.path.exists(os.path.join(runtime_dir, PULSE_SOCKET))
+    digest.update(b"pulse" if pulse else b"-")
+    return digest.hexdigest()
+
+
+def list_devices(audio=None, refresh=False):
+    """
+    Every PortAudio device, as the dicts ``get_device_info_by_index``
+    returns plus ``hostApiName``, ``defaultInput`` and ``defaultOutput``.
+
+    The list is kept in memory and in ``CACHE_PATH`` under the current
+    ``audio_state_key``, so PyAudio (which probes every ALSA, JACK and OSS
+    backend on start) is only started when the audio setup changed.
+
+    :param audio: PyAudio instance to probe with; a private one if None.
+    :param refresh: Probe even if the cache is current.
+    """
+    global _cached
+    key = audio_state_key()
+    with _cache_lock:
+        devices = None
+        if not refresh:
+            if _cached is not None and _cached[0] == key:
+                return _cached[1]
+            devices = _load_cache(key)
+        if devices is None:
+            devices = _probe(audio)
+            _save_cache(key, devices)
+        _cached = (key, devices)
+    return devices
+
+
+def find_device(role, names=WM8960_NAMES, audio=None):
+    """
+    The last device whose name contains one of ``names`` and that has
+    channels for ``role``, as ``list_devices`` describes it, or None.
+
+    :param role: ``ROLE_INPUT`` or ``ROLE_OUTPUT``.
+    """
+    if role not in ROLES:
+        raise ValueError(f"Unknown device role: {role}")
+    channels = "maxInputChannels" if role == ROLE_INPUT else "maxOutputChannels"
+    found = None
+    for device in list_devices(audio):
+        name = device["name"].lower()
+        if any(part in name for part in names) and device[channels] > 0:
+            found = device
+    return found
+
+
+def find_wm8960_devices(audio=None):
+    """Find WM8960 input and output device indices"""
+    indices = []
+    for role in ROLES:
+        device = find_device(role, audio=audio)
+        if device is None:
+            indices.append(None)
+            continue
+        print(f"Found WM8960 {role} device: {device['index']} - {device['name']}")
+        indices.append(device["index"])
+    return tuple(indices)
+
+
+def list_alsa_cards():
+    """
+    The ALSA sound cards as (number, id, description) tuples.
+    """
+    cards = []
+    try:
+        with open(os.path.join(ASOUND_DIR, "cards")) as f:
+            for line in f:
+                match = CARD_LINE.match(line)
+                if match:
+                    cards.append((int(match[1]), match[2], match[3]))
+    except OSError:
+        pass
+    return cards
+
+
+def find_alsa_card_info(names=WM8960_NAMES):
+    """
+    The first ALSA card whose id or description contains one of ``names``,
+    as a (number, id, description) tuple, or None.
+    """
+    for card in list_alsa_cards():
+        text = f"{card[1]} {card[2]}".lower()
+        if any(part in text for part in names):
+            return card
+    return None
+
+
+def find_alsa_card(names=WM8960_NAMES):
+    """
+    Number of the first ALSA card whose id or description contains one of
+    ``names``, or None.
+    """
+    card = find_alsa_card_info(names)
+    return card[0] if card is not None else None
+
+
+def invalidate():
+    """
+    Forget the cached device list, in memory and on disk.
+    """
+    global _cached
+    with _cache_lock:
+        _cached = None
+        try:
+            os.remove(os.path.expanduser(CACHE_PATH))
+        except OSError:
+            pass
+
+
+def watch_devices(callback):
+    """
+    Call ``callback()`` on a background thread whenever a sound card is
+    added or removed, after the cache has been invalidated.
+
+    Uses udev events when pyudev is installed and otherwise polls the
+    ALSA state every ``POLL_INTERVAL`` seconds. Note that a running
+    PyAudio instance keeps the device list it started with, so streams
+    must be reopened on a new instance to see the change.
+    """
+    global _watcher
+    with _cache_lock:
+        _listeners.append(callback)
+        if _watcher is None:
+            _watcher = threading.Thread(
+                target=_watch, name="audio-devices", daemon=True
+            )
+            _watcher.start()
+
+
+def _watch():
+    try:
+        import pyudev
+    except ImportError:
+        pyudev = None
+
+    monitor = None
+    if pyudev is not None:
+        monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+        monitor.filter_by("sound")
+
+    key = audio_state_key()
+    while True:
+        if monitor is not None:
+            monitor.poll(POLL_INTERVAL)
+        else:
+            time.sleep(POLL_INTERVAL)
+        # One card change comes as several udev events; the state key
+        # makes them a single notification
+        new_key = audio_state_key()
+        if new_key == key:
+            continue
+        key = new_key
+        invalidate()
+        for callback in list(_listeners):
+            try:
+                callback()
+            except Exception as e:
+                print(f"Audio device listener failed: {e}")
+
+
+def _probe(audio):
+    import pyaudio
+
+    own_audio = audio is None
+    if own_audio:
+        audio = pyaudio.PyAudio()
+    try:
+        defaults = {}
+        for role, lookup in (
+            ("defaultInput", audio.get_default_input_device_info),
+            ("defaultOutput", audio.get_default_output_device_info),
+        ):
+            try:
+                defaults[role] = lookup()["index"]
+            except OSError:
+                # PortAudio has no default device for this direction
+                defaults[role] = None
+
+        devices = []
+        for i in range(audio.get_device_count()):
+            device = dict(audio.get_device_info_by_index(i))
+            host_api = audio.get_host_api_info_by_index(device["hostApi"])
+            device["hostApiName"] = host_api["name"]
+            for role, index in defaults.items():
+                device[role] = index == i
+            devices.append(device)
+        return devices
+    finally:
+        if own_audio:
+            audio.terminate()
+
+
+def _load_cache(key):
+    try:
+        with open(os.path.expanduser(CACHE_PATH)) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cache.get("key") != key:
+        return None
+    return cache.get("devices")
+
+
+def _save_cache(key, devices):
+    path = os.path.expanduser(CACHE_PATH)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so a concurrent reader never sees half a file
+        temporary = f"{path}.{os.getpid()}"
+        with open(temporary, "w") as f:
+            json.dump({"key": key, "devices": devices}, f)
+        os.replace(temporary, path)
+    except OSError as e:
+        print(f"Could not cache audio devices: {e}")
+
+
+if __name__ == "__main__":
+    for device in list_devices(refresh=True):
+        print(
+            f"{device['index']}: {device['name']} ({device['hostApiName']}, "
+            f"in {device['maxInputChannels']}, out {device['maxOutputChannels']})"
+        )
+    for number, card_id, description in list_alsa_cards():
+        print(f"card {number}: {card_id} - {description}")
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Audio diagnostics: concurrent probes, cached, with JSON output
+
+Usable as a pre-flight check before starting the assistant:
+
+    python3 audio_diagnostics.py --preflight
+
+exits with status 1 when the WM8960 card or its PortAudio devices are
+missing. ``--json`` prints the whole report.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from audio_devices import (
+    ASOUND_DIR,
+    CACHE_PATH,
+    WM8960_NAMES,
+    audio_state_key,
+    find_alsa_card,
+    list_alsa_cards,
+    list_devices,
+)
+
+# A probe that takes longer than this is reported as failed
+PROBE_TIMEOUT = 5
+# Reports are reused for this long while the audio setup is unchanged
+CACHE_SECONDS = 300
+REPORT_CACHE_PATH = os.path.join(os.path.dirname(CACHE_PATH), "diagnostics.json")
+
+ENVIRONMENT_VARIABLES = (
+    "ALSA_CARD",
+    "ALSA_DEVICE",
+    "PULSE_SERVER",
+    "PULSE_SINK",
+    "AUDIO_BACKEND",
+    "AUDIO_ALSA_DEVICE",
+)
+
+
+def probe_alsa():
+    """
+    Cards and PCM devices, read from /proc/asound instead of aplay/arecord.
+    """
+    pcms = []
+    try:
+        with open(os.path.join(ASOUND_DIR, "pcm")) as f:
+            for line in f:
+                # "02-00: id : name : playback 1 : capture 1"
+                fields = [field.strip() for field in line.split(" : ")]
+                address, _, pcm_id = fields[0].partition(":")
+                card, _, device = address.partition("-")
+                pcms.append(
+                    {
+                        "card": int(card),
+                        "device": int(device),
+                        "id": pcm_id.strip(),
+                        "name": fields[1] if len(fields) > 1 else "",
+                        "playback": any(f.startswith("playback") for f in fields),
+                        "capture": any(f.startswith("capture") for f in fields),
+                    }
+                )
+    except OSError:
+        pass
+
+    cards = [
+        {"card": number, "id": card_id, "description": description}
+        for number, card_id, description in list_alsa_cards()
+    ]
+    return {"cards": cards, "pcms": pcms, "wm8960_card": find_alsa_card()}
+
+
+def probe_pulseaudio():
+    """
+    Whether PulseAudio answers, its defaults, sinks and sources.
+    """
+    from pulse_control import PulseControl, PulseError
+
+    # A connection of its own so a slow server cannot hold up other users
+    control = PulseControl(client_name="assistant-diagnostics")
+    try:
+        info = control.server_info()
+        with control.batch():
+            sinks = control.list_sinks()
+            sources = control.list_sources()
+    except PulseError as e:
+        return {"running": False, "error": str(e)}
+    finally:
+        control.close()
+    return {
+        "running": True,
+        **info,
+        "sinks": [{"index": index, "name": name} for index, name in sinks],
+        "sources": [{"index": index, "name": name} for index, name in sources],
+    }
+
+
+def probe_portaudio():
+    """
+    PortAudio devices as PyAudio sees them, from the device cache when it
+    is current.
+    """
+    devices = list_devices()
+    summary = []
+    for device in devices:
+        summary.append(
+            {
+                "index": device["index"],
+                "name": device["name"],
+                "host_api": device["hostApiName"],
+                "input_channels": device["maxInputChannels"],
+                "output_channels": device["maxOutputChannels"],
+                "default_sample_rate": device["defaultSampleRate"],
+                "default_input": device.get("defaultInput", False),
+                "default_output": device.get("defaultOutput", False),
+                "wm8960": any(part in device["name"].lower() for part in WM8960_NAMES),
+            }
+        )
+    return {"devices": summary}
+
+
+def probe_environment():
+    """
+    Variables and files that change which device is the default.
+    """
+    asoundrc = os.path.expanduser("~/.asoundrc")
+    return {
+        "variables": {
+            name: os.environ[name]
+            for name in ENVIRONMENT_VARIABLES
+            if name in os.environ
+        },
+        "asoundrc": os.path.exists(asoundrc),
+    }
+
+
+PROBES = {
+    "alsa": probe_alsa,
+    "pulseaudio": probe_pulseaudio,
+    "portaudio": probe_portaudio,
+    "environment": probe_environment,
+}
+
+
+def run_diagnostics(refresh=False, timeout=PROBE_TIMEOUT):
+    """
+    Run every probe at once and collect a JSON-serializable report.
+
+    A report younger than ``CACHE_SECONDS`` is returned as is while
+    ``audio_state_key`` is unchanged, so a pre-flight check on every
+    start normally costs a few file reads.
+
+    :param refresh: Ignore the cached report.
+    :param timeout: Seconds to wait for the probes.
+    """
+    key = audio_state_key()
+    if not refresh:
+        report = _load_report(key)
+        if report is not None:
+            report["cached"] = True
+            return report
+
+    start = time.monotonic()
+    finished = {}
+    # Daemon threads: the probes wait on files, sockets and subprocesses,
+    # and a hung one must not keep the check (or the process) from ending
+    threads = [
+        threading.Thread(target=_run_probe, args=(name, probe, finished), daemon=True)
+        for name, probe in PROBES.items()
+    ]
+    for thread in threads:
+        thread.start()
+    deadline = start + timeout
+    for thread in threads:
+        thread.join(max(0, deadline - time.monotonic()))
+    results = {}
+    for name in PROBES:
+        results[name] = finished.get(
+            name, {"ok": False, "error": f"Timed out after {timeout}s"}
+        )
+
+    report = {
+        "key": key,
+        "created": time.time(),
+        "duration_ms": round((time.monotonic() - start) * 1000),
+        "cached": False,
+        "probes": results,
+        "checks": _checks(results),
+    }
+    report["ok"] = all(report["checks"].values())
+    if all(result["ok"] for result in results.values()):
+        _save_report(report)
+    return report
+
+
+def _run_probe(name, probe, finished):
+    try:
+        finished[name] = {"ok": True, **probe()}
+    except Exception as e:
+        finished[name] = {"ok": False, "error": repr(e)}
+
+
+def _checks(results):
+    alsa = results["alsa"]
+    portaudio = results["portaudio"]
+    wm8960 = [device for device in portaudio.get("devices", []) if device["wm8960"]]
+    return {
+        "wm8960_card": alsa.get("wm8960_card") is not None,
+        "wm8960_input": any(device["input_channels"] > 0 for device in wm8960),
+        "wm8960_output": any(device["output_channels"] > 0 for device in wm8960),
+    }
+
+
+def _load_report(key):
+    try:
+        with open(os.path.expanduser(REPORT_CACHE_PATH)) as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if report.get("key") != key or time.time() - report["created"] > CACHE_SECONDS:
+        return None
+    return report
+
+
+def _save_report(report):
+    path = os.path.expanduser(REPORT_CACHE_PATH)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}"
+        with open(temporary, "w") as f:
+            json.dump(report, f)
+        os.replace(temporary, path)
+    except OSError as e:
+        print(f"Could not cache diagnostics: {e}", file=sys.stderr)
+
+
+def print_report(report):
+    probes = report["probes"]
+    source = "cached" if report["cached"] else f"{report['duration_ms']} ms"
+    print(f"🎧 Audio diagnostics ({source})")
+
+    alsa = probes["alsa"]
+    print("\n🎵 ALSA cards:")
+    for card in alsa.get("cards", []):
+        print(f"  {card['card']}: {card['id']} - {card['description']}")
+
+    pulse = probes["pulseaudio"]
+    if pulse.get("running"):
+        print(f"\n✅ PulseAudio is running ({pulse['server_name']})")
+        print(f"  Default sink: {pulse['default_sink']}")
+        print(f"  Default source: {pulse['default_source']}")
+    else:
+        print(f"\n❌ PulseAudio is not running: {pulse.get('error')}")
+
+    print("\n🔊 PortAudio devices:")
+    for device in probes["portaudio"].get("devices", []):
+        marks = " ⭐" if device["wm8960"] else ""
+        print(
+            f"  {device['index']}: {device['name']} ({device['host_api']}, "
+            f"in {device['input_channels']}, out {device['output_channels']}){marks}"
+        )
+
+    print()
+    for name, probe in probes.items():
+        if not probe["ok"]:
+            print(f"⚠️  {name} probe failed: {probe['error']}")
+    for name, passed in report["checks"].items():
+        print(f"{'✅' if passed else '❌'} {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument(
+        "--refresh", action="store_true", help="probe even if a report is cached"
+    )
+    parser.add_argument(
+        "--preflight",
+        action="store_true",
+        help="print nothing unless a check fails; exit 1 if one does",
+    )
+    parser.add_argument("--timeout", type=float, default=PROBE_TIMEOUT)
+    args = parser.parse_args()
+
+    report = run_diagnostics(refresh=args.refresh, timeout=args.timeout)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    elif args.preflight:
+        for name, passed in report["checks"].items():
+            if not passed:
+                print(f"❌ Audio pre-flight check failed: {name}", file=sys.stderr)
+    else:
+        print_report(report)
+
+    if args.preflight and not report["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
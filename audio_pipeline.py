@@ -0,0 +1,437 @@
+"""
+Real-time DSP pipelines for the capture and playback paths
+
+A ``Pipeline`` converts a block of int16 device bytes to float32 once,
+runs it through an ordered list of stages, and converts the result back
+to int16 once. Stages take and return float32 arrays of shape (frames,
+channels) and work in buffers they allocate up front for the largest
+block, so a steady stream of blocks allocates nothing.
+
+Each stage is timed on every block against the processing budget it
+declares, and stages that keep the format can be bypassed while the
+pipeline runs. With every such stage bypassed and no format change the
+pipeline hands blocks through untouched.
+
+    pipeline = capture_pipeline(
+        device_rate=48000,
+        device_channels=2,
+        rate=16000,
+        device_chunk_frames=1920,
+        stages=[Gain(6), Meter()],
+    )
+    mono = pipeline.process(device_bytes)
+"""
+
+import math
+import time
+
+import numpy as np
+
+from audio_resampler import PolyphaseResampler, round_to_int16_range
+from latency_stats import LatencyHistogram
+
+# Processing time a stage may take per block unless it declares its own
+DEFAULT_BUDGET_MS = 1.0
+# Meter levels are relative to int16 full scale
+FULL_SCALE = 32768.0
+
+
+class Stage:
+    """
+    One step of a ``Pipeline``.
+
+    Subclasses override ``process`` and, if they change the rate, channel
+    count or block size, ``configure``. A stage that keeps the format may
+    work in place on the block it is given.
+    """
+
+    name = "stage"
+    budget_ms = DEFAULT_BUDGET_MS
+
+    def __init__(self, *, name=None, budget_ms=None, bypass=False):
+        """
+        :param name: Unique within a pipeline; defaults to the class's.
+        :param budget_ms: Processing time allowed per block.
+        :param bypass: Start bypassed.
+        """
+        if name is not None:
+            self.name = name
+        if budget_ms is not None:
+            self.budget_ms = budget_ms
+        self.bypass = bypass
+
+    def configure(self, rate, channels, max_frames):
+        """
+        Allocate buffers for blocks of up to ``max_frames`` frames.
+
+        :return: (rate, channels, max_frames) of the blocks this stage
+            returns.
+        """
+        return rate, channels, max_frames
+
+    def process(self, block):
+        """
+        :param block: float32 array of shape (frames, channels).
+        :return: float32 array in the format ``configure`` returned.
+        """
+        return block
+
+
+class Mixdown(Stage):
+    """
+    Any number of channels to one, by averaging or with a ``stereo_mic``
+    front end.
+    """
+
+    name = "mixdown"
+
+    def __init__(self, mixer=None, **options):
+        """
+        :param mixer: Object with ``mix(frames, out)`` that replaces
+            averaging, e.g. from ``stereo_mic.create_front_end``.
+        """
+        super().__init__(**options)
+        self.mixer = mixer
+
+    def configure(self, rate, channels, max_frames):
+        # Averaging the channels is a dot product with equal weights
+        self.__weights = np.full(channels, 1 / channels, np.float32)
+        self.__mono = np.zeros(max_frames, np.float32)
+        self.__views = {}
+        return rate, 1, max_frames
+
+    def process(self, block):
+        views = self.__views.get(len(block))
+        if views is None:
+            mono = self.__mono[: len(block)]
+            views = self.__views[len(block)] = (mono, mono[:, None])
+        mono, column = views
+        if self.mixer is not None:
+            self.mixer.mix(block, mono)
+        else:
+            np.dot(block, self.__weights, out=mono)
+        return column
+
+
+class Upmix(Stage):
+    """
+    One channel to ``channels`` identical ones.
+    """
+
+    name = "upmix"
+
+    def __init__(self, channels, **options):
+        super().__init__(**options)
+        self.channels = channels
+
+    def configure(self, rate, channels, max_frames):
+        if channels != 1:
+            raise ValueError("Upmix takes a mono block")
+        self.__frames = np.zeros((max_frames, self.channels), np.float32)
+        return rate, self.channels, max_frames
+
+    def process(self, block):
+        out = self.__frames[: len(block)]
+        # Broadcasting duplicates the column into every channel
+        np.copyto(out, block)
+        return out
+
+
+class Resample(Stage):
+    """
+    Mono sample-rate conversion with ``PolyphaseResampler``.
+    """
+
+    name = "resample"
+
+    def __init__(self, rate, **options):
+        """
+        :param rate: Output rate.
+        """
+        super().__init__(**options)
+        self.rate = rate
+
+    def configure(self, rate, channels, max_frames):
+        if channels != 1:
+            raise ValueError("Resample takes a mono block")
+        self.__resampler = PolyphaseResampler(rate, self.rate, max_frames)
+        self.__input = np.zeros(max_frames, np.float32)
+        self.__views = {}
+        return self.rate, 1, -(-max_frames * self.rate // rate) + 1
+
+    def process(self, block):
+        samples = self.__input[: len(block)]
+        np.copyto(samples, block[:, 0])
+        output = self.__resampler.process(samples)
+        # The resampler hands back one cached view per block shape
+        views = self.__views.get(id(output))
+        if views is None or views[0] is not output:
+            views = self.__views[id(output)] = (output, output[:, None])
+        return views[1]
+
+
+class Gain(Stage):
+    """
+    Fixed or live-adjustable gain, in place.
+    """
+
+    name = "gain"
+    budget_ms = 0.2
+
+    def __init__(self, db=0.0, **options):
+        super().__init__(**options)
+        self.__gain = np.array(10 ** (db / 20), np.float32)
+
+    @property
+    def gain(self):
+        """
+        Linear gain; settable from any thread between blocks.
+        """
+        return float(self.__gain)
+
+    @gain.setter
+    def gain(self, value):
+        self.__gain[()] = value
+
+    def process(self, block):
+        np.multiply(block, self.__gain, out=block)
+        return block
+
+
+class Meter(Stage):
+    """
+    RMS and peak level of each block, in dB relative to int16 full
+    scale. Leaves the block untouched.
+    """
+
+    name = "meter"
+    budget_ms = 0.2
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.rms_db = float("-inf")
+        self.peak_db = float("-inf")
+
+    def configure(self, rate, channels, max_frames):
+        self.__magnitudes = np.zeros((max_frames, channels), np.float32)
+        self.__ones = np.ones(max_frames * channels, np.float32)
+        self.__energy = np.zeros((), np.float32)
+        self.__views = {}
+        return rate, channels, max_frames
+
+    def process(self, block):
+        size = block.size
+        if not size:
+            return block
+        views = self.__views.get(len(block))
+        if views is None:
+            magnitudes = self.__magnitudes[: len(block)]
+            views = (magnitudes, magnitudes.reshape(-1), self.__ones[:size])
+            self.__views[len(block)] = views
+        magnitudes, flat, ones = views
+        # Sum of squares as a dot product and the peak by index: reductions
+        # such as block.max() allocate a buffer on every call
+        np.square(block, out=magnitudes)
+        np.dot(ones, flat, out=self.__energy)
+        np.abs(block, out=magnitudes)
+        peak = flat[flat.argmax()]
+        self.rms_db = 10 * math.log10(
+            float(self.__energy) / size / FULL_SCALE**2 + 1e-12
+        )
+        self.peak_db = 20 * math.log10(float(peak) / FULL_SCALE + 1e-12)
+        return block
+
+
+class Pipeline:
+    """
+    int16 bytes in, ordered float32 stages, int16 bytes out.
+    """
+
+    def __init__(self, stages, *, rate, channels, max_frames):
+        """
+        :param stages: ``Stage`` objects, run in order.
+        :param rate: Rate of the incoming blocks.
+        :param channels: Channel count of the incoming blocks.
+        :param max_frames: Largest incoming block.
+        """
+        self.stages = list(stages)
+        names = [stage.name for stage in self.stages]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Stage names must be unique: {names}")
+
+        self.rate = rate
+        self.channels = channels
+        self.__reshaping = set()
+        out_format = (rate, channels, max_frames)
+        for stage in self.stages:
+            stage_format = stage.configure(*out_format)
+            if stage_format != out_format:
+                self.__reshaping.add(stage.name)
+                if stage.bypass:
+                    raise ValueError(f"Stage {stage.name} cannot be bypassed")
+            out_format = stage_format
+        self.out_rate, self.out_channels, out_frames = out_format
+
+        self.__in = bytearray(max_frames * channels * 2)
+        self.__frames = np.zeros((max_frames, channels), np.float32)
+        self.__work = np.zeros((out_frames, self.out_channels), np.float32)
+        self.__out = bytearray(out_frames * self.out_channels * 2)
+        self.__input_views = {}
+        self.__output_views = {}
+
+        self.__histograms = {stage.name: LatencyHistogram() for stage in self.stages}
+        self.__budgets_us = {
+            stage.name: int(stage.budget_ms * 1000) for stage in self.stages
+        }
+        self.__overruns = dict.fromkeys(names, 0)
+        self.__update_active()
+
+    def __getitem__(self, name):
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise KeyError(name)
+
+    @property
+    def budget_ms(self):
+        """
+        Sum of the declared budgets of the stages that are running.
+        """
+        return sum(stage.budget_ms for stage in self.__active)
+
+    def set_bypass(self, name, bypass):
+        """
+        Switch a stage in or out; takes effect from the next block.
+        """
+        if name in self.__reshaping:
+            raise ValueError(f"Stage {name} changes the format; it cannot be bypassed")
+        stage = self[name]
+        if stage.bypass != bypass:
+            stage.bypass = bypass
+            self.__update_active()
+
+    def process(self, buffer):
+        """
+        :param buffer: Interleaved int16 frames.
+        :return: Interleaved int16 frames in the output format: ``buffer``
+            itself when there is nothing to do, otherwise a read-only
+            memoryview valid until the next call.
+        """
+        active = self.__active
+        if not active:
+            return buffer
+
+        raw, samples, block = self.__input(len(buffer))
+        raw[:] = buffer
+        np.copyto(block, samples)
+
+        histograms = self.__histograms
+        budgets = self.__budgets_us
+        clock = time.perf_counter_ns
+        started = clock()
+        for stage in active:
+            block = stage.process(block)
+            finished = clock()
+            elapsed = (finished - started) // 1000
+            histograms[stage.name].record(elapsed)
+            if elapsed > budgets[stage.name]:
+                self.__overruns[stage.name] += 1
+            started = finished
+
+        work, out_samples, view = self.__output(len(block))
+        round_to_int16_range(block, work)
+        np.copyto(out_samples, work, casting="unsafe")
+        return view
+
+    def stats(self):
+        """
+        Per-stage processing time percentiles in milliseconds, with the
+        declared budget, the number of blocks over it, and bypass state.
+        """
+        stats = {}
+        for stage in self.stages:
+            stats[stage.name] = {
+                **self.__histograms[stage.name].summary(),
+                "budget_ms": stage.budget_ms,
+                "overruns": self.__overruns[stage.name],
+                "bypass": stage.bypass,
+            }
+        return stats
+
+    def __update_active(self):
+        active = [stage for stage in self.stages if not stage.bypass]
+        if not self.__reshaping and not active:
+            # Nothing to do: process() passes blocks straight through
+            active = None
+        self.__active = active
+
+    def __input(self, size):
+        views = self.__input_views.get(size)
+        if views is None:
+            frame_bytes = 2 * self.channels
+            if size % frame_bytes or size > len(self.__in):
+                raise ValueError(
+                    f"Expected whole frames, at most {len(self.__in)} bytes"
+                )
+            count = size // frame_bytes
+            samples = np.frombuffer(
+                self.__in, dtype=np.int16, count=count * self.channels
+            )
+            views = (
+                memoryview(self.__in)[:size],
+                samples.reshape(count, self.channels),
+                self.__frames[:count],
+            )
+            self.__input_views[size] = views
+        return views
+
+    def __output(self, count):
+        views = self.__output_views.get(count)
+        if views is None:
+            size = count * self.out_channels
+            views = (
+                self.__work[:count],
+                np.frombuffer(self.__out, dtype=np.int16, count=size).reshape(
+                    count, self.out_channels
+                ),
+                memoryview(self.__out).toreadonly()[: size * 2],
+            )
+            self.__output_views[count] = views
+        return views
+
+
+def capture_pipeline(
+    *, device_rate, device_channels, rate, device_chunk_frames, mixer=None, stages=()
+):
+    """
+    Device-format capture to mono at ``rate``: mixdown and resampling
+    first, so ``stages`` run on the fewest samples.
+
+    :param mixer: See ``Mixdown``.
+    :param stages: Extra stages, run on mono blocks at ``rate``.
+    """
+    pipeline = []
+    if device_channels != 1:
+        pipeline.append(Mixdown(mixer))
+    if device_rate != rate:
+        pipeline.append(Resample(rate))
+    pipeline.extend(stages)
+    return Pipeline(
+        pipeline,
+        rate=device_rate,
+        channels=device_channels,
+        max_frames=device_chunk_frames,
+    )
+
+
+def playback_pipeline(*, device_rate, device_channels, rate, chunk_frames, stages=()):
+    """
+    Mono at ``rate`` to device-format playback: ``stages`` first, on mono
+    blocks at ``rate``, then resampling and upmixing.
+    """
+    pipeline = list(stages)
+    if device_rate != rate:
+        pipeline.append(Resample(device_rate))
+    if device_channels != 1:
+        pipeline.append(Upmix(device_channels))
+    return Pipeline(pipeline, rate=rate, channels=1, max_frames=chunk_frames)
@@ -0,0 +1,130 @@
+"""
+Streaming polyphase resampler for float32 PCM, see ``audio_pipeline``
+"""
+
+from math import gcd
+
+import numpy as np
+
+TAPS_PER_PHASE = 32
+KAISER_BETA = 8.0
+
+
+class PolyphaseResampler:
+    """
+    Rational-ratio FIR resampler for a mono float32 stream.
+
+    Input arrives in blocks of at most ``max_in_frames``. All buffers are
+    allocated up front, and the gather indices, coefficients and buffer
+    views for a given (phase, block size) pair are computed once and
+    reused, so a steady stream of equal-sized blocks does no per-block
+    allocation.
+    """
+
+    def __init__(self, in_rate, out_rate, max_in_frames, taps=TAPS_PER_PHASE):
+        divisor = gcd(in_rate, out_rate)
+        self.up = out_rate // divisor
+        self.down = in_rate // divisor
+        self.taps = taps
+
+        length = self.up * taps
+        cutoff = 0.42 / max(self.up, self.down)
+        n = np.arange(length) - (length - 1) / 2
+        prototype = 2 * cutoff * np.sinc(2 * cutoff * n)
+        prototype *= np.kaiser(length, KAISER_BETA)
+        prototype *= self.up / prototype.sum()
+        # phases[p, k] = prototype[p + k * up]
+        self.__phases = prototype.reshape(taps, self.up).T.astype(np.float32)
+
+        self.__history = taps - 1
+        self.__buffer = np.zeros(self.__history + max_in_frames, dtype=np.float32)
+        max_out = -(-max_in_frames * self.up // self.down) + 1
+        self.__gather = np.zeros((max_out, taps), dtype=np.float32)
+        self.__output = np.zeros(max_out, dtype=np.float32)
+        self.__ones = np.ones(taps, dtype=np.float32)
+        self.__tables = {}
+        self.__block_views = {}
+
+        # Position of the next output sample, in 1/up input samples,
+        # relative to the start of the next input block
+        self.__time = 0
+
+    @property
+    def delay_frames(self):
+        """
+        Group delay of the filter in input frames: the centre of the
+        ``up * taps`` prototype, (length - 1) / 2 at the upsampled rate.
+        """
+        return (self.up * self.taps - 1) / (2 * self.up)
+
+    def process(self, block):
+        """
+        Resample one block.
+
+        :param block: 1-D float32 array of input samples.
+        :return: A view into an internal buffer, valid until the next call.
+        """
+        size = len(block)
+        head, tail, newest = self.__views(size)
+        tail[:] = block
+
+        indices, coefficients, gather, output = self.__table(self.__time, size)
+        # mode="clip" writes straight into ``gather``; the default
+        # mode="raise" would allocate a temporary the size of the output
+        np.take(self.__buffer, indices, out=gather, mode="clip")
+        np.multiply(gather, coefficients, out=gather)
+        # Row sums as a matrix-vector product: np.sum(axis=1) allocates
+        np.dot(gather, self.__ones, out=output)
+
+        self.__time += len(output) * self.down - size * self.up
+        head[:] = newest
+        return output
+
+    def __views(self, size):
+        views = self.__block_views.get(size)
+        if views is None:
+            history = self.__history
+            views = (
+                self.__buffer[:history],
+                self.__buffer[history : history + size],
+                self.__buffer[size : size + history],
+            )
+            self.__block_views[size] = views
+        return views
+
+    def __table(self, time, size):
+        key = (time, size)
+        table = self.__tables.get(key)
+        if table is None:
+            if len(self.__tables) > 64:
+                # Irregular block sizes; do not let the cache grow forever
+                self.__tables.clear()
+                self.__block_views.clear()
+            span = size * self.up - time
+            count = max(0, -(-span // self.down))
+            positions = time + np.arange(count) * self.down
+            base, phase = np.divmod(positions, self.up)
+            indices = base[:, None] + self.__history - np.arange(self.taps)
+            table = (
+                indices,
+                self.__phases[phase],
+                self.__gather[:count],
+                self.__output[:count],
+            )
+            self.__tables[key] = table
+        return table
+
+
+# 0-d bounds: clipping against Python scalars would box a new scalar per call
+INT16_MIN = np.array(-32768, dtype=np.float32)
+INT16_MAX = np.array(32767, dtype=np.float32)
+
+
+def round_to_int16_range(samples, out):
+    """
+    Round float ``samples`` into ``out`` and saturate to the int16 range,
+    ready for an unsafe cast. Allocates nothing.
+    """
+    np.rint(samples, out=out)
+    np.maximum(out, INT16_MIN, out=out)
+    np.minimum(out, INT16_MAX, out=out)
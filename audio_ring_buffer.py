@@ -0,0 +1,253 @@
+"""
+Bounded single-producer/single-consumer ring buffer for PCM audio
+"""
+
+import threading
+
+DROP_OLDEST = "drop-oldest"
+DROP_NEWEST = "drop-newest"
+
+OVERFLOW_POLICIES = (DROP_OLDEST, DROP_NEWEST)
+
+# Cached slices of the backing store; more means irregular access
+MAX_CACHED_SLICES = 256
+
+
+class AudioRingBuffer:
+    """
+    Fixed-size byte ring between one audio producer and one audio consumer.
+
+    The backing store is allocated once. The producer only ever advances
+    ``_write_pos`` and the consumer only ever advances ``_read_pos``, so the
+    data path needs no lock: both positions are monotonically increasing
+    integers and a single attribute store is atomic under the GIL.
+
+    With ``DROP_NEWEST`` a write that does not fit is discarded. With
+    ``DROP_OLDEST`` the producer always writes and the consumer skips
+    whatever was overwritten before it got to it. Like a seqlock, the
+    producer publishes ``_write_end``, the end of the write it is about to
+    copy, before touching the store, and ``_write_pos`` only once the copy
+    is done. The consumer checks ``_write_end`` after its own copy, so a
+    read that raced an overwrite, finished or not, is detected and
+    retried.
+
+    Copies go through memoryviews that are created once and cached, so
+    steady fixed-size reads and writes allocate nothing.
+    """
+
+    def __init__(
+        self,
+        *,
+        depth_ms,
+        sample_rate,
+        channels=1,
+        sample_width=2,
+        policy=DROP_OLDEST,
+        stamp_bytes=None,
+    ):
+        """
+        :param stamp_bytes: If set, keep one timestamp per ``stamp_bytes``
+            (normally one chunk) so the consumer can tell how long the data
+            it just read spent in the ring. The capacity is rounded up to a
+            whole number of stamp slots.
+        """
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+
+        self.frame_bytes = channels * sample_width
+        self.bytes_per_ms = sample_rate * self.frame_bytes / 1000
+        frames = max(1, int(sample_rate * depth_ms / 1000))
+        if stamp_bytes:
+            stamp_frames = stamp_bytes // self.frame_bytes
+            frames = -(-frames // stamp_frames) * stamp_frames
+
+        self.policy = policy
+        self.capacity = frames * self.frame_bytes
+        self.depth_ms = frames * 1000 / sample_rate
+
+        self.__stamp_bytes = stamp_bytes
+        self.__stamps = [0] * (self.capacity // stamp_bytes) if stamp_bytes else None
+        # Timestamp of the data returned by the last read_into
+        self.last_stamp = 0
+
+        self.__store = bytearray(self.capacity)
+        self.__view = memoryview(self.__store)
+        self.__slices = {}
+        self.__out = None
+        self.__out_view = None
+
+        self._write_pos = 0
+        # End of the write in progress; equal to _write_pos between writes
+        self._write_end = 0
+        self._read_pos = 0
+
+        # Counters are owned by the side that updates them
+        self.dropped_bytes = 0  # producer (drop-newest)
+        self.overwritten_bytes = 0  # consumer (drop-oldest)
+
+        # Only used to park an idle consumer; never taken on the data path
+        self.__readable = threading.Event()
+
+    def __len__(self):
+        return min(self._write_pos - self._read_pos, self.capacity)
+
+    @property
+    def buffered_ms(self):
+        return len(self) / self.bytes_per_ms
+
+    def write(self, data, stamp=0):
+        """
+        Copy ``data`` into the ring. Called from the producer thread only.
+
+        :param data: A bytes-like object holding whole audio frames.
+        :param stamp: Timestamp to attach when stamping is enabled.
+        :return: The number of bytes accepted.
+        """
+        size = len(data)
+        if size == 0:
+            return 0
+
+        write_pos = self._write_pos
+        if self.policy == DROP_NEWEST:
+            if size > self.capacity - (write_pos - self._read_pos):
+                self.dropped_bytes += size
+                return 0
+        elif size > self.capacity:
+            # Only the newest ``capacity`` bytes could ever be read back
+            data = memoryview(data)[size - self.capacity :]
+            write_pos += size - self.capacity
+            size = self.capacity
+
+        # Published first: from here on the bytes up to capacity before
+        # this end may be overwritten
+        self._write_end = write_pos + size
+
+        start = write_pos % self.capacity
+        first = min(size, self.capacity - start)
+        if first == size:
+            self.__view[start : start + size] = data
+        else:
+            data = memoryview(data)
+            self.__view[start:] = data[:first]
+            self.__view[: size - first] = data[first:]
+
+        if self.__stamps is not None:
+            if size == self.__stamp_bytes and not write_pos % size:
+                self.__stamps[write_pos // size % len(self.__stamps)] = stamp
+            else:
+                slots = len(self.__stamps)
+                for pos in range(write_pos, write_pos + size, self.__stamp_bytes):
+                    self.__stamps[pos // self.__stamp_bytes % slots] = stamp
+
+        self._write_pos = write_pos + size
+        self.__readable.set()
+        return size
+
+    def read_into(self, out, size=None):
+        """
+        Copy the oldest buffered bytes into ``out``. Consumer thread only.
+
+        Nothing is copied unless ``size`` bytes are available, so fixed-size
+        readers always get whole chunks.
+
+        :param out: A writable bytes-like object.
+        :param size: Bytes to read, defaults to ``len(out)``.
+        :return: The number of bytes copied, either ``size`` or 0.
+        """
+        if size is None:
+            size = len(out)
+        if out is not self.__out:
+            self.__out = out
+            self.__out_view = memoryview(out)
+        out = self.__out_view
+
+        while True:
+            read_pos = self.__catch_up()
+            if self._write_pos - read_pos < size:
+                return 0
+
+            start = read_pos % self.capacity
+            first = min(size, self.capacity - start)
+            if first == size and size == len(out):
+                out[:] = self.__slice(start, size)
+            else:
+                out[:first] = self.__view[start : start + first]
+                if first < size:
+                    out[first:size] = self.__view[: size - first]
+            if self.__stamps is not None:
+                slot = read_pos // self.__stamp_bytes % len(self.__stamps)
+                stamp = self.__stamps[slot]
+
+            # _write_end, not _write_pos: an overwrite still being copied
+            # has already published it
+            if self._write_end - self.capacity <= read_pos:
+                if self.__stamps is not None:
+                    self.last_stamp = stamp
+                self._read_pos = read_pos + size
+                return size
+            # The producer lapped us while copying; the copy is torn, retry
+
+    def __slice(self, start, size):
+        key = (start, size)
+        view = self.__slices.get(key)
+        if view is None:
+            if len(self.__slices) >= MAX_CACHED_SLICES:
+                self.__slices.clear()
+            view = self.__slices[key] = self.__view[start : start + size]
+        return view
+
+    def read(self, size):
+        """
+        Read exactly ``size`` bytes, or ``b""`` when not enough is buffered.
+        """
+        out = bytearray(size)
+        if self.read_into(out, size):
+            return bytes(out)
+        return b""
+
+    def skip(self, size):
+        """
+        Discard up to ``size`` of the oldest buffered bytes. Consumer only.
+        """
+        read_pos = self.__catch_up()
+        size = min(size, self._write_pos - read_pos)
+        size -= size % self.frame_bytes
+        self._read_pos = read_pos + size
+        return size
+
+    def clear(self):
+        """
+        Discard everything currently buffered. Consumer only.
+        """
+        return self.skip(self.capacity)
+
+    def wait(self, size, timeout=None):
+        """
+        Block the consumer until ``size`` bytes are buffered or ``timeout``.
+
+        :return: True if the data is available.
+        """
+        if len(self) >= size:
+            return True
+        self.__readable.clear()
+        if len(self) >= size:
+            return True
+        self.__readable.wait(timeout)
+        return len(self) >= size
+
+    def wake(self):
+        """
+        Wake a consumer parked in ``wait`` (e.g. on shutdown).
+        """
+        self.__readable.set()
+
+    def __catch_up(self):
+        read_pos = self._read_pos
+        # Bytes the write in progress is overwriting are gone too
+        oldest = self._write_end - self.capacity
+        if read_pos < oldest:
+            # Overwritten data is gone; resume at a frame boundary
+            oldest += -oldest % self.frame_bytes
+            self.overwritten_bytes += oldest - read_pos
+            read_pos = self._read_pos = oldest
+        return read_pos
@@ -4,135 +4,96 @@ Audio System Diagnostic Tool
 Checks which audio system is running and provides correct commands
 """
 
-import subprocess
-import os
+from audio_diagnostics import run_diagnostics
 
 
-def check_pulseaudio():
+def check_pulseaudio(report):
     """Check if PulseAudio is running"""
-    try:
-        result = subprocess.run(
-            ["pulseaudio", "--check", "-v"], capture_output=True, text=True
-        )
-        if result.returncode == 0:
-            print("✅ PulseAudio is running")
-            return True
-        else:
-            print("❌ PulseAudio is not running")
-            return False
-    except FileNotFoundError:
-        print("❌ PulseAudio not installed")
-        return False
+    if report["probes"]["pulseaudio"].get("running"):
+        print("✅ PulseAudio is running")
+        return True
+    print("❌ PulseAudio is not running")
+    return False
+
+
+def print_pulse_devices(devices, title):
+    print(f"\n{title}")
+    print("-" * 50)
+    for device in devices:
+        print(f"  {device['index']}: {device['name']}")
+        if "wm8960" in device["name"].lower() or "hw_2" in device["name"]:
+            print(f"    ⭐ This is your WM8960 device!")
 
 
-def list_pulse_sinks():
+def list_pulse_sinks(report):
     """List PulseAudio sinks if available"""
-    try:
-        result = subprocess.run(
-            ["pactl", "list", "short", "sinks"], capture_output=True, text=True
-        )
-        if result.returncode == 0:
-            print("\n🔊 PulseAudio Sinks (Output Devices):")
-            print("-" * 50)
-            for line in result.stdout.strip().split("\n"):
-                if line:
-                    parts = line.split("\t")
-                    if len(parts) >= 2:
-                        sink_id = parts[0]
-                        sink_name = parts[1]
-                        print(f"  {sink_id}: {sink_name}")
-                        if "wm8960" in sink_name.lower() or "hw_2" in sink_name:
-                            print(f"    ⭐ This is your WM8960 device!")
-            return True
-        else:
-            print("❌ Could not list PulseAudio sinks")
-            return False
-    except FileNotFoundError:
-        print("❌ pactl command not found")
+    pulse = report["probes"]["pulseaudio"]
+    if not pulse.get("running"):
+        print("❌ Could not list PulseAudio sinks")
         return False
+    print_pulse_devices(pulse["sinks"], "🔊 PulseAudio Sinks (Output Devices):")
+    return True
 
 
-def list_pulse_sources():
+def list_pulse_sources(report):
     """List PulseAudio sources if available"""
-    try:
-        result = subprocess.run(
-            ["pactl", "list", "short", "sources"], capture_output=True, text=True
-        )
-        if result.returncode == 0:
-            print("\n🎤 PulseAudio Sources (Input Devices):")
-            print("-" * 50)
-            for line in result.stdout.strip().split("\n"):
-                if line:
-                    parts = line.split("\t")
-                    if len(parts) >= 2:
-                        source_id = parts[0]
-                        source_name = parts[1]
-                        print(f"  {source_id}: {source_name}")
-                        if "wm8960" in source_name.lower() or "hw_2" in source_name:
-                            print(f"    ⭐ This is your WM8960 device!")
-            return True
-    except:
+    pulse = report["probes"]["pulseaudio"]
+    if not pulse.get("running"):
         return False
+    print_pulse_devices(pulse["sources"], "🎤 PulseAudio Sources (Input Devices):")
+    return True
 
 
-def check_alsa_cards():
+def check_alsa_cards(report):
     """Check ALSA cards"""
-    try:
-        result = subprocess.run(["aplay", "-l"], capture_output=True, text=True)
-        if result.returncode == 0:
-            print("\n🎵 ALSA Cards:")
-            print("-" * 50)
-            print(result.stdout)
-            return True
-    except:
+    alsa = report["probes"]["alsa"]
+    if not alsa.get("cards"):
         return False
+    print("\n🎵 ALSA Cards:")
+    print("-" * 50)
+    for pcm in alsa["pcms"]:
+        directions = [d for d in ("playback", "capture") if pcm[d]]
+        print(
+            f"card {pcm['card']}, device {pcm['device']}: {pcm['id']} "
+            f"[{pcm['name']}] ({', '.join(directions)})"
+        )
+    return True
 
 
-def get_current_defaults():
+def get_current_defaults(report):
     """Get current default devices"""
     print("\n🎯 Current Default Devices:")
     print("-" * 50)
 
     # PulseAudio defaults
-    try:
-        result = subprocess.run(["pactl", "info"], capture_output=True, text=True)
-        if result.returncode == 0:
-            for line in result.stdout.split("\n"):
-                if "Default Sink:" in line:
-                    print(f"PulseAudio Default Sink: {line.split(':')[1].strip()}")
-                elif "Default Source:" in line:
-                    print(f"PulseAudio Default Source: {line.split(':')[1].strip()}")
-    except:
-        pass
+    pulse = report["probes"]["pulseaudio"]
+    if pulse.get("running"):
+        print(f"PulseAudio Default Sink: {pulse['default_sink']}")
+        print(f"PulseAudio Default Source: {pulse['default_source']}")
 
     # Environment variables
-    alsa_card = os.environ.get("ALSA_CARD")
-    alsa_device = os.environ.get("ALSA_DEVICE")
-    if alsa_card:
-        print(f"ALSA_CARD environment: {alsa_card}")
-    if alsa_device:
-        print(f"ALSA_DEVICE environment: {alsa_device}")
+    variables = report["probes"]["environment"].get("variables", {})
+    for name in ("ALSA_CARD", "ALSA_DEVICE"):
+        if name in variables:
+            print(f"{name} environment: {variables[name]}")
 
     # PyAudio default
-    try:
-        import pyaudio
-
-        audio = pyaudio.PyAudio()
-        default_output = audio.get_default_output_device_info()
+    devices = report["probes"]["portaudio"].get("devices", [])
+    outputs = [device for device in devices if device["default_output"]]
+    if outputs:
         print(
-            f"PyAudio Default Output: Device {default_output['index']} - {default_output['name']}"
+            f"PyAudio Default Output: Device {outputs[0]['index']} - {outputs[0]['name']}"
         )
-        audio.terminate()
-    except:
+    else:
         print("Could not get PyAudio default device")
 
 
-def provide_solutions():
+def provide_solutions(report):
     """Provide solutions based on detected audio system"""
     print("\n💡 Solutions to Set WM8960 as Default:")
     print("=" * 60)
 
-    is_pulse = check_pulseaudio()
+    is_pulse = check_pulseaudio(report)
 
     if is_pulse:
         print("\n🎵 PulseAudio Solutions:")
@@ -164,12 +125,14 @@ def main():
     print("🎧 Audio System Diagnostic Tool")
     print("=" * 50)
 
-    check_pulseaudio()
-    list_pulse_sinks()
-    list_pulse_sources()
-    check_alsa_cards()
-    get_current_defaults()
-    provide_solutions()
+    # All probes run at once; see audio_diagnostics.py
+    report = run_diagnostics()
+    check_pulseaudio(report)
+    list_pulse_sinks(report)
+    list_pulse_sources(report)
+    check_alsa_cards(report)
+    get_current_defaults(report)
+    provide_solutions(report)
 
 
 if __name__ == "__main__":
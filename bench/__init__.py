@@ -0,0 +1,3 @@
+"""
+Benchmarks that run without a sound card or a live call
+"""
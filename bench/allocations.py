@@ -0,0 +1,257 @@
+"""
+Steady-state allocation counter for the audio hot loops
+
+Steps each component, and a whole duplex DailyCall on the fake backends,
+one chunk at a time on a single thread with a manual device clock. After
+a warm-up it reports, per chunk:
+
+- ``buffer_allocs``: chunks that allocated anything bigger than small
+  Python objects, i.e. a copied audio buffer or a numpy temporary. This
+  is the number that should be 0.
+- ``peak_bytes``: the most memory allocated above the starting point at
+  any moment during a chunk (tracemalloc), i.e. the largest transient
+  allocation. Interpreter churn of ints, floats and tuples accounts for a
+  few hundred bytes and cannot be avoided from Python.
+- ``net_blocks``: growth in live allocator blocks (should be 0).
+- ``gc_runs``: garbage collections triggered during the measurement.
+
+Run from the repository root:
+
+    python -m bench.allocations [--chunks 500] [--json] [--strict] [names...]
+
+The call scenarios are allowed one buffer per chunk (``required_bytes``):
+daily-python's ``write_frames`` only accepts ``bytes``, so every chunk
+sent upstream is one copy. ``--strict`` exits with status 1 if any
+scenario allocates more than that.
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import sys
+import tracemalloc
+
+from bench import clock, fakes
+
+WARMUP_CHUNKS = 200
+# Anything larger than this in one chunk is a buffer, not interpreter churn
+SMALL_OBJECT_BYTES = 512
+CHUNK_SIZE = 640
+CHUNK_BYTES = CHUNK_SIZE * 2
+
+
+def measure(step, chunks, warmup=WARMUP_CHUNKS, required_bytes=0):
+    """
+    Call ``step()`` once per chunk and measure its allocations.
+
+    :param required_bytes: Allocation every chunk is expected to make.
+    """
+    for _ in range(warmup):
+        step()
+
+    collections = []
+    callback = lambda phase, info: phase == "start" and collections.append(1)
+    gc.callbacks.append(callback)
+    tracemalloc.start()
+    try:
+        # The first chunks traced pay for objects created lazily on the
+        # first allocation tracemalloc sees in each code path
+        for _ in range(10):
+            step()
+        worst = 0
+        total = 0
+        buffer_allocs = 0
+        blocks = sys.getallocatedblocks()
+        for _ in range(chunks):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            step()
+            peak = tracemalloc.get_traced_memory()[1] - before
+            worst = max(worst, peak)
+            total += peak
+            if peak - required_bytes > SMALL_OBJECT_BYTES:
+                buffer_allocs += 1
+        blocks = sys.getallocatedblocks() - blocks
+    finally:
+        tracemalloc.stop()
+        gc.callbacks.remove(callback)
+
+    return {
+        "buffer_allocs": buffer_allocs,
+        "peak_bytes_max": worst,
+        "peak_bytes_mean": round(total / chunks, 1),
+        "net_blocks": round(blocks / chunks, 3),
+        "gc_runs": len(collections),
+    }
+
+
+def ring_buffer():
+    from audio_ring_buffer import AudioRingBuffer
+
+    ring = AudioRingBuffer(depth_ms=200, sample_rate=16000, stamp_bytes=CHUNK_BYTES)
+    data = bytes(range(256)) * 5
+    out = bytearray(CHUNK_BYTES)
+
+    def step():
+        ring.write(data, 1)
+        ring.read_into(out)
+
+    return step
+
+
+def capture_pipeline(mic_mode="average", stages=False, **options):
+    def setup():
+        from audio_pipeline import Gain, Meter, capture_pipeline
+        from bench.signals import TalkingSource
+        from stereo_mic import create_front_end
+
+        pipeline = capture_pipeline(
+            device_rate=48000,
+            device_channels=2,
+            rate=16000,
+            device_chunk_frames=1920,
+            mixer=create_front_end(mic_mode, max_frames=1920, **options),
+            stages=[Gain(6), Meter()] if stages else (),
+        )
+        source = TalkingSource(48000, channels=2)
+        return lambda: pipeline.process(source.read(1920))
+
+    return setup
+
+
+def playback_pipeline():
+    from audio_pipeline import playback_pipeline
+
+    pipeline = playback_pipeline(
+        device_rate=48000, device_channels=2, rate=16000, chunk_frames=CHUNK_SIZE
+    )
+    data = bytearray(CHUNK_BYTES)
+    return lambda: pipeline.process(data)
+
+
+def voice_gate():
+    from voice_activity import VoiceActivityDetector, VoiceGate
+    from bench.signals import TalkingSource
+
+    detector = VoiceActivityDetector(sample_rate=16000, chunk_frames=CHUNK_SIZE)
+    gate = VoiceGate(detector, sample_rate=16000, chunk_frames=CHUNK_SIZE)
+    source = TalkingSource(16000)
+    chunk = memoryview(bytearray(CHUNK_BYTES))
+    send = lambda buffer: None
+
+    def step():
+        chunk[:] = source.read(CHUNK_SIZE)
+        gate.process(chunk, send)
+
+    return step
+
+
+def jitter_buffer():
+    from jitter_buffer import PlayoutJitterBuffer
+    from bench.signals import TalkingSource
+
+    buffer = PlayoutJitterBuffer(sample_rate=16000, chunk_frames=CHUNK_SIZE)
+    source = TalkingSource(16000)
+    out = bytearray(CHUNK_BYTES)
+    count = [0]
+
+    def step():
+        # Every 8th chunk goes missing to exercise concealment and fades
+        count[0] += 1
+        if count[0] % 8:
+            buffer.write(source.read(CHUNK_SIZE), 1)
+        buffer.read_into(out)
+
+    return step
+
+
+def duplex_call(**options):
+    def setup():
+        from bench import fake_daily, fake_pyaudio
+        from daily_call import DailyCall, SAMPLE_RATE
+
+        device_rate = options.get("device_rate", SAMPLE_RATE)
+        period = CHUNK_SIZE / SAMPLE_RATE
+        call = DailyCall(
+            engine="duplex", pump_thread=False, latency_stats=True, **options
+        )
+        call.join("https://bench.daily.co/allocations")
+        for _ in range(10):
+            clock.advance(period)
+            fake_daily.run_pending()
+        stream = fake_pyaudio.streams[-1]
+        assert stream.rate == device_rate
+
+        def step():
+            clock.advance(period)
+            fake_daily.run_pending()
+            call.pump_once()
+            stream.step()
+
+        return step, call
+
+    return setup
+
+
+COMPONENTS = {
+    "ring-buffer": ring_buffer,
+    "capture-pipeline-48k-stereo": capture_pipeline(),
+    "capture-pipeline-48k-select": capture_pipeline("select"),
+    "capture-pipeline-48k-beamform": capture_pipeline("beamform", delay_frames=3),
+    "capture-pipeline-48k-gain-meter": capture_pipeline(stages=True),
+    "playback-pipeline-48k-stereo": playback_pipeline,
+    "voice-gate": voice_gate,
+    "jitter-buffer": jitter_buffer,
+}
+CALLS = {
+    "duplex-call": duplex_call(),
+    "duplex-call-48k-stereo": duplex_call(device_rate=48000, device_channels=2),
+    "duplex-call-vad-barge-in": duplex_call(vad=True, barge_in=True),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument(
+        "--strict", action="store_true", help="exit 1 on any buffer allocation"
+    )
+    parser.add_argument(
+        "scenarios",
+        nargs="*",
+        metavar="name",
+        help=f"any of {', '.join([*COMPONENTS, *CALLS])} (default: all)",
+    )
+    args = parser.parse_args()
+
+    fakes.install(manual=True)
+
+    results = {}
+    for name in args.scenarios or [*COMPONENTS, *CALLS]:
+        if name in COMPONENTS:
+            results[name] = measure(COMPONENTS[name](), args.chunks)
+        elif name in CALLS:
+            with contextlib.redirect_stdout(io.StringIO()):
+                step, call = CALLS[name]()
+            # One bytes object per chunk for write_frames
+            required = sys.getsizeof(bytes(CHUNK_BYTES))
+            results[name] = measure(step, args.chunks, required_bytes=required)
+            results[name]["required_bytes"] = required
+            call.release()
+        else:
+            print(f"Unknown scenario: {name}")
+            sys.exit(2)
+        if not args.json:
+            print(f"{name}: {results[name]}")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    if args.strict and any(result["buffer_allocs"] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Headless benchmark of the DailyCall audio loops and the Vapi client
+
+Runs each scenario against the fake ``daily`` and ``pyaudio`` backends
+and reports throughput, CPU per chunk, latency percentiles and thread
+wakeups. Run from the repository root:
+
+    python -m bench.audio_loops [--seconds 5] [--speed 1] [--calls 1] [--json]
+        [--strict] [names...]
+
+With ``--calls N`` every scenario runs N calls side by side in the one
+process; throughput and CPU per chunk are then averaged over the calls
+and the latency percentiles are the worst call's.
+
+CPU and wakeups are for the whole process, so they include the fakes;
+compare runs against each other rather than reading them as absolutes.
+
+With ``--strict`` the exit status is 1 if any call scenario read bot audio
+from the virtual speaker at well under real time, i.e. the loop stalled,
+or if a VAD scenario's median capture latency ended up more than a chunk
+above the same engine without VAD, i.e. the pre-roll delay was never won
+back. That check needs both scenarios in the run.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import resource
+import sys
+import threading
+import time
+
+from bench import fakes
+
+SCENARIOS = {
+    "blocking": {},
+    "blocking-vad": {"vad": True},
+    "blocking-jitter": {"jitter_buffer": True},
+    "duplex": {"engine": "duplex"},
+    "duplex-48k-stereo": {
+        "engine": "duplex",
+        "device_rate": 48000,
+        "device_channels": 2,
+    },
+    "duplex-vad-barge-in": {"engine": "duplex", "vad": True, "barge_in": True},
+}
+# Run through vapi_async.AsyncDailyCall, which always uses the duplex engine
+ASYNC_SCENARIOS = {
+    "async-duplex": {},
+    "async-duplex-48k-stereo": {"device_rate": 48000, "device_channels": 2},
+}
+MEETING_URL = "https://bench.daily.co/room"
+# --strict: below this the loop stopped asking for bot audio. A stalled
+# loop reads a few percent; host hiccups at --speed 4 can still cost a
+# healthy one a third
+MIN_BOT_AUDIO_REALTIME = 0.5
+# --strict: VAD scenario -> the scenario its capture latency is held to,
+# and how far above it the median may sit in device milliseconds
+VAD_BASELINES = {"blocking-vad": "blocking", "duplex-vad-barge-in": "duplex"}
+MAX_VAD_CAPTURE_LAG_MS = 40.0
+
+
+def context_switches():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_nvcsw + usage.ru_nivcsw
+
+
+def worst(stats, stage, key):
+    values = [s.get(stage, {}).get(key) for s in stats]
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def run_call(options, seconds, speed, calls=1):
+    """
+    Join ``calls`` DailyCalls on the fakes, let audio flow for ``seconds``
+    of device time, leave, and summarize what happened.
+    """
+    from daily_call import DailyCall
+
+    fakes.reset_counters()
+    with contextlib.redirect_stdout(io.StringIO()):
+        clients = [DailyCall(**options) for _ in range(calls)]
+        for number, client in enumerate(clients):
+            client.join(f"{MEETING_URL}-{number}")
+
+        started = time.monotonic()
+        cpu = time.process_time()
+        switches = context_switches()
+        time.sleep(seconds / speed / 2)
+        threads = threading.active_count()
+        time.sleep(seconds / speed / 2)
+        elapsed = time.monotonic() - started
+        cpu = time.process_time() - cpu
+        switches = context_switches() - switches
+
+        latency = [client.get_latency_stats() or {} for client in clients]
+        for client in clients:
+            client.leave()
+
+    return summarize(options, speed, calls, elapsed, cpu, switches, threads, latency)
+
+
+def run_async_call(options, seconds, speed, calls=1):
+    """
+    Like ``run_call``, with every call an ``AsyncDailyCall`` pumped from
+    one asyncio event loop.
+    """
+    import vapi_async
+    from vapi_async import AsyncDailyCall
+
+    # The pump sleeps in wall-clock time; keep it half a device chunk
+    interval = vapi_async.PUMP_INTERVAL
+    vapi_async.PUMP_INTERVAL = interval / speed
+
+    async def scenario():
+        clients = [await AsyncDailyCall.create(**options) for _ in range(calls)]
+        for number, client in enumerate(clients):
+            await client.join(f"{MEETING_URL}-{number}")
+
+        started = time.monotonic()
+        cpu = time.process_time()
+        switches = context_switches()
+        await asyncio.sleep(seconds / speed / 2)
+        threads = threading.active_count()
+        await asyncio.sleep(seconds / speed / 2)
+        elapsed = time.monotonic() - started
+        cpu = time.process_time() - cpu
+        switches = context_switches() - switches
+
+        latency = [client.get_latency_stats() or {} for client in clients]
+        for client in clients:
+            await client.leave()
+        return elapsed, cpu, switches, threads, latency
+
+    fakes.reset_counters()
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            measured = asyncio.run(scenario())
+        finally:
+            vapi_async.PUMP_INTERVAL = interval
+
+    return summarize(options, speed, calls, *measured)
+
+
+def summarize(options, speed, calls, elapsed, cpu, switches, threads, latency):
+    from daily_call import CHUNK_SIZE, SAMPLE_RATE
+
+    device_rate = options.get("device_rate", SAMPLE_RATE)
+    device_chunk = CHUNK_SIZE * device_rate // SAMPLE_RATE
+
+    counters = fakes.counters()
+    device_seconds = elapsed * speed
+    call_seconds = device_seconds * calls
+    captured = counters.get("input_frames", 0) / device_chunk
+    return {
+        "threads": threads,
+        "capture_chunks_per_s": round(captured / call_seconds, 1),
+        "upstream_realtime": round(
+            counters.get("mic_frames", 0) / SAMPLE_RATE / call_seconds, 3
+        ),
+        "bot_audio_realtime": round(
+            counters.get("speaker_frames", 0) / SAMPLE_RATE / call_seconds, 3
+        ),
+        "playback_realtime": round(
+            counters.get("output_frames", 0) / device_rate / call_seconds, 3
+        ),
+        "cpu_us_per_chunk": round(cpu * 1e6 / captured, 1) if captured else None,
+        "wakeups_per_s": round(switches / device_seconds, 1),
+        "xruns": counters.get("output_underflows", 0)
+        + counters.get("input_overflows", 0),
+        "capture_p50_ms": worst(latency, "capture.total", "p50"),
+        "capture_p99_ms": worst(latency, "capture.total", "p99"),
+        "playback_p50_ms": worst(latency, "playback.total", "p50"),
+        "playback_p99_ms": worst(latency, "playback.total", "p99"),
+    }
+
+
+def run_vapi(seconds, speed, messages=50):
+    """
+    Time Vapi.start, Vapi.send and Vapi.stop with a local fake API.
+    """
+    from vapi_python import Vapi
+
+    fakes.reset_counters()
+    with contextlib.redirect_stdout(io.StringIO()):
+        vapi = Vapi(api_key="bench", http_options={"prewarm": False})
+        vapi.http = fakes.FakeVapiSession()
+
+        started = time.perf_counter()
+        vapi.start(assistant_id="bench")
+        start_ms = (time.perf_counter() - started) * 1000
+
+        send_us = []
+        for i in range(messages):
+            sent = time.perf_counter()
+            vapi.add_message("system", f"bench message {i}")
+            send_us.append((time.perf_counter() - sent) * 1e6)
+        time.sleep(seconds / speed)
+
+        stopped = time.perf_counter()
+        vapi.stop()
+        stop_ms = (time.perf_counter() - stopped) * 1000
+
+    send_us.sort()
+    return {
+        "start_ms": round(start_ms, 1),
+        "send_p50_us": round(send_us[len(send_us) // 2], 1),
+        "send_max_us": round(send_us[-1], 1),
+        "stop_ms": round(stop_ms, 1),
+        "app_messages": len(fakes.fake_daily.app_messages),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--calls", type=int, default=1, help="calls side by side")
+    parser.add_argument("--json", action="store_true", help="print JSON only")
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="fail if bot audio stalls or VAD delays capture",
+    )
+    parser.add_argument(
+        "scenarios",
+        nargs="*",
+        metavar="name",
+        help=f"any of {', '.join([*SCENARIOS, *ASYNC_SCENARIOS])}, vapi "
+        "(default: all)",
+    )
+    args = parser.parse_args()
+
+    fakes.install(speed=args.speed)
+
+    names = args.scenarios or [*SCENARIOS, *ASYNC_SCENARIOS, "vapi"]
+    results = {}
+    for name in names:
+        if name == "vapi":
+            results[name] = run_vapi(args.seconds, args.speed)
+        elif name in SCENARIOS:
+            results[name] = run_call(
+                SCENARIOS[name], args.seconds, args.speed, args.calls
+            )
+        elif name in ASYNC_SCENARIOS:
+            results[name] = run_async_call(
+                ASYNC_SCENARIOS[name], args.seconds, args.speed, args.calls
+            )
+        else:
+            print(f"Unknown scenario: {name}")
+            sys.exit(2)
+        if not args.json:
+            print(f"{name}:")
+            for key, value in results[name].items():
+                print(f"  {key:<22} {value}")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+    stalled = [
+        name
+        for name, result in results.items()
+        if result.get("bot_audio_realtime", 1) < MIN_BOT_AUDIO_REALTIME
+    ]
+    # Latencies are wall-clock, so scale the allowance with --speed
+    lagging = [
+        name
+        for name, baseline in VAD_BASELINES.items()
+        if name in results
+        and baseline in results
+        and results[name]["capture_p50_ms"] is not None
+        and results[baseline]["capture_p50_ms"] is not None
+        and results[name]["capture_p50_ms"] - results[baseline]["capture_p50_ms"]
+        > MAX_VAD_CAPTURE_LAG_MS / args.speed
+    ]
+    if stalled:
+        print(f"Bot audio stalled in: {', '.join(stalled)}", file=sys.stderr)
+    if lagging:
+        print(f"VAD delays capture in: {', '.join(lagging)}", file=sys.stderr)
+    if args.strict and (stalled or lagging):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+End-to-end call setup and teardown benchmark
+
+Starts the stand-in Vapi server, then repeatedly runs ``Vapi.start``,
+waits for the bot's first audio to reach the (fake) sound card, holds
+the call and runs ``Vapi.stop``. Run from the repository root:
+
+    python -m bench.call_setup [--calls 10] [--latency 0.15] [--error-rate 0.1]
+        [--bot talk|echo|canned] [--wav greeting.wav] [--prepare] [--json]
+
+Reports start, start-to-first-audio and teardown percentiles plus how
+many starts failed.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import time
+
+from bench import clock, fakes
+from latency_stats import LatencyHistogram
+
+FIRST_AUDIO_TIMEOUT = 10.0
+
+
+def percentiles(histogram):
+    summary = histogram.summary()
+    return {key: summary[key] for key in ("count", "p50", "p95", "max")}
+
+
+def run(args):
+    from bench import fake_pyaudio, scripted_bot
+    from bench.vapi_server import StandInVapi
+    from vapi_python import Vapi
+
+    bot = {
+        "mode": args.bot,
+        "join_delay": args.bot_join_delay,
+        "first_audio_delay": args.first_audio_delay,
+    }
+    if args.wav:
+        bot["audio"] = scripted_bot.load_wav(args.wav)
+
+    stages = {name: LatencyHistogram() for name in ("start", "first_audio", "teardown")}
+    failures = 0
+    timeouts = 0
+
+    server = StandInVapi(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        drop_rate=args.drop_rate,
+        bot=bot,
+        seed=args.seed,
+    )
+    with server, contextlib.redirect_stdout(io.StringIO()):
+        vapi = Vapi(
+            api_key=server.api_key,
+            api_url=server.url,
+            call_options={"engine": args.engine},
+        )
+        vapi.http.warm()
+
+        for _ in range(args.calls):
+            if args.prepare:
+                try:
+                    vapi.prepare(assistant_id="bench")
+                except Exception:
+                    pass
+
+            fakes.reset_counters()
+            started = time.monotonic_ns()
+            try:
+                vapi.start(assistant_id="bench")
+            except Exception:
+                failures += 1
+                continue
+            stages["start"].record((time.monotonic_ns() - started) // 1000)
+
+            if fake_pyaudio.first_audio.wait(FIRST_AUDIO_TIMEOUT):
+                first_audio_ns = int(fake_pyaudio.first_audio_at * 1e9)
+                stages["first_audio"].record((first_audio_ns - started) // 1000)
+            else:
+                timeouts += 1
+
+            clock.sleep(args.hold)
+            stopping = time.monotonic_ns()
+            vapi.stop()
+            stages["teardown"].record((time.monotonic_ns() - stopping) // 1000)
+
+        vapi.discard_prepared()
+        vapi.http.close()
+
+    return {
+        "calls": args.calls,
+        "failed_starts": failures,
+        "first_audio_timeouts": timeouts,
+        "server_requests": server.requests,
+        **{f"{name}_ms": percentiles(h) for name, h in stages.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.15)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--bot", default="talk", choices=("talk", "echo", "canned"))
+    parser.add_argument("--wav", help="16 kHz mono WAV for the canned bot")
+    parser.add_argument("--bot-join-delay", type=float, default=0.1)
+    parser.add_argument("--first-audio-delay", type=float, default=0.3)
+    parser.add_argument("--hold", type=float, default=1.0, help="seconds per call")
+    parser.add_argument("--engine", default="blocking")
+    parser.add_argument("--prepare", action="store_true", help="prefetch calls")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    fakes.install(speed=args.speed)
+    results = run(args)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for key, value in results.items():
+        print(f"  {key:<22} {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Shared device clock for the fake audio backends
+
+Everything the fakes pace (sound card periods, Daily's virtual devices)
+runs on this clock, so the whole call can be sped up with ``set_speed``,
+or stepped by hand with ``set_manual`` and ``advance``.
+"""
+
+import time
+
+speed = 1.0
+# Device time while the clock is stepped by hand, None when free-running
+manual_time = None
+
+
+def set_speed(value):
+    """
+    :param value: Device seconds per wall second, e.g. 4 to run a
+        benchmark four times faster than real time.
+    """
+    global speed
+    speed = float(value)
+
+
+def set_manual(start=0.0):
+    """
+    Stop following the wall clock: time only moves on ``advance`` and
+    nothing sleeps. The fakes then run no threads of their own.
+    """
+    global manual_time
+    manual_time = float(start)
+
+
+def advance(seconds):
+    global manual_time
+    manual_time += seconds
+
+
+def now():
+    """
+    Current device time in seconds.
+    """
+    if manual_time is not None:
+        return manual_time
+    return time.monotonic() * speed
+
+
+def sleep_until(deadline):
+    """
+    Sleep until device time ``deadline``.
+    """
+    if manual_time is not None:
+        return
+    remaining = (deadline - now()) / speed
+    if remaining > 0:
+        time.sleep(remaining)
+
+
+def sleep(seconds):
+    if seconds > 0 and manual_time is None:
+        time.sleep(seconds / speed)
@@ -0,0 +1,349 @@
+"""
+Stand-in for the ``daily`` module (daily-python), driven by the bench
+device clock
+
+Covers the surface DailyCall uses: virtual microphone and speaker devices,
+a CallClient that "joins" after a configurable delay and then announces a
+"Vapi Speaker" bot, per-participant audio renderers, and event/completion
+delivery on a single worker thread shared by every client, the way
+daily-python delivers them.
+
+Joining a URL registered in ``rooms`` brings in that room's
+``ScriptedBot``; any other URL gets a bot that talks right away. The bot
+hears the client's virtual microphone and is played through the selected
+virtual speaker and through any renderer set on it, in real time.
+"""
+
+import collections
+import heapq
+import itertools
+import threading
+
+from bench import clock
+from bench.scripted_bot import ScriptedBot
+
+JOIN_DELAY = 0.05
+
+counters = collections.Counter()
+app_messages = []
+# meeting URL -> ScriptedBot, filled in by the stand-in Vapi server
+rooms = {}
+
+_devices = {}
+_selected_speaker = None
+
+
+class _Worker:
+    """
+    Daily's event thread: runs callbacks at device-clock deadlines, in
+    order, one at a time.
+    """
+
+    def __init__(self):
+        self.__queue = []
+        self.__order = itertools.count()
+        self.__condition = threading.Condition()
+        self.__thread = None
+
+    def call_at(self, deadline, callback, *args):
+        with self.__condition:
+            heapq.heappush(self.__queue, (deadline, next(self.__order), callback, args))
+            if self.__thread is None and clock.manual_time is None:
+                self.__thread = threading.Thread(target=self.__run, daemon=True)
+                self.__thread.start()
+            self.__condition.notify()
+
+    def call_soon(self, callback, *args):
+        self.call_at(clock.now(), callback, *args)
+
+    def run_pending(self):
+        """
+        Run every callback that is due, on the calling thread (manual clock).
+        """
+        while True:
+            with self.__condition:
+                if not self.__queue or self.__queue[0][0] > clock.now():
+                    return
+                _, _, callback, args = heapq.heappop(self.__queue)
+            counters["worker_callbacks"] += 1
+            callback(*args)
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while not self.__queue:
+                    self.__condition.wait()
+                deadline = self.__queue[0][0]
+                wait = (deadline - clock.now()) / clock.speed
+                if wait > 0:
+                    self.__condition.wait(wait)
+                    continue
+                _, _, callback, args = heapq.heappop(self.__queue)
+            counters["worker_callbacks"] += 1
+            callback(*args)
+
+
+_worker = _Worker()
+
+
+def run_pending():
+    """
+    With a manual clock, deliver the events and completions that are due.
+    """
+    _worker.run_pending()
+
+
+class EventHandler:
+    pass
+
+
+class VirtualMicrophoneDevice:
+    def __init__(self, name, sample_rate, channels, non_blocking):
+        self.name = name
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.non_blocking = non_blocking
+        self.listener = None
+        self.__clock = None
+
+    def write_frames(self, frames, completion=None):
+        # daily-python only accepts bytes; catch bytearray/memoryview leaks
+        if not isinstance(frames, bytes):
+            raise TypeError("write_frames() expects bytes")
+        count = len(frames) // (2 * self.channels)
+        counters["mic_frames"] += count
+        counters["mic_writes"] += 1
+        listener = self.listener
+        if listener is not None:
+            listener.hear(frames)
+        if completion is not None:
+            _worker.call_soon(completion, count)
+            return count
+        if not self.non_blocking:
+            # Consumed at the device rate, like the real virtual mic
+            now = clock.now()
+            if self.__clock is None or self.__clock < now:
+                self.__clock = now
+            self.__clock += count / self.sample_rate
+            clock.sleep_until(self.__clock - count / self.sample_rate)
+        return count
+
+
+class VirtualSpeakerDevice:
+    def __init__(self, name, sample_rate, channels, non_blocking):
+        self.name = name
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.non_blocking = non_blocking
+        self.source = None
+        self.__clock = None
+
+    def __next_deadline(self, num_frames):
+        now = clock.now()
+        if self.__clock is None or now - self.__clock > 1.0:
+            self.__clock = now
+        self.__clock += num_frames / self.sample_rate
+        return self.__clock
+
+    def read_frames(self, num_frames, completion=None):
+        counters["speaker_reads"] += 1
+        if not self.non_blocking:
+            # Like daily-python, a blocking speaker ignores ``completion``
+            clock.sleep_until(self.__next_deadline(num_frames))
+            return self.__read(num_frames)
+        if completion is None:
+            # Only what has been rendered so far, which may be nothing
+            if self.__clock is not None and clock.now() < self.__clock:
+                return b""
+            self.__next_deadline(num_frames)
+            return self.__read(num_frames)
+        deadline = self.__next_deadline(num_frames)
+        _worker.call_at(deadline, self.__complete, num_frames, completion)
+        return None
+
+    def __complete(self, num_frames, completion):
+        completion(self.__read(num_frames))
+
+    def __read(self, num_frames):
+        counters["speaker_frames"] += num_frames
+        source = self.source
+        if source is None:
+            return bytes(num_frames * 2 * self.channels)
+        return source.read(num_frames)
+
+
+class AudioData:
+    def __init__(self, audio_frames, sample_rate, num_channels=1):
+        self.audio_frames = audio_frames
+        self.sample_rate = sample_rate
+        self.num_channels = num_channels
+        self.bits_per_sample = 16
+        self.num_audio_frames = len(audio_frames) // (2 * num_channels)
+
+
+class NativeVad:
+    def analyze_frames(self, frames):
+        if not isinstance(frames, bytes):
+            raise TypeError("analyze_frames() expects bytes")
+        return 0.9
+
+
+class Daily:
+    @staticmethod
+    def init(**kwargs):
+        counters["init"] += 1
+
+    @staticmethod
+    def deinit():
+        counters["deinit"] += 1
+
+    @staticmethod
+    def create_microphone_device(
+        device_name, sample_rate=16000, channels=1, non_blocking=False
+    ):
+        device = VirtualMicrophoneDevice(
+            device_name, sample_rate, channels, non_blocking
+        )
+        _devices[device_name] = device
+        return device
+
+    @staticmethod
+    def create_speaker_device(
+        device_name, sample_rate=16000, channels=1, non_blocking=False
+    ):
+        device = VirtualSpeakerDevice(device_name, sample_rate, channels, non_blocking)
+        _devices[device_name] = device
+        return device
+
+    @staticmethod
+    def select_speaker_device(device_name):
+        global _selected_speaker
+        _selected_speaker = device_name
+
+    @staticmethod
+    def create_native_vad(reset_period_ms=1000, sample_rate=16000, channels=1):
+        return NativeVad()
+
+
+def _bot_participant(state):
+    return {
+        "id": "bot",
+        "info": {"userName": "Vapi Speaker"},
+        "media": {"microphone": {"subscribed": "subscribed", "state": state}},
+    }
+
+
+class CallClient:
+    def __init__(self, event_handler=None):
+        self.__handler = event_handler or EventHandler()
+        self.__mic_name = None
+        self.__bot = None
+        # Renderers on the bot, each delivering until the bot is detached
+        self.__renderers = []
+
+    def __emit(self, name, *args):
+        handler = getattr(self.__handler, name, None)
+        if handler is not None:
+            _worker.call_soon(handler, *args)
+
+    def update_inputs(self, inputs, completion=None):
+        microphone = inputs.get("microphone")
+        if isinstance(microphone, dict):
+            self.__mic_name = microphone.get("settings", {}).get("deviceId")
+        self.__emit("on_inputs_updated", inputs)
+        if completion is not None:
+            _worker.call_soon(completion, inputs, None)
+
+    def update_subscription_profiles(self, profiles, completion=None):
+        if completion is not None:
+            _worker.call_soon(completion, profiles, None)
+
+    def participants(self):
+        return {"local": {"id": "local", "info": {"userName": "bench"}}}
+
+    def set_audio_renderer(
+        self,
+        participant_id,
+        callback,
+        audio_source="microphone",
+        sample_rate=16000,
+        callback_interval_ms=20,
+    ):
+        if participant_id != "bot":
+            return
+        renderer = (callback, audio_source, sample_rate, callback_interval_ms)
+        self.__renderers.append(renderer)
+        if self.__bot is not None:
+            self.__render(self.__bot, renderer, clock.now())
+
+    def __render(self, bot, renderer, deadline):
+        if self.__bot is not bot or renderer not in self.__renderers:
+            return
+        callback, audio_source, sample_rate, interval_ms = renderer
+        num_frames = sample_rate * interval_ms // 1000
+        deadline += interval_ms / 1000
+        counters["rendered_frames"] += num_frames
+        audio = AudioData(bot.read(num_frames), sample_rate)
+        callback("bot", audio, audio_source)
+        _worker.call_at(deadline, self.__render, bot, renderer, deadline)
+
+    def join(self, meeting_url, meeting_token=None, completion=None, **kwargs):
+        bot = rooms.get(meeting_url) or ScriptedBot()
+
+        def joined():
+            counters["joins"] += 1
+            self.__attach(bot)
+            if completion is not None:
+                completion({"meetingUrl": meeting_url}, None)
+            _worker.call_at(clock.now() + bot.join_delay, self.__bot_joined)
+
+        _worker.call_at(clock.now() + JOIN_DELAY, joined)
+
+    def __attach(self, bot):
+        self.__bot = bot
+        bot.joined()
+        mic = _devices.get(self.__mic_name)
+        if mic is not None:
+            mic.listener = bot
+        speaker = _devices.get(_selected_speaker)
+        if speaker is not None:
+            speaker.source = bot
+        for renderer in self.__renderers:
+            _worker.call_soon(self.__render, bot, renderer, clock.now())
+
+    def __detach(self):
+        bot, self.__bot = self.__bot, None
+        self.__renderers.clear()
+        if bot is None:
+            return
+        for device in _devices.values():
+            if getattr(device, "listener", None) is bot:
+                device.listener = None
+            if getattr(device, "source", None) is bot:
+                device.source = None
+
+    def __bot_joined(self):
+        handler = self.__handler
+        if self.__bot is None:
+            return
+        for name, args in (
+            ("on_participant_joined", (_bot_participant("loading"),)),
+            ("on_participant_updated", (_bot_participant("playable"),)),
+        ):
+            if hasattr(handler, name):
+                getattr(handler, name)(*args)
+
+    def leave(self, completion=None):
+        self.__detach()
+        counters["leaves"] += 1
+        if completion is not None:
+            _worker.call_soon(completion, None)
+
+    def release(self):
+        self.__detach()
+        counters["releases"] += 1
+
+    def send_app_message(self, message, participant=None, completion=None):
+        app_messages.append(message)
+        if completion is not None:
+            _worker.call_soon(completion, None)
@@ -0,0 +1,199 @@
+"""
+Stand-in for the ``pyaudio`` module, driven by the bench device clock
+
+Streams behave like a sound card: blocking reads return one period once
+the clock has produced it, blocking writes wait while the output queue is
+full, and callback streams call back once per period from their own
+thread. Installed in ``sys.modules`` by ``bench.fakes.install``.
+"""
+
+import collections
+import threading
+import time
+
+from bench import clock
+from bench.signals import TalkingSource
+
+paInt16 = 8
+paContinue = 0
+paComplete = 1
+paAbort = 2
+paInputOverflow = 2
+paOutputUnderflow = 4
+
+# Periods the output side may queue before write() blocks
+OUTPUT_PERIODS = 2
+# Periods the input side holds before it overflows and drops audio
+INPUT_PERIODS = 4
+
+counters = collections.Counter()
+# Every stream opened, newest last, so a stepped benchmark can drive them
+streams = []
+# Wall-clock time the first non-silent output was played, see reset()
+first_audio_at = None
+first_audio = threading.Event()
+
+
+def reset():
+    global first_audio_at
+    counters.clear()
+    first_audio_at = None
+    first_audio.clear()
+
+
+def _is_readonly_buffer(data):
+    # PyAudio parses output with "s#"/"z#": bytes or read-only buffers only
+    return isinstance(data, bytes) or (isinstance(data, memoryview) and data.readonly)
+
+
+def _note_output(data):
+    global first_audio_at
+    if first_audio_at is None and bytes(data).strip(b"\0"):
+        first_audio_at = time.monotonic()
+        first_audio.set()
+
+
+class Stream:
+    def __init__(
+        self,
+        *,
+        format,
+        channels,
+        rate,
+        input=False,
+        output=False,
+        input_device_index=None,
+        output_device_index=None,
+        frames_per_buffer=1024,
+        stream_callback=None,
+        start=True,
+    ):
+        self.rate = rate
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+        self.__frame_bytes = channels * 2
+        self.__source = TalkingSource(rate, channels) if input else None
+        self.__callback = stream_callback
+        self.__active = False
+        self.__thread = None
+        self.__read_clock = None
+        self.__write_clock = None
+        self.__deadline = None
+        streams.append(self)
+        if start:
+            self.start_stream()
+
+    def start_stream(self):
+        if self.__active:
+            return
+        self.__active = True
+        self.__read_clock = clock.now()
+        self.__write_clock = None
+        self.__deadline = clock.now()
+        if self.__callback is not None and clock.manual_time is None:
+            self.__thread = threading.Thread(target=self.__run_callback, daemon=True)
+            self.__thread.start()
+
+    def stop_stream(self):
+        self.__active = False
+        thread = self.__thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self.__thread = None
+
+    def close(self):
+        self.stop_stream()
+
+    def is_active(self):
+        return self.__active
+
+    def read(self, num_frames, exception_on_overflow=True):
+        period = num_frames / self.rate
+        if clock.now() - self.__read_clock > INPUT_PERIODS * period:
+            # Nobody read for a while: the hardware buffer overflowed
+            counters["input_overflows"] += 1
+            self.__read_clock = clock.now() - period
+        # A period becomes readable once the device clock has recorded it
+        self.__read_clock += period
+        clock.sleep_until(self.__read_clock)
+        counters["input_frames"] += num_frames
+        return self.__source.read(num_frames)
+
+    def write(self, frames, num_frames=None, exception_on_underflow=False):
+        if num_frames is None:
+            num_frames = len(frames) // self.__frame_bytes
+        if not _is_readonly_buffer(frames):
+            raise TypeError("write() expects bytes or a read-only buffer")
+        now = clock.now()
+        if self.__write_clock is None or self.__write_clock < now:
+            if self.__write_clock is not None:
+                counters["output_underflows"] += 1
+            self.__write_clock = now
+        self.__write_clock += num_frames / self.rate
+        counters["output_frames"] += num_frames
+        if first_audio_at is None:
+            _note_output(frames)
+        # Block while more than OUTPUT_PERIODS are queued ahead of the DAC
+        queued_until = self.__write_clock - OUTPUT_PERIODS * num_frames / self.rate
+        clock.sleep_until(queued_until)
+
+    def __run_callback(self):
+        period = self.frames_per_buffer / self.rate
+        while self.__active:
+            self.__deadline += period
+            clock.sleep_until(self.__deadline)
+            if not self.step():
+                break
+        self.__active = False
+
+    def step(self):
+        """
+        Run the callback for one period. Called by the stream's own thread,
+        or by hand when the clock is manual.
+
+        :return: False once the callback has asked to stop.
+        """
+        period = self.frames_per_buffer / self.rate
+        status = 0
+        if clock.now() - self.__deadline > period:
+            # Fell more than a period behind: report an xrun
+            status = paInputOverflow | paOutputUnderflow
+            self.__deadline = clock.now()
+        in_data = None
+        if self.__source is not None:
+            in_data = self.__source.read(self.frames_per_buffer)
+            counters["input_frames"] += self.frames_per_buffer
+        out_data, flag = self.__callback(in_data, self.frames_per_buffer, {}, status)
+        counters["callbacks"] += 1
+        if out_data:
+            if len(out_data) != self.frames_per_buffer * self.__frame_bytes:
+                raise ValueError("callback returned a short buffer")
+            if not _is_readonly_buffer(out_data):
+                raise TypeError("callback must return bytes or a read-only buffer")
+            counters["output_frames"] += self.frames_per_buffer
+            if first_audio_at is None:
+                _note_output(out_data)
+        return flag == paContinue
+
+
+class PyAudio:
+    def __init__(self):
+        counters["instances"] += 1
+
+    def open(self, **kwargs):
+        return Stream(**kwargs)
+
+    def get_device_count(self):
+        return 1
+
+    def get_device_info_by_index(self, index):
+        return {
+            "index": 0,
+            "name": "bench",
+            "maxInputChannels": 2,
+            "maxOutputChannels": 2,
+            "defaultSampleRate": 48000.0,
+        }
+
+    def terminate(self):
+        counters["terminated"] += 1
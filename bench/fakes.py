@@ -0,0 +1,79 @@
+"""
+Install the fake ``daily`` and ``pyaudio`` modules
+
+Must run before ``daily_call``, ``vapi_python`` or ``vapi_async`` are
+imported, since those bind the modules at import time.
+"""
+
+import sys
+
+from bench import clock, fake_daily, fake_pyaudio
+
+
+def install(speed=1.0, manual=False):
+    """
+    Replace ``daily`` and ``pyaudio`` with the bench fakes.
+
+    :param speed: Device clock speed, see ``bench.clock.set_speed``.
+    :param manual: Step the device clock by hand instead, see
+        ``bench.clock.set_manual``.
+    """
+    for name in ("daily_call", "vapi_python", "vapi_async"):
+        if name in sys.modules:
+            raise RuntimeError(f"{name} was imported before the fakes")
+    clock.set_speed(speed)
+    if manual:
+        clock.set_manual()
+    sys.modules["daily"] = fake_daily
+    sys.modules["pyaudio"] = fake_pyaudio
+
+
+def reset_counters():
+    fake_daily.counters.clear()
+    fake_daily.app_messages.clear()
+    fake_pyaudio.reset()
+    fake_pyaudio.streams.clear()
+
+
+def counters():
+    """
+    Merged counters from both fakes since the last reset.
+    """
+    merged = dict(fake_pyaudio.counters)
+    merged.update(fake_daily.counters)
+    return merged
+
+
+class FakeResponse:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self.__data = data
+
+    def json(self):
+        return self.__data
+
+
+class FakeVapiSession:
+    """
+    Answers ``VapiSession.post`` locally, for benchmarking ``Vapi``
+    without the network.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def post(self, path, payload, *, idempotent=False):
+        clock.sleep(self.delay)
+        self.calls += 1
+        call_id = f"bench-call-{self.calls}"
+        return FakeResponse(
+            201,
+            {"id": call_id, "webCallUrl": f"https://bench.daily.co/{call_id}"},
+        )
+
+    def warm(self):
+        pass
+
+    def close(self):
+        pass
@@ -0,0 +1,158 @@
+"""
+Cold-start import time budget for the entry-point modules
+
+Each module is imported in a fresh interpreter with ``-X importtime`` and
+the median cumulative time is compared to its budget. Run from the
+repository root:
+
+    python -m bench.import_time [--runs 5] [--scale 1] [--budget main=120]
+        [--skip-missing]
+
+Budgets are for a desktop-class machine; pass ``--scale`` (about 20 for a
+Pi Zero) to stretch them. Exits with status 1 when any module is over or
+cannot be imported; ``--skip-missing`` only reports the latter, for
+machines without the full set of dependencies.
+
+``button_voice_assistant`` claims its GPIO pins at import, so it is
+measured with a stand-in ``gpiozero`` whose ``Button`` and ``LED`` do
+nothing. The stand-in exists only in the measuring interpreter, and
+gpiozero's own import and pin setup are left out of the figure.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Milliseconds of cumulative import time. vapi_python must stay tiny:
+# everything heavy is deferred until a call is made or preloaded.
+IMPORT_BUDGETS_MS = {
+    "main": 60,
+    "vapi_python": 15,
+    "vapi_http": 250,
+    "daily_call": 300,
+    "button_voice_assistant": 60,
+}
+# Modules replaced by a do-nothing stand-in while an entry point is measured
+STUBBED_MODULES = {"button_voice_assistant": ("gpiozero",)}
+STUB_CODE = (
+    "import sys, types\n"
+    "stub = sys.modules[{name!r}] = types.ModuleType({name!r})\n"
+    "stub.__getattr__ = lambda attribute: lambda *args, **kwargs: None\n"
+)
+HEAVIEST = 5
+
+
+def measure(module):
+    """
+    Import ``module`` once in a new interpreter.
+
+    :return: ``(total_us, {submodule: cumulative_us})``, or None if the
+        import failed.
+    """
+    code = "".join(
+        STUB_CODE.format(name=name) for name in STUBBED_MODULES.get(module, ())
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"{code}import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return None
+
+    # Children are listed before their parent, indented two spaces per
+    # level; everything before the module's subtree is interpreter startup
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line.split("|")
+        if not total.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((depth, name.strip(), int(total)))
+
+    for index in range(len(entries) - 1, -1, -1):
+        depth, name, total = entries[index]
+        if depth == 0 and name == module:
+            break
+    else:
+        return 0, {}
+
+    children = {}
+    for depth, name, cumulative in reversed(entries[:index]):
+        if depth == 0:
+            break
+        children[name] = cumulative
+    return total, children
+
+
+def check(module, budget_ms, runs):
+    """
+    :return: True if over budget, False if within it, None if ``module``
+        could not be imported.
+    """
+    samples = []
+    imports = {}
+    for _ in range(runs):
+        measured = measure(module)
+        if measured is None:
+            print(f"  {module:<22} not importable here")
+            return None
+        total, imports = measured
+        samples.append(total)
+
+    median_ms = statistics.median(samples) / 1000
+    over = median_ms > budget_ms
+    status = "OVER" if over else "ok"
+    print(f"  {module:<22} {median_ms:8.1f} ms  budget {budget_ms:.0f} ms  {status}")
+
+    heaviest = sorted((total, name) for name, total in imports.items())[-HEAVIEST:]
+    for total, name in reversed(heaviest):
+        print(f"      {name:<30} {total / 1000:8.1f} ms")
+    return over
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument(
+        "--budget",
+        action="append",
+        default=[],
+        metavar="MODULE=MS",
+        help="override or add a budget",
+    )
+    parser.add_argument(
+        "--skip-missing",
+        action="store_true",
+        help="do not fail when a module cannot be imported",
+    )
+    args = parser.parse_args()
+
+    budgets = dict(IMPORT_BUDGETS_MS)
+    for override in args.budget:
+        module, ms = override.split("=")
+        budgets[module] = float(ms)
+
+    print(f"Import time (median of {args.runs} cold starts):")
+    failed = False
+    for module, budget_ms in budgets.items():
+        over = check(module, budget_ms * args.scale, args.runs)
+        if over or (over is None and not args.skip_missing):
+            failed = True
+
+    if failed:
+        print("❌ Import time budget exceeded or module not importable")
+        sys.exit(1)
+    print("✅ Import times within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Scripted "Vapi Speaker" participant for the fake Daily layer
+"""
+
+import collections
+import wave
+
+from bench import clock
+from bench.signals import TalkingSource
+
+BOT_TALK = "talk"
+BOT_ECHO = "echo"
+BOT_CANNED = "canned"
+BOT_MODES = (BOT_TALK, BOT_ECHO, BOT_CANNED)
+
+BOT_JOIN_DELAY = 0.0
+FIRST_AUDIO_DELAY = 0.0
+ECHO_DELAY = 0.2
+
+
+def load_wav(path, sample_rate=16000):
+    """
+    Read a 16-bit mono WAV at ``sample_rate`` into bytes.
+    """
+    with wave.open(path, "rb") as wav:
+        if (
+            wav.getsampwidth() != 2
+            or wav.getnchannels() != 1
+            or wav.getframerate() != sample_rate
+        ):
+            raise ValueError(f"{path} must be 16-bit mono at {sample_rate} Hz")
+        return wav.readframes(wav.getnframes())
+
+
+class ScriptedBot:
+    """
+    What the assistant says once a call is joined.
+
+    ``talk`` speaks continuously in bursts, ``echo`` plays back whatever
+    the local microphone sent after ``echo_delay``, and ``canned`` plays
+    ``audio`` once. Nothing is heard before ``first_audio_delay`` has
+    passed since the join, which stands in for the assistant's greeting
+    latency.
+    """
+
+    def __init__(
+        self,
+        mode=BOT_TALK,
+        *,
+        join_delay=BOT_JOIN_DELAY,
+        first_audio_delay=FIRST_AUDIO_DELAY,
+        echo_delay=ECHO_DELAY,
+        audio=b"",
+        sample_rate=16000,
+    ):
+        if mode not in BOT_MODES:
+            raise ValueError(f"Unknown bot mode: {mode}")
+        self.mode = mode
+        self.join_delay = join_delay
+        self.first_audio_delay = first_audio_delay
+        self.__sample_rate = sample_rate
+        self.__echo_bytes = int(echo_delay * sample_rate) * 2
+        self.__audio = audio
+        self.__talk = TalkingSource(sample_rate) if mode == BOT_TALK else None
+        self.__heard = collections.deque()
+        self.__heard_bytes = 0
+        self.__position = 0
+        self.__speaks_at = None
+        self.joined_at = None
+
+    def joined(self):
+        self.joined_at = clock.now()
+        self.__speaks_at = self.joined_at + self.first_audio_delay
+
+    def hear(self, frames):
+        """
+        Audio the local participant sent (echo mode only keeps it).
+        """
+        if self.mode == BOT_ECHO and self.__speaks_at is not None:
+            self.__heard.append(frames)
+            self.__heard_bytes += len(frames)
+
+    def read(self, num_frames):
+        size = num_frames * 2
+        if self.__speaks_at is None or clock.now() < self.__speaks_at:
+            return bytes(size)
+
+        if self.mode == BOT_TALK:
+            return self.__talk.read(num_frames)
+
+        if self.mode == BOT_CANNED:
+            chunk = self.__audio[self.__position : self.__position + size]
+            self.__position += len(chunk)
+            return chunk.ljust(size, b"\0")
+
+        # Echo: hold back echo_delay worth of audio, then replay in order
+        if self.__heard_bytes - size < self.__echo_bytes:
+            return bytes(size)
+        out = bytearray()
+        while len(out) < size:
+            head = self.__heard.popleft()
+            take = size - len(out)
+            out += head[:take]
+            if len(head) > take:
+                self.__heard.appendleft(head[take:])
+        self.__heard_bytes -= size
+        return bytes(out)
@@ -0,0 +1,71 @@
+"""
+Synthetic audio for the fake backends
+"""
+
+import math
+from array import array
+
+# Voiced bursts separated by pauses, roughly like turn-taking speech
+TALK_SECONDS = 2.0
+PAUSE_SECONDS = 1.0
+# Talk is split into words with short gaps, as in real speech
+WORD_SECONDS = 0.5
+WORD_GAP_SECONDS = 0.15
+
+_cycles = {}
+
+
+def render_cycle(sample_rate, channels, pitch, amplitude):
+    """
+    One talk/pause cycle of interleaved int16 bytes, cached per format.
+    """
+    key = (sample_rate, channels, pitch, amplitude)
+    cycle = _cycles.get(key)
+    if cycle is not None:
+        return cycle
+
+    talk = int(TALK_SECONDS * sample_rate)
+    period = int((TALK_SECONDS + PAUSE_SECONDS) * sample_rate)
+    samples = array("h", bytes(period * channels * 2))
+    for n in range(talk):
+        t = n / sample_rate
+        if t % (WORD_SECONDS + WORD_GAP_SECONDS) >= WORD_SECONDS:
+            continue
+        envelope = 0.6 + 0.4 * math.sin(2 * math.pi * 3 * t)
+        value = int(amplitude * envelope * math.sin(2 * math.pi * pitch * t))
+        for channel in range(channels):
+            samples[n * channels + channel] = value
+    cycle = _cycles[key] = samples.tobytes()
+    return cycle
+
+
+class TalkingSource:
+    """
+    Generates int16 audio that alternates between a voiced,
+    amplitude-modulated tone broken into words and silence.
+
+    The talk/pause cycle is rendered up front and each chunk is sliced
+    from it once and then reused, so after one cycle reads allocate
+    nothing and cost almost nothing next to the code under test.
+    """
+
+    def __init__(self, sample_rate, channels=1, pitch=180.0, amplitude=8000):
+        self.__frame_bytes = channels * 2
+        cycle = render_cycle(sample_rate, channels, pitch, amplitude)
+        # Doubled so a read that wraps around is still one slice
+        self.__cycle = cycle + cycle
+        self.__cycle_bytes = len(cycle)
+        self.__position = 0
+        self.__chunks = {}
+
+    def read(self, frames):
+        size = frames * self.__frame_bytes
+        if size > self.__cycle_bytes:
+            raise ValueError("Read larger than one talk/pause cycle")
+        start = self.__position
+        self.__position = (start + size) % self.__cycle_bytes
+        key = (start, size)
+        chunk = self.__chunks.get(key)
+        if chunk is None:
+            chunk = self.__chunks[key] = self.__cycle[start : start + size]
+        return chunk
@@ -0,0 +1,170 @@
+"""
+Local stand-in for the Vapi REST API
+
+Implements ``POST /call/web`` (and ``HEAD /`` for connection warm-up)
+on a ThreadingHTTPServer with injectable latency and failures. Every call
+it creates gets a meeting URL registered in ``bench.fake_daily.rooms``
+with a ``ScriptedBot``, so ``Vapi.start`` runs end to end without the
+network once ``bench.fakes.install`` is in effect.
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench import fake_daily
+from bench.scripted_bot import BOT_TALK, ScriptedBot
+
+ROOM_URL = "https://bench.daily.co/"
+
+
+class StandInVapi:
+    """
+    :param latency: Seconds every ``POST /call/web`` takes.
+    :param jitter: Extra random latency, uniform in ``[0, jitter]``.
+    :param error_rate: Fraction of requests answered with ``error_status``.
+    :param drop_rate: Fraction of requests whose connection is closed
+        without a response, after the request was read.
+    :param bot: Keyword arguments for each call's ``ScriptedBot``.
+    :param seed: Seed for the latency and failure draws.
+    """
+
+    def __init__(
+        self,
+        *,
+        api_key="bench",
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        error_status=503,
+        drop_rate=0.0,
+        bot=None,
+        seed=0,
+        host="127.0.0.1",
+        port=0,
+    ):
+        self.api_key = api_key
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.drop_rate = drop_rate
+        self.bot = bot or {"mode": BOT_TALK}
+        self.__random = random.Random(seed)
+        self.__lock = threading.Lock()
+        self.__next_id = 0
+        self.requests = 0
+        self.created = []
+        self.failed = 0
+
+        self.__server = ThreadingHTTPServer((host, port), self.__handler_class())
+        self.__server.daemon_threads = True
+        self.__thread = None
+
+    @property
+    def url(self):
+        host, port = self.__server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.__thread = threading.Thread(
+            target=self.__server.serve_forever, daemon=True
+        )
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+        for call_id in self.created:
+            fake_daily.rooms.pop(ROOM_URL + call_id, None)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def next_outcome(self):
+        """
+        Draw the latency and injected failure (None, "error" or "drop")
+        for one request.
+        """
+        with self.__lock:
+            self.requests += 1
+            delay = self.latency + self.__random.uniform(0, self.jitter)
+            roll = self.__random.random()
+        if roll < self.drop_rate:
+            return delay, "drop"
+        if roll < self.drop_rate + self.error_rate:
+            return delay, "error"
+        return delay, None
+
+    def create_call(self):
+        with self.__lock:
+            self.__next_id += 1
+            call_id = f"standin-{self.__next_id}"
+            self.created.append(call_id)
+        web_call_url = ROOM_URL + call_id
+        fake_daily.rooms[web_call_url] = ScriptedBot(**self.bot)
+        return {"id": call_id, "webCallUrl": web_call_url}
+
+    def __handler_class(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def __reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+
+                if self.path != "/call/web":
+                    self.__reply(404, {"message": f"Cannot POST {self.path}"})
+                    return
+                if self.headers.get("Authorization") != f"Bearer {service.api_key}":
+                    self.__reply(401, {"message": "Invalid API key"})
+                    return
+                try:
+                    payload = json.loads(body)
+                except ValueError:
+                    self.__reply(400, {"message": "Invalid JSON"})
+                    return
+                if not any(
+                    payload.get(key)
+                    for key in ("assistantId", "assistant", "squadId", "squad")
+                ):
+                    self.__reply(400, {"message": "No assistant specified"})
+                    return
+
+                delay, failure = service.next_outcome()
+                time.sleep(delay)
+                if failure == "drop":
+                    service.failed += 1
+                    self.close_connection = True
+                    return
+                if failure == "error":
+                    service.failed += 1
+                    self.__reply(service.error_status, {"message": "Injected error"})
+                    return
+                self.__reply(201, service.create_call())
+
+        return Handler
@@ -4,19 +4,31 @@ Button-triggered voice assistant on Raspberry Pi
 Press the button to toggle VAPI calls (start/stop)
 Uses system default audio device (configure with set_wm8960_default.py)
 LED on GPIO25 blinks when call is active
+
+VAPI_PREFETCH hides call setup latency:
+  off      create the call when the button is pressed (default)
+  press    create the call on button-down, join it on button-up
+  standby  always keep one created call ready to join
 """
 
 import os
+import signal
 import threading
 import time
 from gpiozero import Button, LED
 from dotenv import load_dotenv
 
+# Standby mode replaces the prepared call once it has less than this
+# many seconds left (see vapi_python.PREPARED_CALL_TTL)
+STANDBY_MIN_REMAINING = 30
+STANDBY_CHECK_INTERVAL = 10
+
 # Load environment variables
 load_dotenv()
 
 api_key = os.getenv("VAPI_API_KEY")
 assistant_id = os.getenv("VAPI_ASSISTANT_ID")
+prefetch_mode = os.getenv("VAPI_PREFETCH", "off")
 
 # Hardware setup (GPIO pins from NOTES.md)
 button = Button(23)  # Button on GPIO23
@@ -27,6 +39,12 @@ vapi_client = None
 call_active = False
 led_thread = None
 led_stop_event = threading.Event()
+prepare_thread = None
+# Held while a call is prepared or consumed, from any thread, so a press
+# never starts a second call while the standby loop is preparing one
+prepare_lock = threading.Lock()
+press_starts_call = False  # Press mode: this press's button-up joins a call
+standby_wakeup = threading.Event()
 
 
 def led_blink_pattern():
@@ -90,9 +108,42 @@ def initialize_vapi():
         return False
 
 
+def prepare_vapi_call(min_remaining=0):
+    """Create the web call and warm up audio ahead of start_vapi_call"""
+    with prepare_lock:
+        # A press may have started a call or used up the last one meanwhile
+        if call_active or vapi_client.prepared_call_ready(min_remaining):
+            return
+        try:
+            call_id = vapi_client.prepare(assistant_id=assistant_id)
+            print(f"⚡ Call {call_id} prepared")
+        except Exception as e:
+            print(f"❌ Error preparing call: {e}")
+
+
+def start_preparing():
+    """Prepare a call on a background thread"""
+    global prepare_thread
+
+    if prepare_thread and prepare_thread.is_alive():
+        return
+    if vapi_client.prepared_call_ready():
+        return
+    prepare_thread = threading.Thread(target=prepare_vapi_call, daemon=True)
+    prepare_thread.start()
+
+
+def standby_loop():
+    """Keep one prepared call ready, replacing it before it expires"""
+    while True:
+        prepare_vapi_call(min_remaining=STANDBY_MIN_REMAINING)
+        standby_wakeup.wait(timeout=STANDBY_CHECK_INTERVAL)
+        standby_wakeup.clear()
+
+
 def start_vapi_call():
     """Start a VAPI call using the client library"""
-    global vapi_client, call_active
+    global vapi_client, call_active, prepare_thread
 
     if not vapi_client:
         print("❌ VAPI client not initialized")
@@ -104,10 +155,17 @@ def start_vapi_call():
 
     try:
         print(f"🎙️  Starting VAPI call with assistant_id: {assistant_id}")
-        vapi_client.start(assistant_id=assistant_id)
-        call_active = True
+        started_at = time.monotonic()
+        if prepare_thread:
+            prepare_thread.join()
+            prepare_thread = None
+        # Waits for a standby prepare in flight and then joins its call
+        with prepare_lock:
+            vapi_client.start(assistant_id=assistant_id)
+            call_active = True
         start_led_blinking()  # Start LED blinking when call starts
-        print("📞 Call started successfully!")
+        elapsed = (time.monotonic() - started_at) * 1000
+        print(f"📞 Call started successfully! ({elapsed:.0f} ms)")
     except Exception as e:
         print(f"❌ Error starting call: {e}")
 
@@ -125,6 +183,7 @@ def stop_vapi_call():
         call_active = False
         stop_led_blinking()  # Stop LED blinking when call stops
         print("📴 Call stopped")
+        standby_wakeup.set()  # Line up the next call right away
     except Exception as e:
         print(f"❌ Error stopping call: {e}")
         call_active = False  # Reset state even if there's an error
@@ -143,15 +202,66 @@ def on_button_press():
         start_vapi_call()
 
 
+def on_button_down_prefetch():
+    """Button-down in press mode: stop, or start creating the call"""
+    global press_starts_call
+
+    if call_active:
+        press_starts_call = False
+        print("🔘 Button pressed! Call active - stopping voice assistant...")
+        stop_vapi_call()
+    else:
+        press_starts_call = True
+        print("🔘 Button pressed! Preparing call...")
+        start_preparing()
+
+
+def on_button_up_prefetch():
+    """Button-up in press mode: join the call prepared on button-down"""
+    global press_starts_call
+
+    # Only the press that began preparing a call starts it, so releasing
+    # the button after a press that ended a call does not start another
+    if press_starts_call and not call_active:
+        press_starts_call = False
+        print("🔘 Button released! Joining voice assistant...")
+        start_vapi_call()
+
+
 def on_button_release():
     """Handle button release event (optional - can stop the call)"""
     print("🔘 Button released! Stopping voice assistant...")
     stop_vapi_call()
 
 
+def print_latency_stats(signum=None, frame=None):
+    """Print live audio latency percentiles (kill -USR1 <pid>)"""
+    stats = vapi_client.get_latency_stats() if vapi_client else None
+    if not stats:
+        print("📊 No audio latency stats (no active call)")
+        return
+    print("📊 Audio latency (ms):")
+    for stage, summary in stats.items():
+        print(f"   {stage}: {summary}")
+
+
+def preload_modules():
+    """Import the HTTP and audio stacks while the daemon starts up"""
+    try:
+        import vapi_python
+
+        vapi_python.preload()
+    except ImportError:
+        pass  # initialize_vapi reports missing dependencies
+
+
 def main():
     print("🚀 Button-triggered voice assistant on Raspberry Pi")
 
+    # requests, daily and pyaudio load in the background; the first call
+    # that needs them waits on the import lock instead of re-importing
+    threading.Thread(target=preload_modules, daemon=True).start()
+
     # Check environment variables
     if not api_key:
         print("❌ VAPI_API_KEY not set in environment variables")
@@ -172,14 +282,25 @@ def main():
         return
 
     # Set up button events
-    button.when_pressed = on_button_press
+    if prefetch_mode == "press":
+        button.when_pressed = on_button_down_prefetch
+        button.when_released = on_button_up_prefetch
+    else:
+        button.when_pressed = on_button_press
     # Uncomment the next line if you want to stop the call when button is released
     # button.when_released = on_button_release
 
+    if prefetch_mode == "standby":
+        threading.Thread(target=standby_loop, daemon=True).start()
+    print(f"   Call prefetch: {prefetch_mode}")
+
+    signal.signal(signal.SIGUSR1, print_latency_stats)
+
     print("\n🎯 Ready! Press the button on GPIO23 to toggle voice assistant")
     print("   First press: Start call | Second press: Stop call")
     print("   💡 LED on GPIO25 will blink when call is active")
     print("   Audio uses system default device")
+    print(f"   kill -USR1 {os.getpid()} prints audio latency stats")
     print("   Press CTRL+C to exit")
 
     try:
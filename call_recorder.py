@@ -0,0 +1,313 @@
+"""
+Opt-in call recording that never blocks the audio threads
+"""
+
+import os
+import shutil
+import subprocess
+import threading
+import time
+import wave
+
+import numpy as np
+
+from audio_ring_buffer import AudioRingBuffer, DROP_NEWEST
+
+# How much audio each direction may queue while the disk is stalled
+BUFFER_SECONDS = 10
+# How often the writer drains the queues
+WRITE_INTERVAL = 0.25
+# Audio older than this is final: a direction that sent nothing until then
+# was silent (e.g. the VAD gate was closed), not late
+ALIGN_DELAY = 0.5
+SEGMENT_SECONDS = 300
+MAX_DISK_MB = 500
+
+ENCODE_FLAC = "flac"
+ENCODE_OPUS = "opus"
+ENCODERS = {
+    ENCODE_FLAC: ["-c:a", "flac"],
+    ENCODE_OPUS: ["-c:a", "libopus", "-b:a", "32k"],
+}
+RECORDING_SUFFIXES = (".wav", ".flac", ".opus")
+
+# Files any recorder in the process is still writing or encoding. Calls
+# can share a directory, so pruning must skip other recorders' files too
+_busy_lock = threading.Lock()
+_busy_paths = set()
+
+
+class CallRecorder:
+    """
+    Records both directions of a call as time-aligned stereo WAV segments,
+    the microphone on the left channel and the bot on the right.
+
+    ``record_mic`` and ``record_bot`` are called from the audio threads and
+    only copy the chunk into a lock-free ring (see ``AudioRingBuffer``);
+    when a ring is full the chunk is counted and dropped rather than
+    waiting. A writer thread places every chunk on a common timeline by
+    its timestamp, fills gaps with silence and writes the result, so a
+    slow SD card only ever delays the writer.
+
+    Segments are rotated every ``segment_seconds``; with ``encode`` each
+    closed segment is converted by an ffmpeg process and the WAV removed.
+    Whenever a segment is finished the oldest recordings in ``directory``
+    are deleted until they fit in ``max_disk_mb``, except files that a
+    recorder in this process is still writing or encoding.
+    """
+
+    def __init__(
+        self,
+        directory,
+        *,
+        name,
+        sample_rate=16000,
+        chunk_frames=640,
+        segment_seconds=SEGMENT_SECONDS,
+        max_disk_mb=MAX_DISK_MB,
+        encode=None,
+        buffer_seconds=BUFFER_SECONDS,
+    ):
+        """
+        :param name: Prefix for this recording's files.
+        :param chunk_frames: Size of the chunks the taps are called with.
+        :param encode: None to keep WAV, ``"flac"`` or ``"opus"``.
+        """
+        if encode is not None and encode not in ENCODERS:
+            raise ValueError(f"Unknown encoding: {encode}")
+        if encode is not None and shutil.which("ffmpeg") is None:
+            print("ffmpeg not found, keeping recordings as WAV")
+            encode = None
+
+        os.makedirs(directory, exist_ok=True)
+        # Absolute, so paths compare equal across recorders in _busy_paths
+        self.directory = os.path.abspath(directory)
+        self.name = name
+        self.__rate = sample_rate
+        self.__chunk_bytes = chunk_frames * 2
+        self.__segment_frames = int(segment_seconds * sample_rate)
+        self.__max_disk_bytes = max_disk_mb * 1024 * 1024
+        self.__encode = encode
+
+        self.__rings = [
+            AudioRingBuffer(
+                depth_ms=buffer_seconds * 1000,
+                sample_rate=sample_rate,
+                policy=DROP_NEWEST,
+                stamp_bytes=self.__chunk_bytes,
+            )
+            for _ in range(2)
+        ]
+        self.__chunk = bytearray(self.__chunk_bytes)
+
+        # Writer state: per direction, audio not yet written and the
+        # timeline frame its first byte belongs at
+        self.__origin_ns = None
+        self.__pending = [bytearray(), bytearray()]
+        self.__pending_start = [0, 0]
+        self.__written = 0
+        self.__segment = None
+        self.__segment_path = None
+        self.__segment_index = 0
+        self.__segment_frames_written = 0
+        self.__encoders = []
+
+        self.segments = []
+        self.__closing = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, name=f"recorder-{name}")
+        self.__thread.start()
+
+    def record_mic(self, buffer, stamp_ns):
+        """
+        Tap for microphone audio. Never blocks.
+        """
+        self.__rings[0].write(buffer, stamp_ns)
+
+    def record_bot(self, buffer, stamp_ns):
+        """
+        Tap for bot audio, as played. Never blocks.
+        """
+        self.__rings[1].write(buffer, stamp_ns)
+
+    def close(self, wait=True):
+        """
+        Write out everything queued and finish the last segment.
+
+        :param wait: Also wait for the writer and encoders. Without it the
+            writer finishes on its own thread, which keeps the process
+            alive until the recording is safely on disk.
+        """
+        self.__closing.set()
+        if wait:
+            self.__thread.join()
+
+    def stats(self):
+        return {
+            "segments": len(self.segments),
+            "seconds": round(self.__written / self.__rate, 1),
+            "dropped_mic_ms": round(self.__rings[0].dropped_bytes / self.__rate / 2e-3),
+            "dropped_bot_ms": round(self.__rings[1].dropped_bytes / self.__rate / 2e-3),
+        }
+
+    def __run(self):
+        try:
+            while not self.__closing.wait(WRITE_INTERVAL):
+                self.__drain()
+                self.__write(self.__frame_at(time.monotonic_ns() - ALIGN_DELAY * 1e9))
+                self.__poll_encoders()
+            self.__drain()
+            self.__write(max(self.__cursor(0), self.__cursor(1)))
+            self.__finish_segment()
+            for process, wav_path, path in self.__encoders:
+                process.wait()
+            self.__poll_encoders()
+        except OSError as e:
+            print(f"Recording {self.name} stopped: {e}")
+        finally:
+            paths = [self.__segment_path]
+            for _, wav_path, path in self.__encoders:
+                paths += [wav_path, path]
+            with _busy_lock:
+                _busy_paths.difference_update(paths)
+
+    def __frame_at(self, stamp_ns):
+        if self.__origin_ns is None:
+            return 0
+        return int((stamp_ns - self.__origin_ns) * self.__rate // 1e9)
+
+    def __cursor(self, direction):
+        return self.__pending_start[direction] + len(self.__pending[direction]) // 2
+
+    def __drain(self):
+        chunk = self.__chunk
+        for direction, ring in enumerate(self.__rings):
+            pending = self.__pending[direction]
+            while ring.read_into(chunk):
+                if self.__origin_ns is None:
+                    self.__origin_ns = ring.last_stamp
+                # Chunks keep their place on the timeline; a gap (nothing
+                # sent, or chunks dropped) becomes silence, while small
+                # scheduling jitter is absorbed by writing back to back
+                gap = self.__frame_at(ring.last_stamp) - self.__cursor(direction)
+                if gap > len(chunk) // 4:
+                    pending.extend(bytes(gap * 2))
+                pending.extend(chunk)
+
+    def __write(self, until):
+        """
+        Write both directions up to timeline frame ``until``.
+        """
+        for direction in (0, 1):
+            # Nothing more will arrive for this stretch: it was silence
+            missing = until - self.__cursor(direction)
+            if missing > 0:
+                self.__pending[direction].extend(bytes(missing * 2))
+
+        while until > self.__written:
+            if self.__segment is None:
+                self.__start_segment()
+            count = min(
+                until - self.__written,
+                self.__segment_frames - self.__segment_frames_written,
+            )
+            frames = np.empty((count, 2), dtype=np.int16)
+            for direction in (0, 1):
+                offset = (self.__written - self.__pending_start[direction]) * 2
+                pending = self.__pending[direction]
+                frames[:, direction] = np.frombuffer(
+                    pending, dtype=np.int16, count=count, offset=offset
+                )
+            self.__segment.writeframes(frames.tobytes())
+            self.__written += count
+            self.__segment_frames_written += count
+            if self.__segment_frames_written >= self.__segment_frames:
+                self.__finish_segment()
+
+        for direction in (0, 1):
+            used = (self.__written - self.__pending_start[direction]) * 2
+            if used > 0:
+                del self.__pending[direction][:used]
+                self.__pending_start[direction] = self.__written
+
+    def __start_segment(self):
+        self.__segment_index += 1
+        path = os.path.join(
+            self.directory, f"{self.name}-{self.__segment_index:03d}.wav"
+        )
+        with _busy_lock:
+            _busy_paths.add(path)
+        # wave rewrites the header on every writeframes, so a segment cut
+        # short by a crash or power loss is still a valid file
+        self.__segment = wave.open(path, "wb")
+        self.__segment.setnchannels(2)
+        self.__segment.setsampwidth(2)
+        self.__segment.setframerate(self.__rate)
+        self.__segment_path = path
+        self.__segment_frames_written = 0
+
+    def __finish_segment(self):
+        if self.__segment is None:
+            return
+        self.__segment.close()
+        self.__segment = None
+        path = self.__segment_path
+        if self.__encode is None:
+            with _busy_lock:
+                _busy_paths.discard(path)
+            self.segments.append(path)
+        else:
+            encoded = os.path.splitext(path)[0] + "." + self.__encode
+            with _busy_lock:
+                _busy_paths.add(encoded)
+            process = subprocess.Popen(
+                ["ffmpeg", "-y", "-loglevel", "error", "-i", path]
+                + ENCODERS[self.__encode]
+                + [encoded],
+                stdin=subprocess.DEVNULL,
+            )
+            self.__encoders.append((process, path, encoded))
+        self.__enforce_disk_limit()
+
+    def __poll_encoders(self):
+        running = []
+        encoded = False
+        for process, wav_path, path in self.__encoders:
+            status = process.poll()
+            if status is None:
+                running.append((process, wav_path, path))
+                continue
+            with _busy_lock:
+                _busy_paths.difference_update((wav_path, path))
+            if status == 0:
+                os.remove(wav_path)
+                self.segments.append(path)
+                encoded = True
+            else:
+                print(f"Encoding {wav_path} failed, keeping the WAV")
+                self.segments.append(wav_path)
+        self.__encoders = running
+        if encoded:
+            self.__enforce_disk_limit()
+
+    def __enforce_disk_limit(self):
+        # Never remove what is still being written or encoded, by this
+        # recorder or another call's; the lock keeps a segment from being
+        # started in the middle of the pass
+        with _busy_lock:
+            recordings = []
+            for entry in os.scandir(self.directory):
+                if (
+                    entry.is_file()
+                    and entry.name.endswith(RECORDING_SUFFIXES)
+                    and entry.path not in _busy_paths
+                ):
+                    stat = entry.stat()
+                    recordings.append((stat.st_mtime, stat.st_size, entry.path))
+            recordings.sort()
+            total = sum(size for _, size, _ in recordings)
+            for _, size, path in recordings:
+                if total <= self.__max_disk_bytes:
+                    break
+                os.remove(path)
+                total -= size
+                print(f"Removed old recording {path}")
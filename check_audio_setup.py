@@ -3,73 +3,63 @@
 Audio setup checker - shows current audio configuration and available devices
 """
 
-import pyaudio
-import subprocess
-import os
+from audio_diagnostics import run_diagnostics
 
 
-def list_pyaudio_devices():
+def list_pyaudio_devices(report):
     """List PyAudio devices (what daily_call sees)"""
     print("🎵 PyAudio Devices (what daily_call.py sees):")
     print("=" * 60)
 
-    audio = pyaudio.PyAudio()
-    device_count = audio.get_device_count()
-
-    for i in range(device_count):
-        device_info = audio.get_device_info_by_index(i)
-        print(f"Device {i}: {device_info['name']}")
-        print(f"  Input Channels: {device_info['maxInputChannels']}")
-        print(f"  Output Channels: {device_info['maxOutputChannels']}")
-        print(f"  Sample Rate: {device_info['defaultSampleRate']}")
-        print(
-            f"  Host API: {audio.get_host_api_info_by_index(device_info['hostApi'])['name']}"
-        )
+    portaudio = report["probes"]["portaudio"]
+    if not portaudio["ok"]:
+        print(f"❌ Could not list PyAudio devices: {portaudio['error']}")
+        return
+
+    for device in portaudio["devices"]:
+        print(f"Device {device['index']}: {device['name']}")
+        print(f"  Input Channels: {device['input_channels']}")
+        print(f"  Output Channels: {device['output_channels']}")
+        print(f"  Sample Rate: {device['default_sample_rate']}")
+        print(f"  Host API: {device['host_api']}")
         print("-" * 40)
 
     # Show default devices
-    try:
-        default_input = audio.get_default_input_device_info()
-        default_output = audio.get_default_output_device_info()
-        print(
-            f"✅ Default Input: Device {default_input['index']} - {default_input['name']}"
-        )
-        print(
-            f"✅ Default Output: Device {default_output['index']} - {default_output['name']}"
-        )
+    inputs = [device for device in portaudio["devices"] if device["default_input"]]
+    outputs = [device for device in portaudio["devices"] if device["default_output"]]
+    if inputs:
+        print(f"✅ Default Input: Device {inputs[0]['index']} - {inputs[0]['name']}")
+    if outputs:
+        print(f"✅ Default Output: Device {outputs[0]['index']} - {outputs[0]['name']}")
         print(
-            f"🔊 daily_call.py is currently using: Device {default_output['index']} for output"
+            f"🔊 daily_call.py is currently using: Device {outputs[0]['index']} for output"
         )
-    except Exception as e:
-        print(f"❌ Error getting default devices: {e}")
-
-    audio.terminate()
+    if not inputs or not outputs:
+        print("❌ Error getting default devices")
 
 
-def list_alsa_devices():
+def list_alsa_devices(report):
     """List ALSA devices (system level)"""
     print("\n🔧 ALSA Devices (system level):")
     print("=" * 60)
 
-    try:
-        # List ALSA cards
-        result = subprocess.run(["aplay", "-l"], capture_output=True, text=True)
-        if result.returncode == 0:
-            print("ALSA Playback Devices:")
-            print(result.stdout)
-        else:
-            print("❌ Could not list ALSA devices")
-    except FileNotFoundError:
-        print("❌ aplay command not found")
-
-    try:
-        # List ALSA capture devices
-        result = subprocess.run(["arecord", "-l"], capture_output=True, text=True)
-        if result.returncode == 0:
-            print("ALSA Capture Devices:")
-            print(result.stdout)
-    except FileNotFoundError:
-        print("❌ arecord command not found")
+    pcms = report["probes"]["alsa"].get("pcms", [])
+    if not pcms:
+        print("❌ Could not list ALSA devices")
+        return
+
+    for direction, title in (
+        ("playback", "ALSA Playback Devices:"),
+        ("capture", "ALSA Capture Devices:"),
+    ):
+        print(title)
+        for pcm in pcms:
+            if pcm[direction]:
+                print(
+                    f"card {pcm['card']}, device {pcm['device']}: "
+                    f"{pcm['id']} [{pcm['name']}]"
+                )
+        print()
 
 
 def check_current_daily_call_config():
@@ -126,8 +116,9 @@ def main():
     print("This tool helps identify which audio devices are available")
     print("and which device daily_call.py is currently using.\n")
 
-    list_pyaudio_devices()
-    list_alsa_devices()
+    report = run_diagnostics()
+    list_pyaudio_devices(report)
+    list_alsa_devices(report)
     check_current_daily_call_config()
     suggest_modifications()
 
@@ -1,11 +1,108 @@
 import daily
+import itertools
 import threading
-import pyaudio
 import json
-
-SAMPLE_RATE = 16000
-NUM_CHANNELS = 1
-CHUNK_SIZE = 640
+import time
+
+from audio_backends import (
+    BACKENDS,
+    CALLBACK_COMPLETE,
+    CALLBACK_CONTINUE,
+    default_device_format,
+    open_backend,
+)
+from audio_constants import CHUNK_BYTES, CHUNK_SIZE, NUM_CHANNELS, SAMPLE_RATE
+from audio_ring_buffer import AudioRingBuffer, DROP_OLDEST
+from latency_stats import LatencyStats
+
+# numpy and the modules built on it (resampler, jitter buffer, VAD) are
+# imported only when a feature that needs them is enabled
+
+# How much captured audio may queue up while the Daily side is stalled
+CAPTURE_BUFFER_MS = 200
+# How much bot audio the duplex engine may queue ahead of the speaker
+PLAYBACK_BUFFER_MS = 200
+
+# Two blocking streams, each driven by its own Python thread
+ENGINE_BLOCKING = "blocking"
+# One full-duplex stream driven by the audio backend's callback
+ENGINE_DUPLEX = "duplex"
+
+ENGINES = (ENGINE_BLOCKING, ENGINE_DUPLEX)
+
+# On barge-in, drop queued bot audio and mute it for the hold window
+BARGE_IN_FLUSH = "flush"
+# On barge-in, keep playing bot audio but attenuated for the hold window
+BARGE_IN_DUCK = "duck"
+
+BARGE_IN_MODES = (BARGE_IN_FLUSH, BARGE_IN_DUCK)
+# Consecutive speech needed before we interrupt the bot
+BARGE_IN_SPEECH_MS = 120
+# How long bot audio stays muted or ducked while the server catches up
+BARGE_IN_HOLD_MS = 800
+BARGE_IN_DUCK_GAIN = 0.2
+# Name of the playback pipeline stage that ducks bot audio
+BARGE_IN_DUCK_STAGE = "barge-in-duck"
+# Bot audio still counts as playing this long after the last loud chunk
+BOT_AUDIO_TAIL_MS = 300
+# Bot chunks quieter than this (dBFS) are comfort noise or dither
+BOT_AUDIO_MIN_DB = -50.0
+
+# Bot audio through the process-wide virtual speaker; daily-python lets
+# only one speaker be selected at a time, so one call can use this
+BOT_AUDIO_SPEAKER = "speaker"
+# Bot audio through an audio renderer on the bot participant of this call
+BOT_AUDIO_RENDERER = "renderer"
+
+BOT_AUDIO_ROUTES = (BOT_AUDIO_SPEAKER, BOT_AUDIO_RENDERER)
+
+LATENCY_STAGES = (
+    "capture.queue",
+    "capture.deliver",
+    "capture.total",
+    "playback.queue",
+    "playback.write",
+    "playback.total",
+)
+
+
+# Process-wide state shared by every DailyCall
+_shared_lock = threading.Lock()
+_daily_initialized = False
+_speaker_owner = None
+_call_numbers = itertools.count(1)
+
+
+def init_daily():
+    """
+    Initialize the Daily SDK, once per process.
+    """
+    global _daily_initialized
+    with _shared_lock:
+        if not _daily_initialized:
+            daily.Daily.init()
+            _daily_initialized = True
+
+
+def claim_speaker(owner):
+    """
+    Reserve the process-wide virtual speaker for ``owner``.
+
+    :return: False if another call already has it.
+    """
+    global _speaker_owner
+    with _shared_lock:
+        if _speaker_owner is not None and _speaker_owner is not owner:
+            return False
+        _speaker_owner = owner
+        return True
+
+
+def release_speaker(owner):
+    global _speaker_owner
+    with _shared_lock:
+        if _speaker_owner is owner:
+            _speaker_owner = None
 
 
 def is_playable_speaker(participant):
@@ -20,35 +117,284 @@ def is_playable_speaker(participant):
 
 
 class DailyCall(daily.EventHandler):
-    def __init__(self):
-        daily.Daily.init()
+    def __init__(
+        self,
+        *,
+        engine=ENGINE_BLOCKING,
+        capture_buffer_ms=CAPTURE_BUFFER_MS,
+        playback_buffer_ms=PLAYBACK_BUFFER_MS,
+        overflow_policy=DROP_OLDEST,
+        jitter_buffer=False,
+        device_rate=None,
+        device_channels=None,
+        mic_mode="average",
+        mic_delay_frames=0,
+        capture_stages=None,
+        playback_stages=None,
+        input_device_index=None,
+        output_device_index=None,
+        vad=False,
+        vad_silence="drop",
+        vad_model=None,
+        barge_in=False,
+        barge_in_mode=BARGE_IN_FLUSH,
+        barge_in_hold_ms=BARGE_IN_HOLD_MS,
+        latency_stats=True,
+        pump_thread=True,
+        event_listener=None,
+        bot_audio=None,
+        record_dir=None,
+        record_options=None,
+        audio_backend=None,
+    ):
+        """
+        :param engine: ``"blocking"`` (two blocking streams, one thread per
+            direction) or ``"duplex"`` (one full-duplex callback stream and
+            a single pump thread).
+        :param capture_buffer_ms: Depth of the queue between the microphone
+            and the Daily virtual microphone.
+        :param playback_buffer_ms: Depth of the queue between the Daily
+            virtual speaker and the duplex stream (duplex engine only).
+        :param overflow_policy: ``"drop-oldest"`` or ``"drop-newest"``, what
+            to discard when the capture queue is full.
+        :param jitter_buffer: Play bot audio through an adaptive jitter
+            buffer with loss concealment instead of as it arrives.
+        :param device_rate: Sample rate to open the sound card at. Audio is
+            resampled to and from 16 kHz internally, so a ``hw:`` device
+            can run at its native rate (e.g. 48000 on the WM8960).
+            Defaults to ``$AUDIO_DEVICE_RATE``, then 16000.
+        :param device_channels: Channel count to open the sound card with.
+            Capture is mixed down to mono, playback is copied to every
+            channel. Defaults to ``$AUDIO_DEVICE_CHANNELS``, then 1.
+        :param mic_mode: How a stereo device's two mics become one:
+            ``"average"``, ``"select"`` (the mic with the better SNR) or
+            ``"beamform"`` (delay-and-sum toward the front), see
+            ``stereo_mic``. Needs ``device_channels=2``.
+        :param mic_delay_frames: Steering delay for ``"beamform"`` in
+            device frames, 0 for a talker in front of the HAT.
+        :param capture_stages: ``audio_pipeline`` stages run on every
+            captured chunk, as mono 16 kHz float32 after mixdown and
+            resampling.
+        :param playback_stages: ``audio_pipeline`` stages run on every
+            chunk of bot audio, as mono 16 kHz float32 before resampling
+            and upmixing.
+        :param input_device_index: Input device as the audio backend names
+            it (a PyAudio index by default), default if None.
+        :param output_device_index: Output device as the audio backend
+            names it, default if None.
+        :param vad: Gate mic audio with a local voice-activity detector so
+            silence is not streamed upstream.
+        :param vad_silence: ``"drop"`` to send nothing while the gate is
+            closed, or ``"comfort-noise"`` to send low-level noise.
+        :param vad_model: Optional second-stage classifier: ``"native"``
+            for Daily's built-in VAD, or a callable taking chunk bytes and
+            returning a speech probability.
+        :param barge_in: Detect the user talking over the bot locally and
+            silence the bot right away instead of waiting for the server.
+        :param barge_in_mode: ``"flush"`` drops queued bot audio and mutes
+            it, ``"duck"`` only turns it down.
+        :param barge_in_hold_ms: How long bot audio stays muted or ducked
+            after a barge-in.
+        :param latency_stats: Timestamp every chunk and keep per-stage
+            latency histograms, see ``get_latency_stats``.
+        :param pump_thread: Run the duplex engine's pump on its own thread.
+            Pass False to drive it by calling ``pump_once`` from an event
+            loop instead; the virtual microphone is then non-blocking.
+        :param event_listener: Called as ``listener(name, data)`` from
+            Daily's thread for call events ("joined", "participant-joined",
+            "participant-left", "participant-updated", "app-message",
+            "call-state-updated", "error", "left").
+        :param bot_audio: How bot audio reaches this call: ``"speaker"``
+            through the process-wide virtual speaker, or ``"renderer"``
+            through an audio renderer on the bot participant. Only one
+            call at a time can use the speaker; by default a call takes it
+            if it is free and uses a renderer otherwise, so any number of
+            calls can run side by side.
+        :param record_dir: Record both directions of the call into this
+            directory, see ``CallRecorder``.
+        :param record_options: Keyword arguments for the ``CallRecorder``
+            (segment length, disk limit, encoding).
+        :param audio_backend: Where audio comes from and goes to: a name
+            from ``audio_backends.BACKENDS`` (``"pyaudio"``,
+            ``"sounddevice"``, ``"alsa"``, ``"file"``, ``"null"``) or a
+            backend instance, which the caller then closes. Defaults to
+            ``$AUDIO_BACKEND``, then ``"pyaudio"``. ``"alsa"`` opens the
+            WM8960's ``hw:`` device directly; that only works in the
+            codec's own format, so pass its ``device_rate`` and
+            ``device_channels`` (2 on the WM8960) or set
+            ``$AUDIO_DEVICE_RATE`` and ``$AUDIO_DEVICE_CHANNELS``.
+        """
+        fallback_rate, fallback_channels = default_device_format(
+            SAMPLE_RATE, NUM_CHANNELS
+        )
+        if device_rate is None:
+            device_rate = fallback_rate
+        if device_channels is None:
+            device_channels = fallback_channels
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown audio engine: {engine}")
+        if isinstance(audio_backend, str) and audio_backend not in BACKENDS:
+            raise ValueError(f"Unknown audio backend: {audio_backend}")
+        if not pump_thread and engine != ENGINE_DUPLEX:
+            raise ValueError("Only the duplex engine can run without threads")
+        if barge_in_mode not in BARGE_IN_MODES:
+            raise ValueError(f"Unknown barge-in mode: {barge_in_mode}")
+        if bot_audio is not None and bot_audio not in BOT_AUDIO_ROUTES:
+            raise ValueError(f"Unknown bot audio route: {bot_audio}")
+        if mic_mode != "average" and device_channels != 2:
+            raise ValueError(f"Microphone mode {mic_mode} needs two device channels")
+        if CHUNK_SIZE * device_rate % SAMPLE_RATE:
+            raise ValueError(
+                f"Device rate {device_rate} does not give a whole number of"
+                f" frames per {CHUNK_SIZE}-frame chunk"
+            )
 
-        self.__audio_interface = pyaudio.PyAudio()
+        init_daily()
+        self.call_number = next(_call_numbers)
+
+        if bot_audio is None:
+            bot_audio = BOT_AUDIO_SPEAKER
+            if not claim_speaker(self):
+                bot_audio = BOT_AUDIO_RENDERER
+        elif bot_audio == BOT_AUDIO_SPEAKER and not claim_speaker(self):
+            raise Exception("The virtual speaker is in use by another call")
+        self.__bot_audio = bot_audio
+
+        self.__engine = engine
+        self.__device_chunk_size = CHUNK_SIZE * device_rate // SAMPLE_RATE
+        self.__device_frame_bytes = device_channels * 2
+
+        # One float32 pass per chunk in each direction, and none at all
+        # when the device is 16 kHz mono and no stage is running
+        self.__capture_pipeline = None
+        if (
+            device_rate != SAMPLE_RATE
+            or device_channels != NUM_CHANNELS
+            or capture_stages
+        ):
+            from audio_pipeline import capture_pipeline
+            from stereo_mic import create_front_end
+
+            self.__capture_pipeline = capture_pipeline(
+                device_rate=device_rate,
+                device_channels=device_channels,
+                rate=SAMPLE_RATE,
+                device_chunk_frames=self.__device_chunk_size,
+                mixer=create_front_end(
+                    mic_mode,
+                    max_frames=self.__device_chunk_size,
+                    delay_frames=mic_delay_frames,
+                ),
+                stages=capture_stages or (),
+            )
 
-        self.__input_audio_stream = self.__audio_interface.open(
-            format=pyaudio.paInt16,
-            channels=NUM_CHANNELS,
-            rate=SAMPLE_RATE,
-            input=True,
-            frames_per_buffer=CHUNK_SIZE,
-        )
+        playback_stages = list(playback_stages or ())
+        if barge_in and barge_in_mode == BARGE_IN_DUCK:
+            from audio_pipeline import Gain
+
+            duck = Gain(name=BARGE_IN_DUCK_STAGE, budget_ms=0.2, bypass=True)
+            duck.gain = BARGE_IN_DUCK_GAIN
+            playback_stages.insert(0, duck)
+        self.__playback_pipeline = None
+        if (
+            device_rate != SAMPLE_RATE
+            or device_channels != NUM_CHANNELS
+            or playback_stages
+        ):
+            from audio_pipeline import playback_pipeline
+
+            self.__playback_pipeline = playback_pipeline(
+                device_rate=device_rate,
+                device_channels=device_channels,
+                rate=SAMPLE_RATE,
+                chunk_frames=CHUNK_SIZE,
+                stages=playback_stages,
+            )
 
-        self.__output_audio_stream = self.__audio_interface.open(
-            format=pyaudio.paInt16,
-            channels=NUM_CHANNELS,
-            rate=SAMPLE_RATE,
-            output=True,
-            frames_per_buffer=CHUNK_SIZE,
+        # Before the sound card is opened: blocking streams capture from
+        # then on, and the numpy import would queue up as stale audio
+        self.__voice_gate = None
+        self.__voice_detector = None
+        self.__bot_level = None
+        if vad or barge_in:
+            from voice_activity import ChunkLevel, VoiceActivityDetector, VoiceGate
+
+            self.__bot_level = ChunkLevel(CHUNK_SIZE)
+
+            if vad_model == "native":
+                vad_model = daily.Daily.create_native_vad(
+                    sample_rate=SAMPLE_RATE, channels=NUM_CHANNELS
+                ).analyze_frames
+            self.__voice_detector = VoiceActivityDetector(
+                sample_rate=SAMPLE_RATE, chunk_frames=CHUNK_SIZE, model=vad_model
+            )
+        if vad:
+            self.__voice_gate = VoiceGate(
+                self.__voice_detector,
+                sample_rate=SAMPLE_RATE,
+                chunk_frames=CHUNK_SIZE,
+                silence=vad_silence,
+            )
+
+        self.__owns_audio_backend = audio_backend is None or isinstance(
+            audio_backend, str
         )
+        if self.__owns_audio_backend:
+            audio_backend = open_backend(audio_backend)
+        self.__audio_backend = audio_backend
+
+        if engine == ENGINE_DUPLEX:
+            self.__duplex_audio_stream = audio_backend.open(
+                rate=device_rate,
+                channels=device_channels,
+                frames=self.__device_chunk_size,
+                input=True,
+                output=True,
+                input_device=input_device_index,
+                output_device=output_device_index,
+                callback=self.__on_duplex_audio,
+            )
+        else:
+            self.__input_audio_stream = audio_backend.open(
+                rate=device_rate,
+                channels=device_channels,
+                frames=self.__device_chunk_size,
+                input=True,
+                input_device=input_device_index,
+            )
+            self.__output_audio_stream = audio_backend.open(
+                rate=device_rate,
+                channels=device_channels,
+                frames=self.__device_chunk_size,
+                output=True,
+                output_device=output_device_index,
+            )
+            self.__capture_block = bytearray(
+                self.__device_chunk_size * self.__device_frame_bytes
+            )
 
+        # Device names are process-wide in Daily, so each call numbers its own
+        mic_name = f"vapi-mic-{self.call_number}"
         self.__mic_device = daily.Daily.create_microphone_device(
-            "my-mic", sample_rate=SAMPLE_RATE, channels=NUM_CHANNELS
+            mic_name,
+            sample_rate=SAMPLE_RATE,
+            channels=NUM_CHANNELS,
+            non_blocking=not pump_thread,
         )
 
-        self.__speaker_device = daily.Daily.create_speaker_device(
-            "my-speaker", sample_rate=SAMPLE_RATE, channels=NUM_CHANNELS
-        )
-        daily.Daily.select_speaker_device("my-speaker")
+        self.__speaker_device = None
+        if bot_audio == BOT_AUDIO_SPEAKER:
+            speaker_name = f"vapi-speaker-{self.call_number}"
+            # daily-python only honours read_frames completions, which
+            # the duplex pump relies on, on a non-blocking speaker
+            self.__speaker_device = daily.Daily.create_speaker_device(
+                speaker_name,
+                sample_rate=SAMPLE_RATE,
+                channels=NUM_CHANNELS,
+                non_blocking=engine == ENGINE_DUPLEX,
+            )
+            daily.Daily.select_speaker_device(speaker_name)
+        self.__rendered_participants = set()
 
         self.__call_client = daily.CallClient(event_handler=self)
 
@@ -58,7 +404,7 @@ class DailyCall(daily.EventHandler):
                 "microphone": {
                     "isEnabled": True,
                     "settings": {
-                        "deviceId": "my-mic",
+                        "deviceId": mic_name,
                         "customConstraints": {
                             "autoGainControl": {"exact": True},
                             "noiseSuppression": {"exact": True},
@@ -76,19 +422,109 @@ class DailyCall(daily.EventHandler):
         self.__participants = dict(self.__call_client.participants())
         del self.__participants["local"]
 
+        self.__event_listener = event_listener
         self.__app_quit = False
+        self.__audio_closed = False
+        self.__audio_started = False
         self.__app_error = None
         self.__app_joined = False
         self.__app_inputs_updated = False
 
-        self.__start_event = threading.Event()
-        self.__receive_bot_audio_thread = threading.Thread(
-            target=self.receive_bot_audio
+        if vad:
+            from voice_activity import PREROLL_MS
+
+            # The pre-roll puts capture that far behind until the gate wins
+            # it back; without room for it the queue would drop speech
+            capture_buffer_ms += PREROLL_MS
+        self.__capture_buffer = AudioRingBuffer(
+            depth_ms=capture_buffer_ms,
+            sample_rate=SAMPLE_RATE,
+            channels=NUM_CHANNELS,
+            policy=overflow_policy,
+            stamp_bytes=CHUNK_BYTES,
         )
-        self.__send_user_audio_thread = threading.Thread(target=self.send_user_audio)
+        self.__latency_stats = LatencyStats(LATENCY_STAGES) if latency_stats else None
+
+        self.__recorder = None
+        if record_dir is not None:
+            from call_recorder import CallRecorder
+
+            self.__recorder = CallRecorder(
+                record_dir,
+                name=time.strftime("call-%Y%m%d-%H%M%S-") + str(self.call_number),
+                sample_rate=SAMPLE_RATE,
+                chunk_frames=CHUNK_SIZE,
+                **(record_options or {}),
+            )
+            if barge_in and barge_in_mode == BARGE_IN_DUCK:
+                from audio_pipeline import Gain, Pipeline
+
+                # Bot audio is recorded as played, so while the duck is
+                # held the recording goes through a duck of its own
+                duck = Gain(name=BARGE_IN_DUCK_STAGE, budget_ms=0.2)
+                duck.gain = BARGE_IN_DUCK_GAIN
+                self.__record_duck = Pipeline(
+                    [duck],
+                    rate=SAMPLE_RATE,
+                    channels=NUM_CHANNELS,
+                    max_frames=CHUNK_SIZE,
+                )
+
+        if jitter_buffer:
+            from jitter_buffer import PlayoutJitterBuffer
+
+            self.__playback_buffer = PlayoutJitterBuffer(
+                sample_rate=SAMPLE_RATE,
+                chunk_frames=CHUNK_SIZE,
+                channels=NUM_CHANNELS,
+            )
+        else:
+            self.__playback_buffer = AudioRingBuffer(
+                depth_ms=playback_buffer_ms,
+                sample_rate=SAMPLE_RATE,
+                channels=NUM_CHANNELS,
+                policy=DROP_OLDEST,
+                stamp_bytes=CHUNK_BYTES,
+            )
+        self.__jitter_buffer = jitter_buffer
+        self.__playback_chunk = bytearray(CHUNK_BYTES)
+        # Backends take read-only buffers as well as bytes, so chunks are
+        # handed to them as views instead of being copied
+        self.__playback_view = memoryview(self.__playback_chunk).toreadonly()
+        self.__silence = bytes(self.__device_chunk_size * self.__device_frame_bytes)
+        self.__bot_audio_pending = False
+        self.__duplex_status_errors = 0
+
+        self.__barge_in = barge_in
+        self.__barge_in_mode = barge_in_mode
+        chunk_ms = CHUNK_SIZE * 1000 / SAMPLE_RATE
+        self.__barge_in_chunks = max(1, round(BARGE_IN_SPEECH_MS / chunk_ms))
+        self.__barge_in_hold = barge_in_hold_ms / 1000
+        self.__speech_run = 0
+        self.__bot_audio_until = 0.0
+        self.__bot_audio_tail = BOT_AUDIO_TAIL_MS / 1000
+        if jitter_buffer or engine == ENGINE_DUPLEX:
+            self.__bot_audio_tail += playback_buffer_ms / 1000
+        self.__duck_until = 0.0
+        self.__ducking = False
+        self.__flush_playback = False
+        self.__chunk_silence = bytes(CHUNK_BYTES)
+        self.barge_ins = 0
 
-        self.__receive_bot_audio_thread.start()
-        self.__send_user_audio_thread.start()
+        self.__start_event = threading.Event()
+        self.__pump_chunk = bytearray(CHUNK_BYTES)
+        if engine == ENGINE_DUPLEX:
+            targets = [self.pump_audio] if pump_thread else []
+        else:
+            targets = [self.send_user_audio, self.deliver_user_audio]
+            if jitter_buffer:
+                targets.append(self.play_bot_audio)
+            # A renderer writes straight into the jitter buffer
+            if not (jitter_buffer and bot_audio == BOT_AUDIO_RENDERER):
+                targets.append(self.receive_bot_audio)
+        self.__audio_threads = [threading.Thread(target=t) for t in targets]
+        for thread in self.__audio_threads:
+            thread.start()
 
     def on_inputs_updated(self, inputs):
         self.__app_inputs_updated = True
@@ -101,28 +537,154 @@ class DailyCall(daily.EventHandler):
         else:
             self.__app_joined = True
             print("Joined call!")
+        self.__emit("joined", {"data": data, "error": error})
         self.maybe_start()
 
     def on_participant_joined(self, participant):
         self.__participants[participant["id"]] = participant
+        self.__emit("participant-joined", participant)
 
-    def on_participant_left(self, participant, _):
+    def on_participant_left(self, participant, reason):
         del self.__participants[participant["id"]]
+        self.__emit("participant-left", participant)
         self.leave()
 
     def on_participant_updated(self, participant):
         self.__participants[participant["id"]] = participant
         if is_playable_speaker(participant):
             self.__call_client.send_app_message("playable")
+            self.__render_bot_audio(participant["id"])
+        self.__emit("participant-updated", participant)
+
+    def on_app_message(self, message, sender):
+        self.__emit("app-message", {"message": message, "sender": sender})
+
+    def on_call_state_updated(self, state):
+        self.__emit("call-state-updated", state)
+
+    def on_error(self, message):
+        self.__emit("error", message)
+
+    def __render_bot_audio(self, participant_id):
+        if (
+            self.__bot_audio != BOT_AUDIO_RENDERER
+            or participant_id in self.__rendered_participants
+        ):
+            return
+        self.__rendered_participants.add(participant_id)
+        self.__call_client.set_audio_renderer(
+            participant_id,
+            self.__on_rendered_audio,
+            sample_rate=SAMPLE_RATE,
+            callback_interval_ms=CHUNK_SIZE * 1000 // SAMPLE_RATE,
+        )
+
+    def __on_rendered_audio(self, participant_id, audio_data, audio_source):
+        # Runs on Daily's thread, which every call shares: queue and return
+        buffer = audio_data.audio_frames
+        if self.__app_quit or not buffer:
+            return
+        self.__note_bot_audio(buffer)
+        self.__playback_buffer.write(buffer, time.monotonic_ns())
+
+    def __emit(self, name, data):
+        if self.__event_listener is not None:
+            self.__event_listener(name, data)
 
     def join(self, meeting_url):
         self.__call_client.join(meeting_url, completion=self.on_joined)
 
-    def leave(self):
+    def leave(self, completion=None):
+        """
+        :param completion: Called with Daily's error (or None) once the
+            call has been left.
+        """
         self.__app_quit = True
-        self.__receive_bot_audio_thread.join()
-        self.__send_user_audio_thread.join()
-        self.__call_client.leave()
+        self.__capture_buffer.wake()
+        for thread in self.__audio_threads:
+            thread.join()
+        self.__close_audio()
+
+        def on_left(error):
+            self.__emit("left", {"error": error})
+            if completion is not None:
+                completion(error)
+
+        self.__call_client.leave(completion=on_left)
+
+        if self.__duplex_status_errors:
+            print(f"Duplex stream reported {self.__duplex_status_errors} xruns")
+
+        if self.__jitter_buffer:
+            print(f"Playout stats: {self.__playback_buffer.stats()}")
+
+        if self.__voice_gate:
+            print(f"Voice activity: {self.__voice_gate.stats()}")
+
+        if self.barge_ins:
+            print(f"Local barge-ins: {self.barge_ins}")
+
+        if self.__recorder:
+            print(f"Recording {self.__recorder.name}: {self.__recorder.stats()}")
+
+        for direction, stats in self.get_pipeline_stats().items():
+            overruns = {
+                name: stage["overruns"]
+                for name, stage in (stats or {}).items()
+                if stage["overruns"]
+            }
+            if overruns:
+                print(f"{direction.capitalize()} stages over budget: {overruns}")
+
+        if self.__latency_stats:
+            print("Audio latency:")
+            print(self.__latency_stats.format_report())
+
+        dropped = (
+            self.__capture_buffer.dropped_bytes
+            + self.__capture_buffer.overwritten_bytes
+        )
+        if dropped:
+            print(f"Dropped {dropped // CHUNK_BYTES} chunks of mic audio")
+
+    def release(self):
+        """
+        Tear down a call that was set up but never joined, e.g. a prepared
+        call that expired.
+        """
+        self.__app_quit = True
+        self.__start_event.set()
+        self.__capture_buffer.wake()
+        for thread in self.__audio_threads:
+            thread.join()
+        self.__close_audio()
+        self.__call_client.release()
+
+    def __close_audio(self):
+        # leave() can run twice: once when the bot hangs up, once from stop()
+        if self.__audio_closed:
+            return
+        self.__audio_closed = True
+
+        if self.__engine == ENGINE_DUPLEX:
+            streams = [self.__duplex_audio_stream]
+        else:
+            streams = [self.__input_audio_stream, self.__output_audio_stream]
+        for stream in streams:
+            stream.stop()
+            stream.close()
+        if self.__engine == ENGINE_BLOCKING:
+            # The duplex engine counts its xruns from the callback status
+            xruns = sum(stream.xruns for stream in streams)
+            if xruns:
+                print(f"Audio streams reported {xruns} xruns")
+        if self.__owns_audio_backend:
+            self.__audio_backend.close()
+        release_speaker(self)
+        if self.__recorder:
+            # Finishes writing on its own thread; leave() may be running
+            # on Daily's thread, which must not wait for the disk
+            self.__recorder.close(wait=False)
 
     def maybe_start(self):
         if self.__app_error:
@@ -138,15 +700,150 @@ class DailyCall(daily.EventHandler):
             print(f"Unable to receive mic audio!")
             return
 
+        # Capture only; delivery to Daily happens in deliver_user_audio so
+        # a slow write_frames never holds up the device read
+        while not self.__app_quit:
+            block = self.__capture_block
+            if self.__input_audio_stream.read_into(block) > 0:
+                captured = time.monotonic_ns()
+                self.__capture_buffer.write(self.__convert_capture(block), captured)
+
+    def deliver_user_audio(self):
+        self.__start_event.wait()
+
+        if self.__app_error:
+            return
+
+        chunk = bytearray(CHUNK_BYTES)
         while not self.__app_quit:
-            buffer = self.__input_audio_stream.read(
-                CHUNK_SIZE, exception_on_overflow=False
+            if not self.__capture_buffer.wait(CHUNK_BYTES, timeout=0.1):
+                continue
+            while self.__capture_buffer.read_into(chunk):
+                self.__deliver(chunk)
+
+    def __deliver(self, chunk):
+        dequeued = time.monotonic_ns()
+        if self.__recorder is not None:
+            self.__recorder.record_mic(chunk, self.__capture_buffer.last_stamp)
+
+        if self.__voice_gate is not None:
+            speech = self.__voice_gate.process(chunk, self.__write_mic)
+        else:
+            self.__write_mic(chunk)
+            speech = self.__barge_in and self.__voice_detector.is_speech(chunk)
+
+        if self.__barge_in:
+            self.__check_barge_in(speech)
+
+        stats = self.__latency_stats
+        if stats is not None:
+            done = time.monotonic_ns()
+            captured = self.__capture_buffer.last_stamp
+            stats.record("capture.queue", captured, dequeued)
+            stats.record("capture.deliver", dequeued, done)
+            stats.record("capture.total", captured, done)
+
+    def __check_barge_in(self, speech):
+        if not speech:
+            self.__speech_run = 0
+            return
+
+        self.__speech_run += 1
+        if self.__speech_run != self.__barge_in_chunks:
+            return
+
+        now = time.monotonic()
+        if now >= self.__bot_audio_until:
+            return
+
+        self.barge_ins += 1
+        self.__duck_until = now + self.__barge_in_hold
+        if self.__barge_in_mode == BARGE_IN_FLUSH:
+            # The queue belongs to the playback side, which does the clear
+            self.__flush_playback = True
+        self.send_app_message({"type": "barge-in"})
+
+    def __write_mic(self, buffer):
+        try:
+            self.__mic_device.write_frames(bytes(buffer))
+        except Exception as e:
+            print(e)
+
+    def pump_audio(self):
+        """
+        Duplex engine: move audio between the callback's queues and Daily.
+
+        Bot audio is requested asynchronously so this single thread only
+        ever blocks on delivering mic audio.
+        """
+        self.__start_event.wait()
+
+        if self.__app_error:
+            print(f"Unable to pump audio!")
+            return
+
+        while self.pump_once():
+            # Also woken by __on_bot_audio so the next read is issued promptly
+            self.__capture_buffer.wait(CHUNK_BYTES, timeout=0.1)
+
+    def pump_once(self):
+        """
+        Duplex engine: one non-blocking pass of the pump.
+
+        Starts the stream once the call is up, requests the next chunk of
+        bot audio if none is in flight and delivers all queued mic audio.
+        Event loops call this on a timer instead of running ``pump_audio``.
+
+        :return: False once the call has failed or been left.
+        """
+        if self.__app_error or self.__app_quit:
+            return False
+        if not self.__start_event.is_set():
+            return True
+
+        if not self.__audio_started:
+            self.__audio_started = True
+            self.__duplex_audio_stream.start()
+
+        if self.__speaker_device is not None and not self.__bot_audio_pending:
+            self.__bot_audio_pending = True
+            self.__speaker_device.read_frames(
+                CHUNK_SIZE, completion=self.__on_bot_audio
             )
-            if len(buffer) > 0:
-                try:
-                    self.__mic_device.write_frames(buffer)
-                except Exception as e:
-                    print(e)
+
+        chunk = self.__pump_chunk
+        while self.__capture_buffer.read_into(chunk):
+            self.__deliver(chunk)
+        return True
+
+    def __on_bot_audio(self, buffer):
+        if len(buffer) > 0:
+            self.__note_bot_audio(buffer)
+            self.__playback_buffer.write(buffer, time.monotonic_ns())
+        self.__bot_audio_pending = False
+        self.__capture_buffer.wake()
+
+    def __on_duplex_audio(self, in_data, frame_count, status):
+        # Runs on the backend's audio thread: no blocking, no printing
+        now = time.monotonic_ns()
+        if status:
+            self.__duplex_status_errors += 1
+
+        if in_data:
+            self.__capture_buffer.write(self.__convert_capture(in_data), now)
+
+        # frame_count is always the device chunk we asked for at open()
+        if self.__read_playback(self.__playback_chunk):
+            out_data = self.__readonly(
+                self.__prepare_playback(self.__playback_chunk, now)
+            )
+            self.__record_playback(self.__playback_buffer.last_stamp, now)
+        else:
+            out_data = self.__silence
+
+        if self.__app_quit:
+            return out_data, CALLBACK_COMPLETE
+        return out_data, CALLBACK_CONTINUE
 
     def receive_bot_audio(self):
         self.__start_event.wait()
@@ -155,11 +852,154 @@ class DailyCall(daily.EventHandler):
             print(f"Unable to receive bot audio!")
             return
 
+        if self.__speaker_device is None:
+            self.__play_rendered_audio()
+            return
+
         while not self.__app_quit:
             buffer = self.__speaker_device.read_frames(CHUNK_SIZE)
 
             if len(buffer) > 0:
-                self.__output_audio_stream.write(buffer, CHUNK_SIZE)
+                received = time.monotonic_ns()
+                self.__note_bot_audio(buffer)
+                if self.__jitter_buffer:
+                    self.__playback_buffer.write(buffer, received)
+                else:
+                    self.__play(self.__prepare_playback(buffer, received))
+                    self.__record_playback(received, received)
+
+    def __play_rendered_audio(self):
+        # Blocking engine without jitter buffer: play renderer audio as it
+        # is queued
+        chunk = self.__playback_chunk
+        while not self.__app_quit:
+            if not self.__playback_buffer.wait(CHUNK_BYTES, timeout=0.1):
+                continue
+            while self.__read_playback(chunk):
+                dequeued = time.monotonic_ns()
+                self.__play(self.__prepare_playback(chunk, dequeued))
+                self.__record_playback(self.__playback_buffer.last_stamp, dequeued)
+
+    def play_bot_audio(self):
+        """
+        Blocking engine with jitter buffer: paced by the output stream.
+        """
+        self.__start_event.wait()
+
+        if self.__app_error:
+            return
+
+        # The duplex callback, the only other user of this chunk, never
+        # runs alongside this engine
+        chunk = self.__playback_chunk
+        while not self.__app_quit:
+            self.__read_playback(chunk)
+            dequeued = time.monotonic_ns()
+            self.__play(self.__prepare_playback(chunk, dequeued))
+            self.__record_playback(self.__playback_buffer.last_stamp, dequeued)
+
+    def __record_playback(self, received, dequeued):
+        stats = self.__latency_stats
+        if stats is None or not received:
+            # Concealment and silence have no arrival time to measure from
+            return
+        done = time.monotonic_ns()
+        if dequeued != received:
+            stats.record("playback.queue", received, dequeued)
+        stats.record("playback.write", dequeued, done)
+        stats.record("playback.total", received, done)
+
+    def __read_playback(self, chunk):
+        if self.__flush_playback:
+            self.__flush_playback = False
+            self.__playback_buffer.clear()
+        return self.__playback_buffer.read_into(chunk)
+
+    def __note_bot_audio(self, buffer):
+        # Only audible bot audio counts: comfort noise and decoder dither
+        # would otherwise keep barge-in armed through the bot's silences
+        if self.__barge_in and self.__bot_level.rms_db(buffer) >= BOT_AUDIO_MIN_DB:
+            self.__bot_audio_until = time.monotonic() + self.__bot_audio_tail
+
+    def __prepare_playback(self, buffer, stamp):
+        held = self.__barge_in and time.monotonic() < self.__duck_until
+        if held and self.__barge_in_mode == BARGE_IN_FLUSH:
+            buffer = self.__chunk_silence[: len(buffer)]
+        if self.__barge_in_mode == BARGE_IN_DUCK and held != self.__ducking:
+            self.__ducking = held
+            self.__playback_pipeline.set_bypass(BARGE_IN_DUCK_STAGE, not held)
+        if self.__recorder is not None:
+            if self.__ducking:
+                self.__recorder.record_bot(self.__record_duck.process(buffer), stamp)
+            else:
+                self.__recorder.record_bot(buffer, stamp)
+        return self.__convert_playback(buffer)
+
+    def __readonly(self, buffer):
+        if buffer is self.__playback_chunk:
+            return self.__playback_view
+        if isinstance(buffer, bytearray):
+            return bytes(buffer)
+        return buffer
+
+    def __play(self, buffer):
+        self.__output_audio_stream.write(self.__readonly(buffer))
+
+    def __convert_capture(self, buffer):
+        if self.__capture_pipeline is None:
+            return buffer
+        return self.__capture_pipeline.process(buffer)
+
+    def __convert_playback(self, buffer):
+        if self.__playback_pipeline is None:
+            return buffer
+        return self.__playback_pipeline.process(buffer)
+
+    def get_pipeline_stats(self):
+        """
+        Per-stage processing times of the capture and playback pipelines,
+        see ``audio_pipeline.Pipeline.stats``.
+
+        :return: A dictionary with ``"capture"`` and ``"playback"``, each
+            None when that direction needs no processing.
+        """
+        return {
+            "capture": self.__capture_pipeline and self.__capture_pipeline.stats(),
+            "playback": self.__playback_pipeline and self.__playback_pipeline.stats(),
+        }
+
+    def get_playout_stats(self):
+        """
+        Live jitter buffer depth, target and underrun counters.
+
+        :return: A dictionary, or None when the jitter buffer is disabled.
+        """
+        if not self.__jitter_buffer:
+            return None
+        return self.__playback_buffer.stats()
+
+    def get_latency_stats(self):
+        """
+        Live per-stage latency percentiles in milliseconds.
+
+        Capture stages run from the device read to ``write_frames``,
+        playback stages from ``read_frames`` to the output stream write.
+
+        :return: A dictionary keyed by stage, or None when disabled.
+        """
+        if self.__latency_stats is None:
+            return None
+        return self.__latency_stats.report()
+
+    def get_vad_stats(self):
+        """
+        Speech/silence chunk counts and ratio for this call so far.
+
+        :return: A dictionary, or None when the VAD gate is disabled.
+        """
+        if self.__voice_gate is None:
+            return None
+        return self.__voice_gate.stats()
 
     def send_app_message(self, message):
         """
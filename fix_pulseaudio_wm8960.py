@@ -7,6 +7,8 @@ import subprocess
 import os
 import time
 
+from pulse_control import PulseError, get_control
+
 
 def restart_pulseaudio():
     """Restart PulseAudio to make it detect new devices"""
@@ -32,26 +34,13 @@ def force_load_wm8960_module():
     print("🎵 Loading WM8960 module in PulseAudio...")
     try:
         # Try to load the ALSA sink for card 2
-        result = subprocess.run(
-            [
-                "pactl",
-                "load-module",
-                "module-alsa-sink",
-                "device=hw:2,0",
-                "sink_name=wm8960_output",
-            ],
-            capture_output=True,
-            text=True,
+        get_control().load_module(
+            "module-alsa-sink", "device=hw:2,0", "sink_name=wm8960_output"
         )
-
-        if result.returncode == 0:
-            print("✅ WM8960 sink loaded successfully!")
-            return True
-        else:
-            print(f"❌ Failed to load WM8960 sink: {result.stderr}")
-            return False
-    except Exception as e:
-        print(f"❌ Error loading module: {e}")
+        print("✅ WM8960 sink loaded successfully!")
+        return True
+    except PulseError as e:
+        print(f"❌ Failed to load WM8960 sink: {e}")
         return False
 
 
@@ -59,67 +48,39 @@ def force_load_wm8960_source():
     """Force PulseAudio to load WM8960 source (microphone)"""
     print("🎤 Loading WM8960 source in PulseAudio...")
     try:
-        result = subprocess.run(
-            [
-                "pactl",
-                "load-module",
-                "module-alsa-source",
-                "device=hw:2,0",
-                "source_name=wm8960_input",
-            ],
-            capture_output=True,
-            text=True,
+        get_control().load_module(
+            "module-alsa-source", "device=hw:2,0", "source_name=wm8960_input"
         )
-
-        if result.returncode == 0:
-            print("✅ WM8960 source loaded successfully!")
-            return True
-        else:
-            print(f"❌ Failed to load WM8960 source: {result.stderr}")
-            return False
-    except Exception as e:
-        print(f"❌ Error loading source module: {e}")
+        print("✅ WM8960 source loaded successfully!")
+        return True
+    except PulseError as e:
+        print(f"❌ Failed to load WM8960 source: {e}")
         return False
 
 
 def list_sinks_after_load():
     """List sinks after loading modules"""
     try:
-        result = subprocess.run(
-            ["pactl", "list", "short", "sinks"], capture_output=True, text=True
-        )
-        if result.returncode == 0:
-            print("\n🔊 Available PulseAudio Sinks:")
-            print("-" * 40)
-            for line in result.stdout.strip().split("\n"):
-                if line:
-                    parts = line.split("\t")
-                    if len(parts) >= 2:
-                        sink_id = parts[0]
-                        sink_name = parts[1]
-                        print(f"  {sink_id}: {sink_name}")
-                        if "wm8960" in sink_name.lower():
-                            print(f"    ⭐ WM8960 detected!")
-    except:
-        pass
+        sinks = get_control().list_sinks()
+    except PulseError:
+        return
+    print("\n🔊 Available PulseAudio Sinks:")
+    print("-" * 40)
+    for sink_id, sink_name in sinks:
+        print(f"  {sink_id}: {sink_name}")
+        if "wm8960" in sink_name.lower():
+            print(f"    ⭐ WM8960 detected!")
 
 
 def set_wm8960_as_default():
     """Set WM8960 as default if it was loaded"""
     try:
         # Try to set wm8960_output as default
-        result = subprocess.run(
-            ["pactl", "set-default-sink", "wm8960_output"],
-            capture_output=True,
-            text=True,
-        )
-        if result.returncode == 0:
-            print("✅ WM8960 set as default sink!")
-            return True
-        else:
-            print("❌ Could not set WM8960 as default")
-            return False
-    except:
+        get_control().set_default_sink("wm8960_output")
+        print("✅ WM8960 set as default sink!")
+        return True
+    except PulseError:
+        print("❌ Could not set WM8960 as default")
         return False
 
 
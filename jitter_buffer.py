@@ -0,0 +1,234 @@
+"""
+Adaptive playout jitter buffer for bot audio
+"""
+
+import time
+
+import numpy as np
+
+from audio_ring_buffer import AudioRingBuffer, DROP_OLDEST
+
+MIN_TARGET_MS = 40
+MAX_TARGET_MS = 400
+MAX_DEPTH_MS = 1000
+FADE_MS = 4
+# Longest gap bridged by repeating the last chunk before going silent
+CONCEALMENT_MS = 80
+
+
+class PlayoutJitterBuffer:
+    """
+    Smooths bursty bot audio into a steady playout stream.
+
+    The producer side (``write``) tracks arrival jitter the way RFC 3550
+    does and derives a target depth from it. The consumer side
+    (``read_into``) always returns a full chunk: real audio while enough is
+    buffered, a fading repeat of the last chunk for short gaps, and
+    silence after that. Playback waits for the target depth before it
+    (re)starts, and whole chunks are discarded when the buffer runs well
+    above target, so latency settles at the smallest depth that does not
+    underrun.
+
+    Like ``AudioRingBuffer`` this expects exactly one producer and one
+    consumer thread.
+    """
+
+    def __init__(
+        self,
+        *,
+        sample_rate,
+        chunk_frames,
+        channels=1,
+        min_target_ms=MIN_TARGET_MS,
+        max_target_ms=MAX_TARGET_MS,
+        max_depth_ms=MAX_DEPTH_MS,
+        fade_ms=FADE_MS,
+        concealment_ms=CONCEALMENT_MS,
+    ):
+        self.__channels = channels
+        self.__chunk_bytes = chunk_frames * channels * 2
+        self.__chunk_ms = chunk_frames * 1000 / sample_rate
+        self.__min_target_ms = min_target_ms
+        self.__max_target_ms = max_target_ms
+        self.__concealment_ms = concealment_ms
+
+        self.__ring = AudioRingBuffer(
+            depth_ms=max(max_depth_ms, max_target_ms + 2 * self.__chunk_ms),
+            sample_rate=sample_rate,
+            channels=channels,
+            policy=DROP_OLDEST,
+            stamp_bytes=self.__chunk_bytes,
+        )
+
+        # Producer state
+        self.__last_arrival = None
+        self.__jitter_ms = 0.0
+
+        # Consumer state
+        self.__playing = False
+        self.__fade_in = False
+        # Nothing to conceal until audio has played: the silence before
+        # the first chunk is not a loss
+        self.__concealed_ms = concealment_ms
+        self.__concealment_gain = 1.0
+        self.__underrun_boost_ms = 0.0
+        self.__last_chunk = np.zeros(chunk_frames * channels, dtype=np.int16)
+        self.__last_frames = self.__last_chunk.reshape(chunk_frames, channels)
+        self.__work = np.zeros((chunk_frames, channels), dtype=np.float32)
+
+        fade_frames = max(1, min(chunk_frames, int(sample_rate * fade_ms / 1000)))
+        self.__fade_up = np.linspace(0.0, 1.0, fade_frames, dtype=np.float32)
+        self.__fade_up = self.__fade_up.reshape(-1, 1)
+        self.__fade_work = self.__work[:fade_frames]
+        self.__ramp = np.linspace(1.0, 0.0, chunk_frames, dtype=np.float32)
+        self.__ramp = self.__ramp.reshape(-1, 1)
+        self.__gain_ramp = np.zeros_like(self.__ramp)
+        self.__gain_span = np.zeros((), dtype=np.float32)
+        self.__gain_end = np.zeros((), dtype=np.float32)
+        # Array views of the caller's output buffer, rebuilt only when a
+        # different buffer is passed in
+        self.__out = None
+        self.__out_views = None
+
+        self.target_ms = float(min_target_ms)
+        # Arrival stamp of the last chunk read, 0 if it was concealment
+        self.last_stamp = 0
+        self.underruns = 0
+        self.concealed_chunks = 0
+        self.discarded_ms = 0.0
+
+    @property
+    def depth_ms(self):
+        return self.__ring.buffered_ms
+
+    @property
+    def jitter_ms(self):
+        return self.__jitter_ms
+
+    def stats(self):
+        return {
+            "depth_ms": round(self.depth_ms, 1),
+            "target_ms": round(self.target_ms, 1),
+            "jitter_ms": round(self.__jitter_ms, 1),
+            "underruns": self.underruns,
+            "concealed_chunks": self.concealed_chunks,
+            "discarded_ms": round(self.discarded_ms, 1),
+        }
+
+    def write(self, data, stamp=0):
+        """
+        Queue audio received from the network. Producer thread only.
+
+        :param stamp: Arrival timestamp handed back as ``last_stamp``.
+        """
+        now = time.monotonic()
+        if self.__last_arrival is not None:
+            expected_ms = len(data) / self.__ring.bytes_per_ms
+            deviation = abs((now - self.__last_arrival) * 1000 - expected_ms)
+            self.__jitter_ms += (deviation - self.__jitter_ms) / 16
+        self.__last_arrival = now
+
+        target = self.__min_target_ms + 3 * self.__jitter_ms
+        target += self.__underrun_boost_ms
+        self.target_ms = min(self.__max_target_ms, target)
+
+        return self.__ring.write(data, stamp)
+
+    def read_into(self, out, size=None):
+        """
+        Fill ``out`` with the next chunk of playout audio. Consumer only.
+
+        :return: Always ``size``; gaps are concealed or filled with silence.
+        """
+        if size is None:
+            size = len(out)
+        if size != self.__chunk_bytes:
+            raise ValueError(f"Expected {self.__chunk_bytes} byte reads")
+
+        if out is not self.__out:
+            self.__out = out
+            self.__out_views = self.__views(out)
+        samples, frames, head = self.__out_views
+        self.last_stamp = 0
+
+        if not self.__playing:
+            if self.__ring.buffered_ms < self.target_ms:
+                self.__conceal(samples, frames)
+                return size
+            self.__playing = True
+            self.__fade_in = True
+
+        # Trim latency that is no longer needed, one chunk at a time
+        excess_ms = self.__ring.buffered_ms - self.target_ms
+        if excess_ms > 2 * self.__chunk_ms:
+            self.discarded_ms += self.__ring.skip(self.__chunk_bytes) / (
+                self.__ring.bytes_per_ms
+            )
+            self.__fade_in = True
+
+        if not self.__ring.read_into(out, size):
+            self.underruns += 1
+            self.__playing = False
+            self.__underrun_boost_ms = min(
+                self.__max_target_ms, self.__underrun_boost_ms + self.__chunk_ms
+            )
+            self.__conceal(samples, frames)
+            return size
+
+        if self.__fade_in:
+            self.__apply_fade_in(head)
+            self.__fade_in = False
+
+        self.last_stamp = self.__ring.last_stamp
+        np.copyto(self.__last_chunk, samples)
+        self.__concealed_ms = 0.0
+        self.__concealment_gain = 1.0
+        # Let the safety margin won by past underruns decay slowly
+        self.__underrun_boost_ms *= 0.999
+        return size
+
+    def clear(self):
+        """
+        Drop everything queued and fade in on the next audio. Consumer only.
+        """
+        self.__ring.clear()
+        self.__playing = False
+        self.__fade_in = True
+        self.__concealed_ms = self.__concealment_ms
+
+    def __views(self, out):
+        samples = np.frombuffer(out, dtype=np.int16, count=self.__chunk_bytes // 2)
+        frames = samples.reshape(-1, self.__channels)
+        return samples, frames, frames[: self.__fade_up.shape[0]]
+
+    def __conceal(self, samples, frames):
+        if self.__concealed_ms >= self.__concealment_ms:
+            samples.fill(0)
+            return
+
+        # Repeat the last good chunk, fading it further with each repeat
+        # and all the way out on the last one, so muting does not click
+        self.__concealed_ms += self.__chunk_ms
+        start = self.__concealment_gain
+        end = start * 0.5
+        if self.__concealed_ms >= self.__concealment_ms:
+            end = 0.0
+        self.__concealment_gain = end
+
+        self.__gain_span[...] = start - end
+        self.__gain_end[...] = end
+        ramp = self.__gain_ramp
+        np.multiply(self.__ramp, self.__gain_span, out=ramp)
+        np.add(ramp, self.__gain_end, out=ramp)
+        np.copyto(self.__work, self.__last_frames)
+        np.multiply(self.__work, ramp, out=self.__work)
+        np.copyto(frames, self.__work, "unsafe")
+
+        self.concealed_chunks += 1
+        self.__fade_in = True
+
+    def __apply_fade_in(self, head):
+        work = self.__fade_work
+        np.copyto(work, head)
+        np.multiply(work, self.__fade_up, out=work)
+        np.copyto(head, work, "unsafe")
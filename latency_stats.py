@@ -0,0 +1,112 @@
+"""
+Low-overhead latency histograms for the audio hot loops
+"""
+
+import time
+
+# 16 linear sub-buckets per power of two: about 6% worst-case error
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# Enough buckets for values up to 2**40 us
+BUCKETS = (40 - SUB_BUCKET_BITS) * SUB_BUCKETS + 2 * SUB_BUCKETS
+
+PERCENTILES = (50, 95, 99)
+
+
+def bucket_index(value):
+    if value < 2 * SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return shift * SUB_BUCKETS + (value >> shift)
+
+
+def bucket_upper_bound(index):
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    return ((index - shift * SUB_BUCKETS + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """
+    HDR-style log-linear histogram of integer microsecond values.
+
+    Recording is a bit_length, a shift and a list increment, with no
+    allocation, so it is cheap enough to call on every audio chunk. Each
+    histogram should be recorded into from a single thread; reads from
+    other threads may be a sample behind but are otherwise safe.
+    """
+
+    def __init__(self):
+        self.__counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value_us):
+        if value_us < 0:
+            value_us = 0
+        index = bucket_index(value_us)
+        if index >= BUCKETS:
+            index = BUCKETS - 1
+        self.__counts[index] += 1
+        self.count += 1
+        self.total += value_us
+        if value_us > self.max:
+            self.max = value_us
+
+    def percentile(self, percent):
+        if not self.count:
+            return 0
+        rank = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.__counts):
+            seen += count
+            if count and seen >= rank:
+                return min(bucket_upper_bound(index), self.max)
+        return self.max
+
+    def summary(self):
+        """
+        Percentiles, mean and max in milliseconds.
+        """
+        summary = {"count": self.count}
+        for percent in PERCENTILES:
+            summary[f"p{percent}"] = round(self.percentile(percent) / 1000, 2)
+        summary["max"] = round(self.max / 1000, 2)
+        summary["mean"] = round(self.total / self.count / 1000, 2) if self.count else 0
+        return summary
+
+
+class LatencyStats:
+    """
+    A named set of histograms, one per pipeline stage.
+
+    Timestamps are ``time.monotonic_ns()`` values; ``record`` takes the
+    start of a stage and closes it at the current time.
+    """
+
+    def __init__(self, stages):
+        self.__histograms = {stage: LatencyHistogram() for stage in stages}
+
+    def record(self, stage, start_ns, end_ns=None):
+        if end_ns is None:
+            end_ns = time.monotonic_ns()
+        self.__histograms[stage].record((end_ns - start_ns) // 1000)
+
+    def report(self):
+        return {
+            stage: histogram.summary()
+            for stage, histogram in self.__histograms.items()
+            if histogram.count
+        }
+
+    def format_report(self):
+        lines = []
+        for stage, summary in self.report().items():
+            lines.append(
+                f"  {stage:<18} n={summary['count']:<7} p50={summary['p50']}ms"
+                f" p95={summary['p95']}ms p99={summary['p99']}ms"
+                f" max={summary['max']}ms"
+            )
+        return "\n".join(lines)
@@ -4,7 +4,6 @@ Voice assistant on Raspberry Pi
 """
 
 import os
-import numpy as np
 from dotenv import load_dotenv
 
 # client sdk
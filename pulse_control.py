@@ -0,0 +1,326 @@
+"""
+PulseAudio control over one long-lived connection
+"""
+
+import contextlib
+import re
+import subprocess
+import threading
+import time
+
+CLIENT_NAME = "assistant"
+
+# Volumes are percentages as pactl prints them: 100 is unity gain
+MAX_VOLUME = 150
+# Step between volume updates during a ramp
+RAMP_INTERVAL = 0.02
+
+FACILITY_SINK = "sink"
+FACILITY_SOURCE = "source"
+
+EVENT_TYPES = ("new", "change", "remove")
+
+# "Event 'change' on sink #1"
+PACTL_EVENT = re.compile(r"Event '(\w+)' on ([\w-]+) #(\d+)")
+
+
+class PulseError(Exception):
+    pass
+
+
+def clamp_volume(percent):
+    return max(0, min(MAX_VOLUME, percent))
+
+
+class PulseControl:
+    """
+    Sink and source control through PulseAudio's native protocol.
+
+    With ``pulsectl`` installed one connection is opened on first use and
+    kept, so an operation is a socket round trip instead of a ``pactl``
+    process (tens of milliseconds on a Pi). Without it every operation
+    falls back to running ``pactl``, which behaves the same, only slower.
+
+    Operations may be called from any thread; ``batch`` runs a group of
+    them back to back without other threads interleaving.
+    """
+
+    def __init__(self, client_name=CLIENT_NAME):
+        self.client_name = client_name
+        self.__lock = threading.RLock()
+        self.__pulse = None
+        try:
+            import pulsectl
+
+            self.__pulsectl = pulsectl
+        except (ImportError, OSError):
+            # Not installed, or libpulse is missing
+            self.__pulsectl = None
+
+    @property
+    def native(self):
+        """
+        True when operations go over the native connection.
+        """
+        return self.__pulsectl is not None
+
+    def close(self):
+        with self.__lock:
+            if self.__pulse is not None:
+                self.__pulse.close()
+                self.__pulse = None
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Hold the connection for several operations, e.g.::
+
+            with control.batch():
+                control.set_sink_mute(sink, False)
+                control.set_sink_volume(sink, 60)
+        """
+        with self.__lock:
+            yield self
+
+    def get_sink_volume(self, sink):
+        """
+        :return: The sink volume in percent, averaged over its channels.
+        """
+        if self.native:
+            info = self.__call(lambda pulse: pulse.get_sink_by_name(sink))
+            return round(info.volume.value_flat * 100)
+        output = self.__pactl("get-sink-volume", sink)
+        percents = [int(value) for value in re.findall(r"(\d+)%", output)]
+        if not percents:
+            raise PulseError(f"Unexpected pactl output: {output}")
+        return round(sum(percents) / len(percents))
+
+    def set_sink_volume(self, sink, percent):
+        """
+        Set every channel of ``sink`` to ``percent``, clamped to 0-150.
+
+        :return: The volume set.
+        """
+        percent = clamp_volume(percent)
+        if self.native:
+
+            def set_volume(pulse):
+                pulse.volume_set_all_chans(pulse.get_sink_by_name(sink), percent / 100)
+
+            self.__call(set_volume)
+        else:
+            self.__pactl("set-sink-volume", sink, f"{percent}%")
+        return percent
+
+    def change_sink_volume(self, sink, step):
+        """
+        Raise (or, with a negative ``step``, lower) the volume of ``sink``.
+
+        :return: The new volume.
+        """
+        with self.__lock:
+            return self.set_sink_volume(sink, self.get_sink_volume(sink) + step)
+
+    def ramp_sink_volume(self, sink, percent, duration=0.3):
+        """
+        Move the volume of ``sink`` to ``percent`` in small steps over
+        ``duration`` seconds, so the change does not click. Blocks until
+        the ramp is done.
+
+        :return: The volume set.
+        """
+        percent = clamp_volume(percent)
+        steps = max(1, int(duration / RAMP_INTERVAL))
+        start = self.get_sink_volume(sink)
+        if self.native:
+            # One lookup for the whole ramp, then one request per step
+            target = self.__call(lambda pulse: pulse.get_sink_by_name(sink))
+        deadline = time.monotonic()
+        for step in range(1, steps + 1):
+            volume = start + (percent - start) * step / steps
+            if self.native:
+                self.__call(
+                    lambda pulse: pulse.volume_set_all_chans(target, volume / 100)
+                )
+            else:
+                self.__pactl("set-sink-volume", sink, f"{round(volume)}%")
+            deadline += RAMP_INTERVAL
+            if step < steps:
+                time.sleep(max(0, deadline - time.monotonic()))
+        return percent
+
+    def set_sink_mute(self, sink, mute):
+        if self.native:
+            self.__call(lambda pulse: pulse.mute(pulse.get_sink_by_name(sink), mute))
+        else:
+            self.__pactl("set-sink-mute", sink, "1" if mute else "0")
+
+    def set_default_sink(self, sink):
+        if self.native:
+            self.__call(lambda pulse: pulse.sink_default_set(sink))
+        else:
+            self.__pactl("set-default-sink", sink)
+
+    def list_sinks(self):
+        """
+        :return: (index, name) of every sink.
+        """
+        return self.__list("sink")
+
+    def list_sources(self):
+        """
+        :return: (index, name) of every source, monitors included.
+        """
+        return self.__list("source")
+
+    def server_info(self):
+        """
+        :return: A dict with the server name and version and the default
+            sink and source names.
+        """
+        if self.native:
+            info = self.__call(lambda pulse: pulse.server_info())
+            return {
+                "server_name": info.server_name,
+                "server_version": info.server_version,
+                "default_sink": info.default_sink_name,
+                "default_source": info.default_source_name,
+            }
+        fields = {}
+        for line in self.__pactl("info").splitlines():
+            name, _, value = line.partition(":")
+            fields[name.strip()] = value.strip()
+        return {
+            "server_name": fields.get("Server Name"),
+            "server_version": fields.get("Server Version"),
+            "default_sink": fields.get("Default Sink"),
+            "default_source": fields.get("Default Source"),
+        }
+
+    def load_module(self, name, *arguments):
+        """
+        :param arguments: ``key=value`` module arguments.
+        :return: The index of the loaded module.
+        """
+        if self.native:
+            return self.__call(
+                lambda pulse: pulse.module_load(name, " ".join(arguments))
+            )
+        return int(self.__pactl("load-module", name, *arguments))
+
+    def subscribe(self, callback, facilities=(FACILITY_SINK, FACILITY_SOURCE)):
+        """
+        Call ``callback(facility, event, index)`` on a background thread for
+        every change to a sink or source, e.g. ``("sink", "change", 1)``
+        when its volume or mute state changes.
+
+        Events arrive on a connection of their own, so the control
+        connection stays free while listening.
+
+        :return: A function that stops the subscription.
+        """
+        stopped = threading.Event()
+        if self.native:
+            target = self.__listen_native
+        else:
+            target = self.__listen_pactl
+        thread = threading.Thread(
+            target=target,
+            args=(callback, facilities, stopped),
+            name="pulse-events",
+            daemon=True,
+        )
+        thread.start()
+        return stopped.set
+
+    def __list(self, kind):
+        if self.native:
+            items = self.__call(lambda pulse: getattr(pulse, f"{kind}_list")())
+            return [(item.index, item.name) for item in items]
+        output = self.__pactl("list", "short", f"{kind}s")
+        items = []
+        for line in output.splitlines():
+            parts = line.split("\t")
+            if len(parts) >= 2:
+                items.append((int(parts[0]), parts[1]))
+        return items
+
+    def __call(self, operation):
+        with self.__lock:
+            if self.__pulse is None:
+                self.__pulse = self.__connect(self.client_name)
+            try:
+                return operation(self.__pulse)
+            except self.__pulsectl.PulseDisconnected:
+                # PulseAudio restarted; reconnect once and retry
+                self.__pulse = self.__connect(self.client_name)
+                return operation(self.__pulse)
+            except self.__pulsectl.PulseError as e:
+                raise PulseError(str(e)) from e
+
+    def __connect(self, client_name):
+        try:
+            return self.__pulsectl.Pulse(client_name)
+        except self.__pulsectl.PulseError as e:
+            raise PulseError(f"Could not connect to PulseAudio: {e}") from e
+
+    def __pactl(self, *arguments):
+        try:
+            result = subprocess.run(
+                ["pactl", *arguments], capture_output=True, text=True
+            )
+        except OSError as e:
+            raise PulseError(f"Could not run pactl: {e}") from e
+        if result.returncode != 0:
+            raise PulseError(result.stderr.strip() or f"pactl {arguments[0]} failed")
+        return result.stdout.strip()
+
+    def __listen_native(self, callback, facilities, stopped):
+        pulsectl = self.__pulsectl
+
+        def on_event(event):
+            if stopped.is_set():
+                raise pulsectl.PulseLoopStop
+            # pulsectl enum values compare equal to their names
+            facility = next(name for name in facilities if event.facility == name)
+            kind = next((name for name in EVENT_TYPES if event.t == name), None)
+            callback(facility, kind, event.index)
+
+        try:
+            with self.__connect(f"{self.client_name}-events") as pulse:
+                pulse.event_mask_set(*facilities)
+                pulse.event_callback_set(on_event)
+                while not stopped.is_set():
+                    # The timeout lets an idle listener notice it was stopped
+                    pulse.event_listen(timeout=1)
+        except (PulseError, pulsectl.PulseDisconnected) as e:
+            print(f"PulseAudio event subscription ended: {e!r}")
+
+    def __listen_pactl(self, callback, facilities, stopped):
+        process = subprocess.Popen(
+            ["pactl", "subscribe"], stdout=subprocess.PIPE, text=True
+        )
+        try:
+            for line in process.stdout:
+                if stopped.is_set():
+                    break
+                match = PACTL_EVENT.match(line)
+                if match and match[2] in facilities:
+                    callback(match[2], match[1], int(match[3]))
+        finally:
+            process.terminate()
+
+
+_control_lock = threading.Lock()
+_control = None
+
+
+def get_control():
+    """
+    The process-wide ``PulseControl``, created on first use.
+    """
+    global _control
+    with _control_lock:
+        if _control is None:
+            _control = PulseControl()
+        return _control
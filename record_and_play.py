@@ -1,41 +1,118 @@
+import mmap
+import os
 import pyaudio
+import struct
 import wave
 import time
 
+from audio_devices import find_wm8960_devices
 
-def find_wm8960_devices():
-    """Find WM8960 input and output device indices"""
-    audio = pyaudio.PyAudio()
-
-    input_device = None
-    output_device = None
-
-    for i in range(audio.get_device_count()):
-        device_info = audio.get_device_info_by_index(i)
-        name = device_info["name"].lower()
-
-        if "wm8960" in name or "soundcard" in name:
-            if device_info["maxInputChannels"] > 0:
-                input_device = i
-                print(f"Found WM8960 input device: {i} - {device_info['name']}")
-            if device_info["maxOutputChannels"] > 0:
-                output_device = i
-                print(f"Found WM8960 output device: {i} - {device_info['name']}")
-
-    audio.terminate()
-    return input_device, output_device
+CHUNK = 1024
+# Rewrite the WAV header this often so a crash loses at most this much
+HEADER_UPDATE_SECONDS = 2
+# RIFF sizes are 32-bit; longer recordings continue in a new file
+MAX_WAV_DATA_BYTES = 0xFFFFFFFF - 36
 
 
-def record_with_pyaudio(device_index, duration=5, filename="recording.wav"):
-    """Record audio using specific device"""
+def continuation_filename(filename, part):
+    if part == 1:
+        return filename
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}-{part}{ext}"
+
+
+class StreamingWavWriter:
+    """
+    Appends frames straight to a WAV file, so memory use does not grow
+    with the length of the recording.
+
+    The header is rewritten every ``header_update_seconds`` and the data
+    flushed, so after a crash or power loss the file is still valid up to
+    the last update. Recordings past the 4 GiB WAV limit continue in
+    ``name-2.wav``, ``name-3.wav``, ...
+    """
+
+    def __init__(
+        self,
+        filename,
+        *,
+        channels,
+        sample_width,
+        rate,
+        header_update_seconds=HEADER_UPDATE_SECONDS,
+    ):
+        self.filename = filename
+        self.filenames = []
+        self.__params = (channels, sample_width, rate)
+        self.__frame_bytes = channels * sample_width
+        self.__update_bytes = int(header_update_seconds * rate) * self.__frame_bytes
+        self.__file = None
+        self.__wav = None
+        self.__open()
+
+    def __open(self):
+        channels, sample_width, rate = self.__params
+        filename = continuation_filename(self.filename, len(self.filenames) + 1)
+        self.filenames.append(filename)
+        self.__file = open(filename, "wb")
+        # Our own file object: wave does not close it, so it can be flushed
+        self.__wav = wave.open(self.__file, "wb")
+        self.__wav.setnchannels(channels)
+        self.__wav.setsampwidth(sample_width)
+        self.__wav.setframerate(rate)
+        self.__data_bytes = 0
+        self.__unsynced_bytes = 0
+
+    def write(self, data):
+        if self.__data_bytes + len(data) > MAX_WAV_DATA_BYTES:
+            self.__close_file()
+            self.__open()
+
+        # writeframesraw leaves the header alone; patching it per chunk
+        # would cost two extra seeks on every write
+        self.__wav.writeframesraw(data)
+        self.__data_bytes += len(data)
+        self.__unsynced_bytes += len(data)
+        if self.__unsynced_bytes >= self.__update_bytes:
+            self.sync()
+
+    def sync(self):
+        """
+        Update the header to cover everything written so far and flush.
+        """
+        # An empty writeframes patches the header when the length changed
+        self.__wav.writeframes(b"")
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
+        self.__unsynced_bytes = 0
+
+    def __close_file(self):
+        self.__wav.close()
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
+        self.__file.close()
+
+    def close(self):
+        self.__close_file()
+
+
+def record_with_pyaudio(device_index, duration=5, filename="recording.wav", audio=None):
+    """Record audio using specific device
+
+    :param duration: Seconds to record, or None to record until Ctrl+C.
+    :param audio: PyAudio instance to use; a private one if None.
+    """
 
-    CHUNK = 1024
     FORMAT = pyaudio.paInt16
     CHANNELS = 2  # WM8960 expects stereo
     RATE = 44100
 
-    audio = pyaudio.PyAudio()
+    own_audio = audio is None
+    if own_audio:
+        audio = pyaudio.PyAudio()
 
+    writer = None
+    stream = None
     try:
         # Open stream with specific input device
         stream = audio.open(
@@ -46,99 +123,156 @@ def record_with_pyaudio(device_index, duration=5, filename="recording.wav"):
             input_device_index=device_index,
             frames_per_buffer=CHUNK,
         )
+        writer = StreamingWavWriter(
+            filename,
+            channels=CHANNELS,
+            sample_width=audio.get_sample_size(FORMAT),
+            rate=RATE,
+        )
 
-        print(f"Recording from device {device_index} for {duration} seconds...")
-
-        frames = []
-        for i in range(0, int(RATE / CHUNK * duration)):
-            data = stream.read(CHUNK)
-            frames.append(data)
+        if duration is None:
+            print(f"Recording from device {device_index}, press Ctrl+C to stop...")
+            chunks = None
+        else:
+            print(f"Recording from device {device_index} for {duration} seconds...")
+            chunks = int(RATE / CHUNK * duration)
+
+        recorded = 0
+        try:
+            while chunks is None or recorded < chunks:
+                writer.write(stream.read(CHUNK, exception_on_overflow=False))
+                recorded += 1
+        except KeyboardInterrupt:
+            pass
 
         print("Recording finished")
-
-        # Stop and close stream
-        stream.stop_stream()
-        stream.close()
-
-        # Save as WAV file
-        wf = wave.open(filename, "wb")
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(audio.get_sample_size(FORMAT))
-        wf.setframerate(RATE)
-        wf.writeframes(b"".join(frames))
-        wf.close()
-
-        print(f"Saved recording as {filename}")
+        print(f"Saved recording as {', '.join(writer.filenames)}")
         return filename
 
     except Exception as e:
         print(f"Recording error: {e}")
         return None
     finally:
-        audio.terminate()
-
-
-def play_with_pyaudio(device_index, filename):
-    """Play audio using specific device"""
-
+        if stream is not None:
+            stream.stop_stream()
+            stream.close()
+        if writer is not None:
+            writer.close()
+        if own_audio:
+            audio.terminate()
+
+
+def wav_data_range(buffer):
+    """
+    Offset and length of the audio in a WAV file's bytes.
+
+    A length the header does not cover (a recording cut short before its
+    header was updated) is taken to run to the end of the file.
+    """
+    if buffer[:4] != b"RIFF" or buffer[8:12] != b"WAVE":
+        raise ValueError("Not a WAV file")
+    offset = 12
+    while offset + 8 <= len(buffer):
+        chunk_id = buffer[offset : offset + 4]
+        (size,) = struct.unpack("<I", buffer[offset + 4 : offset + 8])
+        offset += 8
+        if chunk_id == b"data":
+            available = len(buffer) - offset
+            if size == 0 or size > available:
+                size = available
+            return offset, size
+        offset += size + (size & 1)
+    raise ValueError("WAV file has no data chunk")
+
+
+def play_with_pyaudio(device_index, filename, audio=None):
+    """Play audio using specific device
+
+    The file is memory-mapped and played from views of the mapping, so
+    nothing is read or copied ahead of the sound card and files of any
+    length play in constant memory.
+
+    :param audio: PyAudio instance to use; a private one if None.
+    """
+
+    own_audio = audio is None
     try:
-        # Open WAV file
-        wf = wave.open(filename, "rb")
-
-        audio = pyaudio.PyAudio()
-
-        # Open stream with specific output device
-        stream = audio.open(
-            format=audio.get_format_from_width(wf.getsampwidth()),
-            channels=wf.getnchannels(),
-            rate=wf.getframerate(),
-            output=True,
-            output_device_index=device_index,
-        )
-
-        print(f"Playing on device {device_index}...")
-
-        # Read and play data
-        CHUNK = 1024
-        data = wf.readframes(CHUNK)
-
-        while data:
-            stream.write(data)
-            data = wf.readframes(CHUNK)
-
-        # Clean up
-        stream.stop_stream()
-        stream.close()
-        wf.close()
-        audio.terminate()
+        with wave.open(filename, "rb") as wf:
+            channels = wf.getnchannels()
+            sample_width = wf.getsampwidth()
+            rate = wf.getframerate()
+
+        if own_audio:
+            audio = pyaudio.PyAudio()
+
+        with open(filename, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mapped:
+            offset, size = wav_data_range(mapped)
+            frame_bytes = channels * sample_width
+            size -= size % frame_bytes
+
+            # Open stream with specific output device
+            stream = audio.open(
+                format=audio.get_format_from_width(sample_width),
+                channels=channels,
+                rate=rate,
+                output=True,
+                output_device_index=device_index,
+                frames_per_buffer=CHUNK,
+            )
+
+            print(f"Playing on device {device_index}...")
+
+            # Read-only views of the mapping go to PortAudio as they are
+            data = memoryview(mapped)
+            step = CHUNK * frame_bytes
+            try:
+                for start in range(offset, offset + size, step):
+                    end = min(start + step, offset + size)
+                    stream.write(data[start:end], (end - start) // frame_bytes)
+            finally:
+                data.release()
+
+            # Clean up
+            stream.stop_stream()
+            stream.close()
 
         print("Playback finished")
 
     except Exception as e:
         print(f"Playback error: {e}")
+    finally:
+        if own_audio and audio is not None:
+            audio.terminate()
 
 
 def record_and_play_test():
     """Test recording and playback with WM8960"""
 
-    # Find WM8960 devices
-    input_dev, output_dev = find_wm8960_devices()
+    # One PortAudio instance for the whole test
+    audio = pyaudio.PyAudio()
+    try:
+        # Find WM8960 devices
+        input_dev, output_dev = find_wm8960_devices(audio)
 
-    if input_dev is None:
-        print("WM8960 input device not found!")
-        return
+        if input_dev is None:
+            print("WM8960 input device not found!")
+            return
 
-    if output_dev is None:
-        print("WM8960 output device not found!")
-        return
+        if output_dev is None:
+            print("WM8960 output device not found!")
+            return
 
-    # Record audio
-    filename = record_with_pyaudio(input_dev, duration=5)
+        # Record audio
+        filename = record_with_pyaudio(input_dev, duration=5, audio=audio)
 
-    if filename:
-        # Play it back
-        time.sleep(1)  # Brief pause
-        play_with_pyaudio(output_dev, filename)
+        if filename:
+            # Play it back
+            time.sleep(1)  # Brief pause
+            play_with_pyaudio(output_dev, filename, audio=audio)
+    finally:
+        audio.terminate()
 
 
 if __name__ == "__main__":
@@ -6,25 +6,23 @@ Script to set WM8960 sound card as the default audio output device
 import subprocess
 import os
 
+from alsa_config import generate_config
+from audio_devices import find_alsa_card_info
+
 
 def set_wm8960_as_default():
     """Configure WM8960 as default audio output"""
 
     print("🎵 Configuring WM8960 as default audio output device...")
 
-    # Create ALSA configuration to set wm8960 as default
-    alsa_config = """# Set WM8960 sound card as default
-pcm.!default {
-    type hw
-    card 2
-    device 0
-}
-
-ctl.!default {
-    type hw
-    card 2
-}
-"""
+    # Shared (dmix/dsnoop) access to the card, referenced by its id
+    card = find_alsa_card_info()
+    if card is None:
+        print("❌ WM8960 sound card not found in /proc/asound/cards")
+        return False
+    _, card_id, description = card
+    print(f"🔎 Found WM8960 as ALSA card {card_id}")
+    alsa_config = generate_config(card_id, description=description)
 
     # Path to user ALSA config
     home_dir = os.path.expanduser("~")
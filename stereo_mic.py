@@ -0,0 +1,238 @@
+"""
+Mono front ends for the WM8960 HAT's two onboard MEMS microphones
+
+The codec delivers the left and right mics (Linput1 and Rinput1) as one
+stereo stream. Instead of averaging them, the capture pipeline's
+``Mixdown`` stage can reduce each block with one of these before
+resampling to 16 kHz:
+
+- ``ChannelSelector`` picks whichever mic has the better signal-to-noise
+  ratio, block by block, crossfading when it switches.
+- ``DelayAndSum`` beamforms toward the front: the mics are aligned by a
+  steering delay and summed with matched gains, so the talker adds up
+  coherently and uncorrelated noise does not.
+
+Both work on float32 frames in buffers allocated for the largest block.
+"""
+
+import numpy as np
+
+MIC_AVERAGE = "average"
+MIC_SELECT = "select"
+MIC_BEAMFORM = "beamform"
+
+MIC_MODES = (MIC_AVERAGE, MIC_SELECT, MIC_BEAMFORM)
+
+MIC_CHANNELS = 2
+# The noise floor follows a quieter block at once and rises this much per
+# block otherwise, i.e. about 3 dB a second at 40 ms blocks
+NOISE_FLOOR_RISE = 1.03
+# Another mic must beat the current one's SNR by this factor (3 dB) to
+# take over, so the choice does not flap between equal mics
+SELECT_HYSTERESIS = 2.0
+# Per-block smoothing of the mic levels DelayAndSum matches
+LEVEL_SMOOTHING = 0.02
+# Keeps the ratios finite in digital silence
+ENERGY_FLOOR = 1.0
+
+
+def create_front_end(mode, *, max_frames, delay_frames=0):
+    """
+    :param mode: One of ``MIC_MODES``.
+    :param max_frames: Largest block that will be mixed.
+    :param delay_frames: Steering delay for ``"beamform"``, see
+        ``DelayAndSum``.
+    :return: An object with ``mix(frames, out)``, or None for plain
+        averaging.
+    """
+    if mode == MIC_AVERAGE:
+        return None
+    if mode == MIC_SELECT:
+        return ChannelSelector(max_frames)
+    if mode == MIC_BEAMFORM:
+        return DelayAndSum(max_frames, delay_frames=delay_frames)
+    raise ValueError(f"Unknown microphone mode: {mode}")
+
+
+class _BlockEnergy:
+    """
+    Per-channel sum of squares of a block, without temporaries.
+    """
+
+    def __init__(self, max_frames):
+        self.__squares = np.zeros((max_frames, MIC_CHANNELS), np.float32)
+        self.__ones = np.ones(max_frames, np.float32)
+        self.energy = np.zeros(MIC_CHANNELS, np.float32)
+        self.__views = {}
+
+    def measure(self, frames):
+        views = self.__views.get(len(frames))
+        if views is None:
+            views = (self.__squares[: len(frames)], self.__ones[: len(frames)])
+            self.__views[len(frames)] = views
+        squares, ones = views
+        np.square(frames, out=squares)
+        # Column sums as a vector-matrix product: np.sum(axis=0) allocates
+        np.dot(ones, squares, out=self.energy)
+        return self.energy
+
+
+class ChannelSelector:
+    """
+    Use the mic with the best signal-to-noise ratio.
+
+    Each mic's noise floor is the minimum of its recent block energies;
+    the block's SNR is its energy over that floor. The mic facing the
+    talker, or the one further from a noise source, wins. A switch
+    crossfades across one block so it does not click.
+    """
+
+    def __init__(self, max_frames):
+        self.__energy = _BlockEnergy(max_frames)
+        # Far above any block energy, so the first block sets the floor
+        self.__floor = np.full(MIC_CHANNELS, 1e30, np.float32)
+        self.__snr = np.zeros(MIC_CHANNELS, np.float32)
+        self.__rise = np.array(NOISE_FLOOR_RISE, np.float32)
+        self.__epsilon = np.array(ENERGY_FLOOR, np.float32)
+        # Picking a channel is a dot product with a one-hot weight vector
+        self.__weights = np.eye(MIC_CHANNELS, dtype=np.float32)
+        self.__work = np.zeros(max_frames, np.float32)
+        self.__ramps = {}
+        self.channel = 0
+        self.switches = 0
+
+    def mix(self, frames, out):
+        """
+        :param frames: float32 array of shape (frames, 2).
+        :param out: float32 array of shape (frames,).
+        """
+        energy = self.__energy.measure(frames)
+        floor = self.__floor
+        np.multiply(floor, self.__rise, out=floor)
+        np.minimum(floor, energy, out=floor)
+        snr = self.__snr
+        np.add(floor, self.__epsilon, out=snr)
+        np.divide(energy, snr, out=snr)
+
+        current = self.channel
+        best = int(snr.argmax())
+        if best == current or snr[best] < snr[current] * SELECT_HYSTERESIS:
+            np.dot(frames, self.__weights[current], out=out)
+            return
+
+        fade_in, fade_out, work = self.__ramp(len(frames))
+        np.dot(frames, self.__weights[current], out=out)
+        np.multiply(out, fade_out, out=out)
+        np.dot(frames, self.__weights[best], out=work)
+        np.multiply(work, fade_in, out=work)
+        np.add(out, work, out=out)
+        self.channel = best
+        self.switches += 1
+
+    def __ramp(self, size):
+        ramp = self.__ramps.get(size)
+        if ramp is None:
+            fade_in = np.linspace(0, 1, size, dtype=np.float32)
+            ramp = (fade_in, 1 - fade_in, self.__work[:size])
+            self.__ramps[size] = ramp
+        return ramp
+
+
+class DelayAndSum:
+    """
+    Delay-and-sum beamformer for the two mics.
+
+    With the HAT flat and facing the user the mics are broadside to the
+    talker, whose sound reaches both at once, so the default steering
+    delay is 0. Mounted on its side, or to favour a talker off to one
+    side, delay the mic nearer the talker by the extra travel time to
+    the other one: mic spacing / 343 m/s * device rate, a few frames at
+    48 kHz. Positive ``delay_frames`` delays the left mic, negative the
+    right.
+
+    Mic sensitivities differ by a dB or two, so each channel is scaled to
+    the mean of the slowly tracked channel levels before summing.
+    """
+
+    def __init__(self, max_frames, delay_frames=0):
+        self.delay_frames = delay_frames
+        self.__delayed = 0 if delay_frames >= 0 else 1
+        self.__lag = abs(delay_frames)
+        self.__energy = _BlockEnergy(max_frames)
+        self.__level = np.zeros(MIC_CHANNELS, np.float32)
+        self.__gains = np.full(MIC_CHANNELS, 1 / MIC_CHANNELS, np.float32)
+        self.__mean = np.zeros((), np.float32)
+        self.__smoothing = np.array(LEVEL_SMOOTHING, np.float32)
+        self.__epsilon = np.array(ENERGY_FLOOR, np.float32)
+        self.__half = np.array(1 / MIC_CHANNELS, np.float32)
+        self.__averaging = np.full(MIC_CHANNELS, 1 / MIC_CHANNELS, np.float32)
+        # The delayed channel runs ``lag`` frames behind, carried over
+        # from the end of the previous block
+        self.__history = np.zeros(self.__lag + max_frames, np.float32)
+        self.__work = np.zeros(max_frames, np.float32)
+        self.__views = {}
+        self.__primed = False
+
+    @property
+    def gains(self):
+        """
+        Current per-channel gains, averaging weights included.
+        """
+        return self.__gains.copy()
+
+    def mix(self, frames, out):
+        """
+        :param frames: float32 array of shape (frames, 2).
+        :param out: float32 array of shape (frames,).
+        """
+        self.__match_gains(frames)
+        if self.__lag == 0:
+            np.dot(frames, self.__gains, out=out)
+            return
+
+        lead, lagged, delayed, newest, carry, work = self.__block(frames)
+        np.copyto(newest, lagged)
+        np.multiply(delayed, self.__gains[self.__delayed], out=work)
+        np.multiply(lead, self.__gains[1 - self.__delayed], out=out)
+        np.add(out, work, out=out)
+        np.copyto(self.__history[: self.__lag], carry)
+
+    def __match_gains(self, frames):
+        energy = self.__energy.measure(frames)
+        level = self.__level
+        if not self.__primed:
+            np.copyto(level, energy)
+            self.__primed = True
+        else:
+            # level += smoothing * (energy - level)
+            np.subtract(energy, level, out=energy)
+            np.multiply(energy, self.__smoothing, out=energy)
+            np.add(level, energy, out=level)
+
+        # gain = 1/2 * sqrt(mean level / level)
+        gains = self.__gains
+        np.add(level, self.__epsilon, out=gains)
+        np.dot(gains, self.__averaging, out=self.__mean)
+        np.divide(self.__mean, gains, out=gains)
+        np.sqrt(gains, out=gains)
+        np.multiply(gains, self.__half, out=gains)
+
+    def __block(self, frames):
+        key = id(frames)
+        views = self.__views.get(key)
+        if views is None or views[0] is not frames:
+            if len(self.__views) > 8:
+                self.__views.clear()
+            size = len(frames)
+            lag = self.__lag
+            views = (
+                frames,
+                frames[:, 1 - self.__delayed],
+                frames[:, self.__delayed],
+                self.__history[:size],
+                self.__history[lag : lag + size],
+                self.__history[size : size + lag],
+                self.__work[:size],
+            )
+            self.__views[key] = views
+        return views[1:]
@@ -0,0 +1,257 @@
+"""
+asyncio front end for Vapi and DailyCall
+"""
+
+import asyncio
+
+from daily_call import CHUNK_SIZE, ENGINE_DUPLEX, SAMPLE_RATE, DailyCall
+from vapi_http import VapiSession
+from vapi_python import build_payload, create_web_call
+
+# Half a chunk, so the pump never lets a full chunk of mic audio sit idle
+PUMP_INTERVAL = CHUNK_SIZE / SAMPLE_RATE / 2
+
+
+class AsyncDailyCall:
+    """
+    A DailyCall driven from an asyncio event loop.
+
+    The duplex engine runs without a pump thread: a task on the loop calls
+    ``pump_once`` every half chunk. In this mode DailyCall creates both
+    virtual devices non-blocking, so the pump's mic writes return at once
+    and its speaker reads finish through a completion instead of waiting
+    for audio. Daily's events and completions arrive on
+    Daily's own thread and are passed to the loop with
+    ``call_soon_threadsafe``, so every public method is a coroutine that
+    never blocks the loop. The PortAudio callback is the only other thread
+    touching audio.
+
+    Create instances with ``await AsyncDailyCall.create(...)``; opening the
+    sound card can take a while and is done off the loop.
+    """
+
+    def __init__(self, loop, call_options):
+        self.__loop = loop
+        self.__events = asyncio.Queue()
+        self.__joined = loop.create_future()
+        self.__left = False
+        self.__pump_task = None
+        self.__call = DailyCall(
+            **call_options,
+            engine=ENGINE_DUPLEX,
+            pump_thread=False,
+            event_listener=self.__on_event,
+        )
+
+    @classmethod
+    async def create(cls, **call_options):
+        """
+        :param call_options: DailyCall keyword arguments. ``engine``,
+            ``pump_thread`` and ``event_listener`` are set by this class.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, cls, loop, call_options)
+
+    def __on_event(self, name, data):
+        # Daily's thread
+        self.__loop.call_soon_threadsafe(self.__dispatch, name, data)
+
+    def __dispatch(self, name, data):
+        if name == "joined" and not self.__joined.done():
+            if data["error"]:
+                self.__joined.set_exception(Exception(data["error"]))
+            else:
+                self.__joined.set_result(data["data"])
+        elif name == "left":
+            self.__left = True
+            self.__stop_pump()
+        self.__events.put_nowait((name, data))
+
+    async def join(self, meeting_url):
+        """
+        Join the call and start pumping audio.
+
+        :return: Daily's join data.
+        """
+        self.__call.join(meeting_url)
+        data = await self.__joined
+        self.__pump_task = self.__loop.create_task(self.__pump())
+        return data
+
+    async def __pump(self):
+        while self.__call.pump_once():
+            await asyncio.sleep(PUMP_INTERVAL)
+
+    def __stop_pump(self):
+        if self.__pump_task is not None:
+            self.__pump_task.cancel()
+            self.__pump_task = None
+
+    async def leave(self):
+        """
+        Leave the call and wait until Daily confirms it.
+        """
+        self.__stop_pump()
+        left = self.__loop.create_future()
+
+        def on_left(error):
+            self.__loop.call_soon_threadsafe(left.set_result, error)
+
+        # Joins no threads in this mode, only stops the stream
+        self.__call.leave(completion=on_left)
+        error = await left
+        if error:
+            print(f"Error leaving call: {error}")
+
+    async def release(self):
+        """
+        Tear down a call that was never joined.
+        """
+        await self.__loop.run_in_executor(None, self.__call.release)
+
+    async def send_app_message(self, message):
+        self.__call.send_app_message(message)
+
+    async def events(self):
+        """
+        Yield ``(name, data)`` call events until the call has been left.
+        """
+        while True:
+            name, data = await self.__events.get()
+            yield name, data
+            if name == "left":
+                return
+
+    @property
+    def left(self):
+        return self.__left
+
+    def get_latency_stats(self):
+        return self.__call.get_latency_stats()
+
+
+class AsyncVapi:
+    """
+    Awaitable counterpart of ``Vapi``.
+
+    HTTP requests go through the pooled ``VapiSession`` on the loop's
+    executor, and the call itself is an ``AsyncDailyCall``. Several
+    instances can share one event loop.
+    """
+
+    def __init__(
+        self,
+        *,
+        api_key,
+        api_url="https://api.vapi.ai",
+        call_options=None,
+        http_options=None,
+    ):
+        """
+        :param call_options: Keyword arguments for every AsyncDailyCall
+            this client creates.
+        :param http_options: Keyword arguments for the pooled VapiSession.
+        """
+        self.api_key = api_key
+        self.api_url = api_url
+        self.call_options = call_options or {}
+        self.http = VapiSession(api_url, api_key, **(http_options or {}))
+        # call id -> AsyncDailyCall, like Vapi several calls can run at once
+        self.__calls = {}
+
+    @property
+    def calls(self):
+        return list(self.__calls)
+
+    async def start(self, *, call_options=None, **assistant):
+        """
+        Create a web call and join it. Takes the same arguments as
+        ``Vapi.start``.
+
+        :return: The call id.
+        """
+        payload = build_payload(**assistant)
+        call_options = {**self.call_options, **(call_options or {})}
+        loop = asyncio.get_running_loop()
+        # Both are independent; overlap the HTTP round trip with device setup
+        created, client = await asyncio.gather(
+            loop.run_in_executor(
+                None, create_web_call, self.api_url, self.api_key, payload, self.http
+            ),
+            AsyncDailyCall.create(**call_options),
+            return_exceptions=True,
+        )
+        if isinstance(created, BaseException) or not created[1]:
+            if not isinstance(client, BaseException):
+                await client.release()
+            if isinstance(created, BaseException):
+                raise created
+            raise Exception("Error: Unable to create call.")
+        if isinstance(client, BaseException):
+            raise client
+
+        call_id, web_call_url = created
+        print("Joining call... " + call_id)
+        self.__calls[call_id] = client
+        try:
+            await client.join(web_call_url)
+        except BaseException:
+            # Failed or cancelled: forget the call and free its devices
+            self.__calls.pop(call_id, None)
+            await client.release()
+            raise
+        return call_id
+
+    def __call(self, call_id):
+        if call_id is not None:
+            return self.__calls.get(call_id)
+        if len(self.__calls) > 1:
+            raise Exception("Several calls are running. Please pass a call_id.")
+        return next(iter(self.__calls.values()), None)
+
+    async def stop(self, call_id=None):
+        """
+        :param call_id: The call to leave; all calls if None.
+        """
+        if call_id is None:
+            clients = list(self.__calls.values())
+            self.__calls.clear()
+        else:
+            client = self.__calls.pop(call_id, None)
+            clients = [client] if client else []
+        await asyncio.gather(*(c.leave() for c in clients if not c.left))
+
+    async def send(self, message, call_id=None):
+        """
+        Send a generic message to the assistant.
+
+        :param message: A dictionary containing the message type and content.
+        :param call_id: May be omitted while only one call is running.
+        """
+        client = self.__call(call_id)
+        if not client:
+            raise Exception("Call not started. Please start the call first.")
+
+        if not isinstance(message, dict) or "type" not in message:
+            raise ValueError("Invalid message format.")
+
+        await client.send_app_message(message)
+
+    async def add_message(self, role, content, call_id=None):
+        message = {"type": "add-message", "message": {"role": role, "content": content}}
+        await self.send(message, call_id)
+
+    def events(self, call_id=None):
+        """
+        Async iterator over a call's events.
+        """
+        client = self.__call(call_id)
+        if not client:
+            raise Exception("Call not started. Please start the call first.")
+        return client.events()
+
+    def get_latency_stats(self, call_id=None):
+        client = self.__call(call_id)
+        if not client:
+            return None
+        return client.get_latency_stats()
@@ -0,0 +1,128 @@
+"""
+Persistent, pooled HTTP session for the Vapi REST API
+"""
+
+import random
+import threading
+import time
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 15
+RETRIES = 3
+BACKOFF_BASE = 0.25
+BACKOFF_MAX = 4.0
+POOL_SIZE = 4
+
+# The server refused the request without acting on it
+SAFE_RETRY_STATUSES = {429, 503}
+# The request may or may not have been acted on
+UNSAFE_RETRY_STATUSES = {500, 502, 504}
+
+
+def request_was_not_sent(error):
+    """
+    True when ``error`` means the request never reached the server, so
+    retrying cannot create a duplicate.
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.ConnectionError):
+        return False
+    reason = error.args[0] if error.args else None
+    reason = getattr(reason, "reason", reason)
+    # Also covers DNS failures (NameResolutionError subclasses it)
+    return isinstance(reason, NewConnectionError)
+
+
+class VapiSession:
+    """
+    Keep-alive connection pool shared by every request a ``Vapi`` makes.
+
+    Reusing one connection skips DNS, TCP and TLS setup on every call
+    start. The pool is warmed on a background thread as soon as the
+    session exists. Requests get explicit connect/read timeouts and are
+    retried with full-jitter exponential backoff, but a non-idempotent
+    request is only retried when it provably did not reach the server.
+    """
+
+    def __init__(
+        self,
+        api_url,
+        api_key,
+        *,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT,
+        retries=RETRIES,
+        pool_size=POOL_SIZE,
+        prewarm=True,
+    ):
+        self.api_url = api_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+
+        self.__session = requests.Session()
+        self.__session.headers.update(
+            {"Authorization": "Bearer " + api_key, "Content-Type": "application/json"}
+        )
+        # Retries are done here, where we know which requests are idempotent
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.__session.mount("https://", adapter)
+        self.__session.mount("http://", adapter)
+
+        if prewarm:
+            threading.Thread(target=self.warm, daemon=True).start()
+
+    def warm(self):
+        """
+        Open a pooled connection (TCP + TLS) ahead of the first real request.
+        """
+        try:
+            self.__session.head(self.api_url, timeout=self.timeout).close()
+        except requests.RequestException:
+            pass
+
+    def post(self, path, payload, *, idempotent=False):
+        """
+        POST ``payload`` as JSON to ``path`` under the API URL.
+
+        :param idempotent: Allow retries that could repeat the request on
+            the server (timeouts after sending, 5xx responses).
+        :return: The final ``requests.Response``.
+        """
+        # Sent with every attempt so a server that supports it can dedupe
+        headers = {"Idempotency-Key": str(uuid.uuid4())}
+        url = f"{self.api_url}{path}"
+
+        attempt = 0
+        while True:
+            try:
+                response = self.__session.post(
+                    url, json=payload, headers=headers, timeout=self.timeout
+                )
+            except requests.RequestException as e:
+                retryable = idempotent or request_was_not_sent(e)
+                if not retryable or attempt >= self.retries:
+                    raise
+            else:
+                status = response.status_code
+                retryable = status in SAFE_RETRY_STATUSES or (
+                    idempotent and status in UNSAFE_RETRY_STATUSES
+                )
+                if not retryable or attempt >= self.retries:
+                    return response
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    time.sleep(min(BACKOFF_MAX, int(retry_after)))
+                    attempt += 1
+                    continue
+
+            time.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt)))
+            attempt += 1
+
+    def close(self):
+        self.__session.close()
@@ -1,15 +1,45 @@
-from daily import *
-import requests
-from daily_call import DailyCall
+import json
+import threading
+import time
+
+# requests, daily, pyaudio and numpy take seconds to import on a Pi Zero,
+# so they are loaded on first use (or ahead of time with preload())
 
 SAMPLE_RATE = 16000
 CHANNELS = 1
 
+# How long a prepared (created but not joined) call may wait for start()
+PREPARED_CALL_TTL = 120
+
+
+def preload():
+    """
+    Import the HTTP and audio stacks now, e.g. on a background thread at
+    startup, so the first call does not pay for them.
+    """
+    import vapi_http
+    import daily_call
+    import audio_backends
+
+    audio_backends.preload()
+
+
+def create_web_call(api_url, api_key, payload, session=None):
+    if session is not None:
+        # Creating a call is not idempotent: never risk creating two
+        response = session.post("/call/web", payload, idempotent=False)
+    else:
+        import requests
+        from vapi_http import CONNECT_TIMEOUT, READ_TIMEOUT
 
-def create_web_call(api_url, api_key, payload):
-    url = f"{api_url}/call/web"
-    headers = {"Authorization": "Bearer " + api_key, "Content-Type": "application/json"}
-    response = requests.post(url, headers=headers, json=payload)
+        url = f"{api_url}/call/web"
+        headers = {
+            "Authorization": "Bearer " + api_key,
+            "Content-Type": "application/json",
+        }
+        response = requests.post(
+            url, headers=headers, json=payload, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+        )
     data = response.json()
     if response.status_code == 201:
         call_id = data.get("id")
@@ -19,10 +49,137 @@ def create_web_call(api_url, api_key, payload):
         raise Exception(f"Error: {data['message']}")
 
 
+def build_payload(
+    *,
+    assistant_id=None,
+    assistant=None,
+    assistant_overrides=None,
+    squad_id=None,
+    squad=None,
+):
+    if assistant_id:
+        payload = {
+            "assistantId": assistant_id,
+            "assistantOverrides": assistant_overrides,
+        }
+    elif assistant:
+        payload = {
+            "assistant": assistant,
+            "assistantOverrides": assistant_overrides,
+        }
+    elif squad_id:
+        payload = {"squadId": squad_id}
+    elif squad:
+        payload = {"squad": squad}
+    else:
+        raise Exception("Error: No assistant specified.")
+    return payload
+
+
+class PreparedCall:
+    """
+    A web call that has been created and a DailyCall that has been set up
+    for it, waiting to be joined.
+    """
+
+    def __init__(self, payload, call_id, web_call_url, client, ttl):
+        self.key = json.dumps(payload, sort_keys=True)
+        self.call_id = call_id
+        self.web_call_url = web_call_url
+        self.client = client
+        self.expires_at = time.monotonic() + ttl
+
+    @property
+    def expired(self):
+        return self.remaining <= 0
+
+    @property
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+    def release(self):
+        self.client.release()
+        self.client = None
+
+
 class Vapi:
-    def __init__(self, *, api_key, api_url="https://api.vapi.ai"):
+    def __init__(
+        self,
+        *,
+        api_key,
+        api_url="https://api.vapi.ai",
+        call_options=None,
+        http_options=None,
+    ):
+        """
+        :param call_options: Keyword arguments for every DailyCall this
+            client creates (audio engine, jitter buffer, VAD, ...).
+        :param http_options: Keyword arguments for the pooled VapiSession
+            (timeouts, retries, pool size, prewarm).
+        """
+        from vapi_http import VapiSession
+
         self.api_key = api_key
         self.api_url = api_url
+        self.call_options = call_options or {}
+        # Opens and warms the keep-alive connection in the background
+        self.http = VapiSession(api_url, api_key, **(http_options or {}))
+        # call id -> DailyCall, for every call started and not yet stopped
+        self.__calls = {}
+        self.__calls_lock = threading.Lock()
+        self.__prepared = None
+        self.__prepared_lock = threading.Lock()
+
+    def prepare(self, *, ttl=PREPARED_CALL_TTL, **assistant):
+        """
+        Create a web call and warm up its DailyCall without joining, so a
+        later start() with the same assistant arguments joins immediately.
+
+        Any previously prepared call is released. Takes the same assistant
+        keyword arguments as start().
+
+        :param ttl: Seconds after which the prepared call is discarded.
+        :return: The created call id.
+        """
+        payload = build_payload(**assistant)
+        call_id, web_call_url = create_web_call(
+            self.api_url, self.api_key, payload, self.http
+        )
+
+        if not web_call_url:
+            raise Exception("Error: Unable to create call.")
+
+        prepared = PreparedCall(payload, call_id, web_call_url, self.__new_call(), ttl)
+        with self.__prepared_lock:
+            previous, self.__prepared = self.__prepared, prepared
+        if previous:
+            previous.release()
+        return call_id
+
+    def prepared_call_ready(self, min_remaining=0):
+        """
+        True when a prepared call is waiting with at least ``min_remaining``
+        seconds left before it expires.
+        """
+        prepared = self.__prepared
+        return prepared is not None and prepared.remaining > min_remaining
+
+    def discard_prepared(self):
+        """
+        Release the prepared call, if any.
+        """
+        with self.__prepared_lock:
+            prepared, self.__prepared = self.__prepared, None
+        if prepared:
+            prepared.release()
+
+    @property
+    def calls(self):
+        """
+        Ids of the calls started and not yet stopped.
+        """
+        with self.__calls_lock:
+            return list(self.__calls)
 
     def start(
         self,
@@ -32,46 +189,92 @@ class Vapi:
         assistant_overrides=None,
         squad_id=None,
         squad=None,
+        call_options=None,
     ):
-        # Start a new call
-        if assistant_id:
-            payload = {
-                "assistantId": assistant_id,
-                "assistantOverrides": assistant_overrides,
-            }
-        elif assistant:
-            payload = {
-                "assistant": assistant,
-                "assistantOverrides": assistant_overrides,
-            }
-        elif squad_id:
-            payload = {"squadId": squad_id}
-        elif squad:
-            payload = {"squad": squad}
+        """
+        Start a new call. Calls already running keep running, so one client
+        can host several at once.
+
+        :param call_options: DailyCall keyword arguments for this call only,
+            on top of the client's ``call_options`` (e.g. its own sound
+            card on a multi-channel gateway). A prepared call is only used
+            when this is not given.
+        :return: The call id, for ``stop``, ``send`` and ``add_message``.
+        """
+        payload = build_payload(
+            assistant_id=assistant_id,
+            assistant=assistant,
+            assistant_overrides=assistant_overrides,
+            squad_id=squad_id,
+            squad=squad,
+        )
+
+        with self.__prepared_lock:
+            prepared, self.__prepared = self.__prepared, None
+
+        key = json.dumps(payload, sort_keys=True)
+        if prepared and (prepared.expired or prepared.key != key or call_options):
+            prepared.release()
+            prepared = None
+
+        if prepared:
+            call_id, web_call_url = prepared.call_id, prepared.web_call_url
+            client = prepared.client
         else:
-            raise Exception("Error: No assistant specified.")
+            call_id, web_call_url = create_web_call(
+                self.api_url, self.api_key, payload, self.http
+            )
 
-        call_id, web_call_url = create_web_call(self.api_url, self.api_key, payload)
+            if not web_call_url:
+                raise Exception("Error: Unable to create call.")
 
-        if not web_call_url:
-            raise Exception("Error: Unable to create call.")
+            client = self.__new_call(call_options)
 
+        with self.__calls_lock:
+            self.__calls[call_id] = client
         print("Joining call... " + call_id)
+        client.join(web_call_url)
+        return call_id
+
+    def __new_call(self, call_options=None):
+        from daily_call import DailyCall
 
-        self.__client = DailyCall()
-        self.__client.join(web_call_url)
+        return DailyCall(**{**self.call_options, **(call_options or {})})
 
-    def stop(self):
-        self.__client.leave()
-        self.__client = None
+    def __call(self, call_id):
+        with self.__calls_lock:
+            if call_id is not None:
+                return self.__calls.get(call_id)
+            if len(self.__calls) > 1:
+                raise Exception("Several calls are running. Please pass a call_id.")
+            return next(iter(self.__calls.values()), None)
 
-    def send(self, message):
+    def stop(self, call_id=None):
+        """
+        Leave a call.
+
+        :param call_id: The call to stop; all calls if None.
+        """
+        with self.__calls_lock:
+            if call_id is None:
+                clients = list(self.__calls.values())
+                self.__calls.clear()
+            else:
+                client = self.__calls.pop(call_id, None)
+                clients = [client] if client else []
+        for client in clients:
+            client.leave()
+
+    def send(self, message, call_id=None):
         """
         Send a generic message to the assistant.
 
         :param message: A dictionary containing the message type and content.
+        :param call_id: The call to send to; may be omitted while only one
+            call is running.
         """
-        if not self.__client:
+        client = self.__call(call_id)
+        if not client:
             raise Exception("Call not started. Please start the call first.")
 
         # Check message format here instead of serialization
@@ -79,13 +282,22 @@ class Vapi:
             raise ValueError("Invalid message format.")
 
         try:
-            self.__client.send_app_message(message)  # Send dictionary directly
+            client.send_app_message(message)  # Send dictionary directly
         except Exception as e:
             print(f"Failed to send message: {e}")
 
-    def add_message(self, role, content):
+    def get_latency_stats(self, call_id=None):
+        """
+        Live audio latency percentiles for a call, or None.
+        """
+        client = self.__call(call_id)
+        if not client:
+            return None
+        return client.get_latency_stats()
+
+    def add_message(self, role, content, call_id=None):
         """
         method to send text messages with specific parameters.
         """
         message = {"type": "add-message", "message": {"role": role, "content": content}}
-        self.send(message)
+        self.send(message, call_id)
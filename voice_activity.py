@@ -0,0 +1,272 @@
+"""
+Streaming voice-activity detection and gating for the capture path
+"""
+
+import math
+
+import numpy as np
+
+from audio_ring_buffer import AudioRingBuffer, DROP_OLDEST
+
+SUBFRAME_MS = 10
+# Speech must sit this far above the tracked noise floor
+MARGIN_DB = 9.0
+# Absolute floor so digital silence never counts as speech
+MIN_SPEECH_DB = -55.0
+# Above this zero-crossing rate a frame is hiss or fan noise, not voice
+MAX_SPEECH_ZCR = 0.35
+MODEL_THRESHOLD = 0.5
+
+HANGOVER_MS = 400
+PREROLL_MS = 200
+
+SILENCE_DROP = "drop"
+SILENCE_COMFORT_NOISE = "comfort-noise"
+SILENCE_MODES = (SILENCE_DROP, SILENCE_COMFORT_NOISE)
+COMFORT_NOISE_DBFS = -70.0
+
+
+class ChunkLevel:
+    """
+    RMS level of int16 mono chunks in dBFS, without allocating.
+
+    Chunks longer than ``max_frames`` are measured on their first
+    ``max_frames`` frames.
+    """
+
+    def __init__(self, max_frames):
+        self.__input = bytearray(max_frames * 2)
+        self.__input_view = memoryview(self.__input)
+        self.__samples = np.frombuffer(self.__input, dtype=np.int16)
+        self.__work = np.zeros(max_frames, dtype=np.float32)
+        self.__energy = np.zeros((), dtype=np.float32)
+        self.__views = {}
+
+    def rms_db(self, buffer):
+        size = min(len(buffer), len(self.__input)) // 2 * 2
+        if not size:
+            return -math.inf
+        views = self.__views.get(size)
+        if views is None:
+            count = size // 2
+            views = (self.__samples[:count], self.__work[:count])
+            self.__views[size] = views
+        samples, work = views
+        self.__input_view[:size] = memoryview(buffer).cast("B")[:size]
+        np.copyto(work, samples)
+        np.dot(work, work, out=self.__energy)
+        mean = self.__energy.item() / (len(work) * 32768**2)
+        return 10 * math.log10(mean + 1e-10)
+
+
+class VoiceActivityDetector:
+    """
+    Classifies int16 mono chunks as speech or silence.
+
+    Each chunk is split into 10 ms sub-frames whose energy and
+    zero-crossing rate are computed in one vectorized pass. A chunk is
+    speech when enough sub-frames are both loud relative to an adaptive
+    noise floor and voice-like in their zero-crossing rate. ``model`` may
+    add a second opinion: any callable taking the chunk bytes and
+    returning a speech probability, such as Daily's native VAD.
+    """
+
+    def __init__(self, *, sample_rate, chunk_frames, model=None):
+        subframe = sample_rate * SUBFRAME_MS // 1000
+        self.__subframes = max(1, chunk_frames // subframe)
+        self.__subframe = chunk_frames // self.__subframes
+        self.__used = self.__subframes * self.__subframe
+        self.__model = model
+
+        # Chunks are copied into one buffer so every view below is built
+        # once; together with the 0-d thresholds and dot-product means this
+        # keeps classification free of allocations
+        shape = (self.__subframes, self.__subframe)
+        self.__input = bytearray(self.__used * 2)
+        self.__input_view = memoryview(self.__input)
+        self.__frames = np.frombuffer(self.__input, dtype=np.int16).reshape(shape)
+        self.__work = np.zeros(shape, dtype=np.float32)
+        self.__work_samples = self.__work.reshape(-1)
+        self.__signs = np.zeros(self.__used, dtype=bool)
+        # crossings[i] compares sample i + 1 with sample i, so the last
+        # column of each sub-frame straddles two sub-frames and is ignored
+        self.__crossings = np.zeros(self.__used, dtype=bool)
+        self.__crossing_pairs = (
+            self.__crossings[:-1],
+            self.__signs[1:],
+            self.__signs[:-1],
+        )
+        self.__energy_weights = np.full(
+            self.__subframe, 1 / (self.__subframe * 32768**2), np.float32
+        )
+        self.__zcr_weights = np.full(
+            self.__subframe, 1 / max(1, self.__subframe - 1), np.float32
+        )
+        self.__zcr_weights[-1] = 0
+        self.__energy = np.zeros(self.__subframes, dtype=np.float32)
+        self.__zcr = np.zeros(self.__subframes, dtype=np.float32)
+        self.__loud = np.zeros(self.__subframes, dtype=bool)
+        self.__voiced = np.zeros(self.__subframes, dtype=bool)
+        self.__threshold = np.zeros((), dtype=np.float32)
+        self.__max_zcr = np.array(MAX_SPEECH_ZCR, dtype=np.float32)
+
+        self.noise_floor_db = MIN_SPEECH_DB
+
+    def is_speech(self, buffer):
+        size = len(self.__input)
+        if len(buffer) == size:
+            self.__input_view[:] = buffer
+        else:
+            self.__input_view[:] = memoryview(buffer).cast("B")[:size]
+
+        work = self.__work
+        energy = self.__energy
+        np.copyto(work, self.__frames)
+        # Signs are taken from the float copy: signbit on int16 allocates
+        np.signbit(self.__work_samples, out=self.__signs)
+        np.square(work, out=work)
+        np.dot(work, self.__energy_weights, out=energy)
+        energy_db = 10 * math.log10(energy.item(energy.argmax()) + 1e-10)
+
+        crossings, tail, head = self.__crossing_pairs
+        np.not_equal(tail, head, out=crossings)
+        np.copyto(self.__work_samples, self.__crossings)
+        np.dot(work, self.__zcr_weights, out=self.__zcr)
+
+        threshold = max(MIN_SPEECH_DB, self.noise_floor_db + MARGIN_DB)
+        self.__threshold[...] = 10 ** (threshold / 10)
+        loud = np.greater(energy, self.__threshold, out=self.__loud)
+        voiced = np.less(self.__zcr, self.__max_zcr, out=self.__voiced)
+        np.logical_and(loud, voiced, out=loud)
+        speech = np.count_nonzero(loud) * 2 >= self.__subframes
+
+        if speech and self.__model is not None:
+            speech = self.__model(bytes(buffer)) >= MODEL_THRESHOLD
+
+        # Fall quickly to quieter backgrounds, rise slowly to louder ones
+        if energy_db < self.noise_floor_db:
+            self.noise_floor_db += (energy_db - self.noise_floor_db) * 0.5
+        elif not speech:
+            self.noise_floor_db += (energy_db - self.noise_floor_db) * 0.02
+
+        return speech
+
+
+class VoiceGate:
+    """
+    Only passes mic audio upstream while someone is talking.
+
+    Chunks seen during silence go into a short pre-roll ring and are sent
+    ahead of the chunk that triggers speech, so onsets are not clipped.
+    After speech ends the gate stays open for ``hangover_ms``. While
+    closed it sends either nothing or low-level comfort noise.
+
+    Daily consumes mic audio in real time, so a pre-roll puts everything
+    after it that far behind. The gate wins the time back by skipping as
+    many of the following non-speech chunks (pauses between words,
+    hangover, comfort noise) as the pre-roll held, instead of carrying
+    the delay through the rest of the utterance.
+    """
+
+    def __init__(
+        self,
+        detector,
+        *,
+        sample_rate,
+        chunk_frames,
+        hangover_ms=HANGOVER_MS,
+        preroll_ms=PREROLL_MS,
+        silence=SILENCE_DROP,
+    ):
+        if silence not in SILENCE_MODES:
+            raise ValueError(f"Unknown silence mode: {silence}")
+
+        chunk_ms = chunk_frames * 1000 / sample_rate
+        self.__detector = detector
+        self.__chunk_bytes = chunk_frames * 2
+        self.__hangover_chunks = int(round(hangover_ms / chunk_ms))
+        self.__hangover = 0
+        self.__silence = silence
+        self.__preroll = AudioRingBuffer(
+            depth_ms=preroll_ms, sample_rate=sample_rate, policy=DROP_OLDEST
+        )
+        self.__preroll_chunk = bytearray(self.__chunk_bytes)
+
+        amplitude = 32768 * 10 ** (COMFORT_NOISE_DBFS / 20)
+        noise = np.random.default_rng().normal(0, amplitude, chunk_frames * 8)
+        self.__comfort_noise = [
+            noise[i : i + chunk_frames].astype(np.int16).tobytes()
+            for i in range(0, len(noise), chunk_frames)
+        ]
+        self.__comfort_index = 0
+        # Chunks of delay the pre-roll added that are not won back yet
+        self.__lag_chunks = 0
+
+        self.speech_chunks = 0
+        self.silence_chunks = 0
+        self.sent_chunks = 0
+        self.skipped_chunks = 0
+
+    @property
+    def is_open(self):
+        return self.__hangover > 0
+
+    def process(self, buffer, send):
+        """
+        Feed one captured chunk through the gate.
+
+        :param buffer: ``chunk_frames`` of int16 mono audio.
+        :param send: Called with each chunk that should go upstream.
+        :return: True if the chunk was classified as speech.
+        """
+        speech = self.__detector.is_speech(buffer)
+        if speech:
+            self.speech_chunks += 1
+        else:
+            self.silence_chunks += 1
+
+        if speech:
+            if not self.is_open:
+                while self.__preroll.read_into(self.__preroll_chunk):
+                    self.__send(self.__preroll_chunk, send)
+                    self.__lag_chunks += 1
+            self.__hangover = self.__hangover_chunks + 1
+
+        if self.is_open:
+            self.__hangover -= 1
+            if speech or not self.__lag_chunks:
+                self.__send(buffer, send)
+            else:
+                self.__skip()
+        else:
+            self.__preroll.write(buffer)
+            if self.__silence != SILENCE_COMFORT_NOISE:
+                # Nothing is sent, which wins back a chunk by itself
+                self.__lag_chunks = max(0, self.__lag_chunks - 1)
+            elif self.__lag_chunks:
+                self.__skip()
+            else:
+                noise = self.__comfort_noise[self.__comfort_index]
+                self.__comfort_index = (self.__comfort_index + 1) % len(
+                    self.__comfort_noise
+                )
+                self.__send(noise, send)
+        return speech
+
+    def __skip(self):
+        self.__lag_chunks -= 1
+        self.skipped_chunks += 1
+
+    def __send(self, buffer, send):
+        self.sent_chunks += 1
+        send(buffer)
+
+    def stats(self):
+        total = self.speech_chunks + self.silence_chunks
+        return {
+            "speech_chunks": self.speech_chunks,
+            "silence_chunks": self.silence_chunks,
+            "sent_chunks": self.sent_chunks,
+            "skipped_chunks": self.skipped_chunks,
+            "speech_ratio": round(self.speech_chunks / total, 3) if total else 0.0,
+        }
@@ -4,129 +4,106 @@ WM8960 Volume Control Tool
 Control volume for WM8960 sound card through PulseAudio
 """
 
-import subprocess
 import sys
+import threading
+
+from pulse_control import PulseError, get_control
+
+SINK = "wm8960_output"
 
 
 def get_current_volume():
     """Get current volume of wm8960_output sink"""
     try:
-        result = subprocess.run(
-            ["pactl", "get-sink-volume", "wm8960_output"],
-            capture_output=True,
-            text=True,
-        )
-        if result.returncode == 0:
-            print(f"🔊 Current WM8960 Volume: {result.stdout.strip()}")
-            return True
-        else:
-            print("❌ Could not get volume")
-            return False
-    except Exception as e:
-        print(f"❌ Error getting volume: {e}")
+        volume = get_control().get_sink_volume(SINK)
+        print(f"🔊 Current WM8960 Volume: {volume}%")
+        return True
+    except PulseError as e:
+        print(f"❌ Could not get volume: {e}")
         return False
 
 
 def set_volume(volume_percent):
     """Set volume for wm8960_output sink"""
     try:
-        # Ensure volume is between 0-150% (PulseAudio allows up to 150%)
-        volume_percent = max(0, min(150, volume_percent))
+        # Clamped to 0-150% (PulseAudio allows up to 150%)
+        volume_percent = get_control().set_sink_volume(SINK, volume_percent)
+        print(f"✅ WM8960 volume set to {volume_percent}%")
+        return True
+    except PulseError as e:
+        print(f"❌ Could not set volume: {e}")
+        return False
 
-        result = subprocess.run(
-            ["pactl", "set-sink-volume", "wm8960_output", f"{volume_percent}%"],
-            capture_output=True,
-            text=True,
-        )
-        if result.returncode == 0:
-            print(f"✅ WM8960 volume set to {volume_percent}%")
-            return True
-        else:
-            print(f"❌ Could not set volume: {result.stderr}")
-            return False
-    except Exception as e:
-        print(f"❌ Error setting volume: {e}")
+
+def ramp_volume(volume_percent, duration=0.3):
+    """Fade wm8960_output to a volume without a click"""
+    try:
+        volume_percent = get_control().ramp_sink_volume(SINK, volume_percent, duration)
+        print(f"✅ WM8960 volume faded to {volume_percent}%")
+        return True
+    except PulseError as e:
+        print(f"❌ Could not fade volume: {e}")
         return False
 
 
 def mute_sink():
     """Mute the wm8960_output sink"""
     try:
-        result = subprocess.run(
-            ["pactl", "set-sink-mute", "wm8960_output", "1"],
-            capture_output=True,
-            text=True,
-        )
-        if result.returncode == 0:
-            print("🔇 WM8960 muted")
-            return True
-        else:
-            print("❌ Could not mute")
-            return False
-    except Exception as e:
-        print(f"❌ Error muting: {e}")
+        get_control().set_sink_mute(SINK, True)
+        print("🔇 WM8960 muted")
+        return True
+    except PulseError as e:
+        print(f"❌ Could not mute: {e}")
         return False
 
 
 def unmute_sink():
     """Unmute the wm8960_output sink"""
     try:
-        result = subprocess.run(
-            ["pactl", "set-sink-mute", "wm8960_output", "0"],
-            capture_output=True,
-            text=True,
-        )
-        if result.returncode == 0:
-            print("🔊 WM8960 unmuted")
-            return True
-        else:
-            print("❌ Could not unmute")
-            return False
-    except Exception as e:
-        print(f"❌ Error unmuting: {e}")
+        get_control().set_sink_mute(SINK, False)
+        print("🔊 WM8960 unmuted")
+        return True
+    except PulseError as e:
+        print(f"❌ Could not unmute: {e}")
         return False
 
 
 def volume_up(step=10):
     """Increase volume by step amount"""
     try:
-        result = subprocess.run(
-            ["pactl", "set-sink-volume", "wm8960_output", f"+{step}%"],
-            capture_output=True,
-            text=True,
-        )
-        if result.returncode == 0:
-            print(f"🔊 Volume increased by {step}%")
-            get_current_volume()
-            return True
-        else:
-            print("❌ Could not increase volume")
-            return False
-    except Exception as e:
-        print(f"❌ Error increasing volume: {e}")
+        volume = get_control().change_sink_volume(SINK, step)
+        print(f"🔊 Volume increased by {step}%")
+        print(f"🔊 Current WM8960 Volume: {volume}%")
+        return True
+    except PulseError as e:
+        print(f"❌ Could not increase volume: {e}")
         return False
 
 
 def volume_down(step=10):
     """Decrease volume by step amount"""
     try:
-        result = subprocess.run(
-            ["pactl", "set-sink-volume", "wm8960_output", f"-{step}%"],
-            capture_output=True,
-            text=True,
-        )
-        if result.returncode == 0:
-            print(f"🔉 Volume decreased by {step}%")
-            get_current_volume()
-            return True
-        else:
-            print("❌ Could not decrease volume")
-            return False
-    except Exception as e:
-        print(f"❌ Error decreasing volume: {e}")
+        volume = get_control().change_sink_volume(SINK, -step)
+        print(f"🔉 Volume decreased by {step}%")
+        print(f"🔉 Current WM8960 Volume: {volume}%")
+        return True
+    except PulseError as e:
+        print(f"❌ Could not decrease volume: {e}")
         return False
 
 
+def watch_volume():
+    """Print sink and source changes until Ctrl+C"""
+    print("👀 Watching PulseAudio sinks and sources, press Ctrl+C to stop...")
+    stop = get_control().subscribe(
+        lambda facility, event, index: print(f"  {event} on {facility} #{index}")
+    )
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stop()
+
+
 def show_help():
     """Show available commands"""
     print("🎧 WM8960 Volume Control Commands")
@@ -149,6 +126,10 @@ def show_help():
     print("   pactl set-sink-volume wm8960_output +10%")
     print("   pactl set-sink-volume wm8960_output -10%")
     print()
+    print("🎚️  Fade to a volume over 0.3 seconds (or as many as given):")
+    print("   python3 wm8960_volume_control.py fade 40")
+    print("   python3 wm8960_volume_control.py fade 80 2")
+    print()
     print("🔇 Mute/Unmute:")
     print("   python3 wm8960_volume_control.py mute")
     print("   python3 wm8960_volume_control.py unmute")
@@ -156,6 +137,11 @@ def show_help():
     print("   pactl set-sink-mute wm8960_output 1    # mute")
     print("   pactl set-sink-mute wm8960_output 0    # unmute")
     print()
+    print("👀 Watch volume and mute changes:")
+    print("   python3 wm8960_volume_control.py watch")
+    print("   # or")
+    print("   pactl subscribe")
+    print()
     print("💡 Quick Examples:")
     print("   pactl set-sink-volume wm8960_output 50%   # Set to 50%")
     print("   pactl set-sink-volume wm8960_output +5%   # Increase by 5%")
@@ -166,7 +152,7 @@ def main():
     if len(sys.argv) < 2:
         print("🎧 WM8960 Volume Control")
         print("Usage: python3 wm8960_volume_control.py <command> [value]")
-        print("Commands: status, set, up, down, mute, unmute, help")
+        print("Commands: status, set, fade, up, down, mute, unmute, watch, help")
         sys.exit(1)
 
     command = sys.argv[1].lower()
@@ -183,6 +169,17 @@ def main():
         except ValueError:
             print("❌ Volume must be a number")
             sys.exit(1)
+    elif command == "fade":
+        if len(sys.argv) < 3:
+            print("❌ Please specify volume level (0-150)")
+            sys.exit(1)
+        try:
+            volume = int(sys.argv[2])
+            duration = float(sys.argv[3]) if len(sys.argv) >= 4 else 0.3
+        except ValueError:
+            print("❌ Volume and duration must be numbers")
+            sys.exit(1)
+        ramp_volume(volume, duration)
     elif command == "up":
         step = 10
         if len(sys.argv) >= 3:
@@ -203,11 +200,15 @@ def main():
         mute_sink()
     elif command == "unmute":
         unmute_sink()
+    elif command == "watch":
+        watch_volume()
     elif command == "help":
         show_help()
     else:
         print(f"❌ Unknown command: {command}")
-        print("Available commands: status, set, up, down, mute, unmute, help")
+        print(
+            "Available commands: status, set, fade, up, down, mute, unmute, watch, help"
+        )
         sys.exit(1)
 
 